@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import tempfile
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,7 +43,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -57,6 +58,10 @@ SIMPLE_JWT = {
     "UPDATE_LAST_LOGIN": True,
     "ALGORITHM": "HS256",
     "SIGNING_KEY": SECRET_KEY,
+    # Comprueba la lista negra con el filtro en memoria de users.blacklist
+    "TOKEN_REFRESH_SERIALIZER": "users.tokens.FilteredTokenRefreshSerializer",
+    # last_login directo o por el buffer de users.last_login
+    "TOKEN_OBTAIN_SERIALIZER": "users.tokens.TokenObtainPairSerializer",
     "AUTH_HEADER_TYPES": ("Bearer",),
     "AUTH_HEADER_NAME": "HTTP_AUTHORIZATION",
     "USER_ID_FIELD": "id",
@@ -117,11 +122,126 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Recursos del frontend con hash y precomprimidos (build_frontend_assets)
+FRONTEND_ASSETS_DIR = BASE_DIR / 'frontend_dist'
+# Páginas HTML del frontend (frontend.pages): minificar al cachearlas y
+# renderizarlas todas al arrancar (sin comprobar cambios en las plantillas)
+FRONTEND_MINIFY_HTML = False
+FRONTEND_PRERENDER_PAGES = False
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Catálogo
+# Caché de lecturas públicas (products.cache). Backend elegido con la
+# variable de entorno CATALOG_CACHE: locmem (LRU en memoria), file o redis
+# (REDIS_URL; requiere el paquete redis de requirements.txt)
+CATALOG_CACHE_TIMEOUT = 300
+# Segundos que se guardan las respuestas si la caché no es compartida (locmem):
+# ningún worker ve las invalidaciones de los demás
+CATALOG_CACHE_LOCAL_TTL = 5
+CATALOG_CACHE = os.environ.get('CATALOG_CACHE', 'locmem')
+
+
+def cache_backend(kind, name, cull=True, **extra):
+    """
+    Configuración de la caché `name` con el backend `kind`. Cada alias tiene su
+    propio almacén (LOCATION o directorio): el tráfico del catálogo no expulsa
+    entradas de carritos ni de usuarios. En redis se comparte servidor y se
+    separan por KEY_PREFIX. cull=False: sin límite de entradas (buffers).
+    """
+    backends = {
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': name,
+            'TIMEOUT': CATALOG_CACHE_TIMEOUT,
+            'OPTIONS': {'MAX_ENTRIES': 1000},
+        },
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(tempfile.gettempdir(), f'almadeoro-{name}'),
+            'TIMEOUT': CATALOG_CACHE_TIMEOUT,
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+        'redis': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+            'TIMEOUT': CATALOG_CACHE_TIMEOUT,
+        },
+        'dummy': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+    }
+    config = {**backends[kind], **extra}
+    if not cull and 'OPTIONS' in config:
+        config['OPTIONS'] = {**config['OPTIONS'], 'MAX_ENTRIES': 10 ** 9}
+    return config
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': cache_backend(CATALOG_CACHE, 'catalog'),
+    # Resúmenes de carrito (orders.summary)
+    'carts': cache_backend(CATALOG_CACHE, 'carts', KEY_PREFIX='carts'),
+    # Usuarios autenticados (users.authentication)
+    'users': cache_backend(CATALOG_CACHE, 'users', KEY_PREFIX='users'),
+    # Cantidades pendientes del carrito (orders.cart_buffer): sin caducidad ni
+    # expulsión; con locmem o dummy el buffer queda desactivado. Backend:
+    # ORDERS_CART_WRITES_CACHE, por defecto el mismo que CATALOG_CACHE
+    'cart_writes': cache_backend(
+        os.environ.get('ORDERS_CART_WRITES_CACHE', CATALOG_CACHE), 'cart-writes',
+        cull=False, KEY_PREFIX='cart_writes', TIMEOUT=None,
+    ),
+}
+
+# True: /api/categories/ lee Category.products_count (mantenido por señales)
+# en lugar de anotar el conteo con un agregado
+PRODUCTS_DENORMALIZED_COUNTS = False
+
+# Derivados de las imágenes de producto (products.images): anchos en píxeles,
+# formatos y fondo sobre el que se compone la transparencia en JPEG
+PRODUCTS_IMAGE_WIDTHS = (320, 640, 1024)
+PRODUCTS_IMAGE_FORMATS = ('webp', 'jpeg')
+PRODUCTS_IMAGE_BACKGROUND = '#0a0a0a'
+
+# Pedidos
+# Segundos que el checkout aparta el stock de una orden antes de que
+# release_reservations lo devuelva al catálogo
+ORDERS_RESERVATION_TTL = 15 * 60
+
+# True: los PATCH de cantidad del carrito se guardan en la caché `cart_writes`
+# y se vuelcan en bloque (orders.cart_buffer) tras ORDERS_CART_FLUSH_DELAY
+# segundos, con flush_cart_writes o antes de cualquier otra lectura/escritura
+# del carrito. Requiere una caché compartida (file o redis)
+ORDERS_CART_WRITE_BEHIND = False
+ORDERS_CART_FLUSH_DELAY = 5
+
+# Carrito de invitado en cookie firmada (orders.guest_cart)
+ORDERS_GUEST_CART_COOKIE = 'guest_cart'
+ORDERS_GUEST_CART_MAX_AGE = 30 * 24 * 60 * 60
+ORDERS_GUEST_CART_MAX_LINES = 50
+
+# Usuarios
+# Segundos que CachedJWTAuthentication reutiliza el User en la caché `users`
+# y en la memoria del proceso (0 desactiva la capa local)
+USERS_AUTH_CACHE_TTL = 60
+USERS_AUTH_CACHE_LOCAL_TTL = 5
+# Lista negra de tokens (users.blacklist): probabilidad de falso positivo del
+# filtro (solo cuesta una consulta) y segundos que se conserva cada jti nuevo
+# en la caché para que los demás procesos lo añadan sin ir a la base de datos
+USERS_BLACKLIST_ERROR_RATE = 0.001
+USERS_BLACKLIST_ENTRY_TTL = 24 * 60 * 60
+# Segundos tras los que cada proceso reconstruye su filtro desde la base de
+# datos. Sin caché `users` compartida el filtro no se usa
+USERS_BLACKLIST_REBUILD_INTERVAL = 5 * 60
+# True: los logins guardan last_login en la caché `users` y flush_last_logins
+# lo vuelca en bloque (users.last_login); requiere que `users` sea compartida
+USERS_LAST_LOGIN_WRITE_BEHIND = False
+
 AUTH_USER_MODEL = "users.User"
 
 # CORS Settings
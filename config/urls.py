@@ -1,11 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework import routers
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
 from django.conf import settings
 from django.conf.urls.static import static
 from users.views import AddressViewSet  # ✅ puedes agregar otros ViewSets si existen
 from products.views import ProductViewSet  # opcional si ya tienes
+from orders.views import CartMergingTokenObtainPairView
 # ⚠️ No olvides importar tus ViewSets
 
 router = routers.DefaultRouter()
@@ -24,7 +25,8 @@ urlpatterns = [
     path("api/users/", include("users.urls")),
 
     # Auth (JWT)
-    path("api/auth/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    # Login: también une el carrito de invitado (cookie) al del usuario
+    path("api/auth/token/", CartMergingTokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
 
     # Products
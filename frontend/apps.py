@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class FrontendConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'frontend'
+
+    def ready(self):
+        from django.conf import settings
+        # Despliegue: todas las páginas renderizadas antes de la primera petición
+        if getattr(settings, 'FRONTEND_PRERENDER_PAGES', False):
+            from .pages import prerender_pages
+            prerender_pages()
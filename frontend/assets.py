@@ -0,0 +1,179 @@
+"""
+Recursos estáticos del frontend con huella de contenido y precomprimidos
+
+`python manage.py build_frontend_assets` recorre frontend/ y por cada css, js,
+imagen o fuente escribe en FRONTEND_ASSETS_DIR:
+
+- una copia con el hash del contenido en el nombre (css/style.3f2a9c1b04de.css),
+- sus versiones .gz y .br (solo para formatos que comprimen y si ocupan menos;
+  .br requiere el paquete opcional `brotli`),
+- manifest.json: ruta original -> copia, hash, tamaño y codificaciones.
+
+serve_asset() (frontend.views) sirve desde el manifest sin recorrer el disco:
+elige la codificación según Accept-Encoding, responde con FileResponse (el
+servidor WSGI puede usar sendfile) y marca como `immutable` las rutas con
+hash. frontend.pages reescribe los src/href de las páginas a las rutas con
+hash; las originales (las que arma el JavaScript) se revalidan con ETag. Cada
+codificación lleva su propio ETag. Lo que no está en el manifest se sirve como
+antes con static.serve.
+"""
+import functools
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # opcional: sin él solo se generan .gz
+    brotli = None
+
+ASSET_EXTENSIONS = ('css', 'js', 'png', 'jpg', 'jpeg', 'gif', 'svg', 'ico', 'woff', 'woff2', 'ttf')
+# Formatos que ya van comprimidos no se vuelven a comprimir
+COMPRESSIBLE_EXTENSIONS = ('css', 'js', 'svg', 'ico', 'ttf')
+# Directorios de frontend/ que no se publican
+SKIP_DIRS = ('scss', 'mail', 'migrations', '__pycache__')
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+
+
+def source_dir():
+    return os.path.join(settings.BASE_DIR, 'frontend')
+
+
+def output_dir():
+    return str(settings.FRONTEND_ASSETS_DIR)
+
+
+def hashed_name(path, digest):
+    base, ext = os.path.splitext(path)
+    return f'{base}.{digest[:HASH_LENGTH]}{ext}'
+
+
+def iter_sources(root):
+    """Rutas relativas (con /) de los recursos publicables bajo `root`"""
+    skip = {os.path.abspath(output_dir())}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            name for name in dirnames
+            if name not in SKIP_DIRS and os.path.abspath(os.path.join(dirpath, name)) not in skip
+        )
+        for filename in sorted(filenames):
+            if filename.rsplit('.', 1)[-1].lower() in ASSET_EXTENSIONS:
+                yield os.path.relpath(os.path.join(dirpath, filename), root).replace(os.sep, '/')
+
+
+def _write_compressed(path, compress, content):
+    """Escribe compress(content) en `path` si ocupa menos (o si ya existe de un build anterior)"""
+    if os.path.exists(path):
+        return True
+    data = compress(content)
+    if len(data) >= len(content):
+        return False
+    with open(path, 'wb') as fh:
+        fh.write(data)
+    return True
+
+
+def build_asset(root, out, name):
+    """Copia con hash y versiones comprimidas de un recurso; devuelve su entrada del manifest"""
+    with open(os.path.join(root, name), 'rb') as fh:
+        content = fh.read()
+    digest = hashlib.sha256(content).hexdigest()
+    target = hashed_name(name, digest)
+    target_path = os.path.join(out, target)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    if not os.path.exists(target_path):
+        shutil.copyfile(os.path.join(root, name), target_path)
+
+    encodings = {}
+    if name.rsplit('.', 1)[-1].lower() in COMPRESSIBLE_EXTENSIONS:
+        if brotli is not None and _write_compressed(
+                target_path + '.br', lambda data: brotli.compress(data, quality=11), content):
+            encodings['br'] = target + '.br'
+        # mtime=0: el mismo contenido produce siempre el mismo .gz
+        if _write_compressed(
+                target_path + '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0), content):
+            encodings['gzip'] = target + '.gz'
+
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    return {
+        'path': target,
+        'hash': digest[:HASH_LENGTH],
+        'size': len(content),
+        'content_type': content_type,
+        'encodings': encodings,
+    }
+
+
+def build_assets(root=None):
+    """Genera FRONTEND_ASSETS_DIR (desde frontend/ o `root`) y su manifest. Devuelve el manifest"""
+    root, out = root or source_dir(), output_dir()
+    os.makedirs(out, exist_ok=True)
+    manifest = {name: build_asset(root, out, name) for name in iter_sources(root)}
+    tmp = os.path.join(out, MANIFEST_NAME + '.tmp')
+    with open(tmp, 'w') as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(out, MANIFEST_NAME))
+    load_manifest.cache_clear()
+    # Las páginas cacheadas enlazan las rutas con hash del manifest anterior
+    from .pages import clear_pages
+    clear_pages()
+    return manifest
+
+
+@functools.lru_cache(maxsize=1)
+def load_manifest():
+    """
+    {ruta: (entrada, inmutable)} para las rutas originales y las con hash.
+    Se lee una vez por proceso: tras un build hay que reiniciar el servidor.
+    """
+    try:
+        with open(os.path.join(output_dir(), MANIFEST_NAME)) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    routes = {}
+    for name, entry in manifest.items():
+        routes[name] = (entry, False)
+        routes[entry['path']] = (entry, True)
+    return routes
+
+
+def encoding_etag(digest, encoding):
+    """ETag de una representación: el cuerpo comprimido no es el mismo que el original"""
+    return '"%s-%s"' % (digest, encoding) if encoding else '"%s"' % digest
+
+
+def parse_accept_encoding(header):
+    """{codificación: q} de una cabecera Accept-Encoding"""
+    accepted = {}
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def choose_encoding(entry, header):
+    """'br', 'gzip' o None según lo que hay generado y lo que acepta el cliente"""
+    accepted = parse_accept_encoding(header or '')
+    best, best_q = None, 0.0
+    for encoding in ('br', 'gzip'):
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if encoding in entry['encodings'] and q > best_q:
+            best, best_q = encoding, q
+    return best
@@ -52,6 +52,28 @@ const CartUtils = {
     } catch (e) {
       console.error('Error setting cart:', e);
     }
+    if (!localStorage.getItem('accessToken')) {
+      this.syncGuestCart(cart);
+    }
+  },
+
+  /**
+   * Guarda el carrito de invitado en la cookie firmada del backend
+   * (se une al carrito del usuario al iniciar sesión)
+   */
+  async syncGuestCart(cart) {
+    try {
+      await fetch('http://127.0.0.1:8000/api/cart/guest/', {
+        method: 'PUT',
+        credentials: 'include',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          items: cart.map(item => ({ product_id: item.id, quantity: item.quantity }))
+        })
+      });
+    } catch (error) {
+      console.error('Error guardando carrito de invitado:', error);
+    }
   },
 
   /**
@@ -129,37 +151,26 @@ const CartUtils = {
     }
 
     try {
-      // 1. Primero limpia el carrito del backend
-      await fetch('http://127.0.0.1:8000/api/cart/clear/', {
-        method: 'DELETE',
+      // Reemplaza el carrito completo del backend en una sola petición
+      const response = await fetch('http://127.0.0.1:8000/api/cart/', {
+        method: 'PUT',
         headers: {
           'Authorization': `Bearer ${token}`,
           'Content-Type': 'application/json'
-        }
+        },
+        body: JSON.stringify({
+          mode: 'replace',
+          items: cart.map(item => ({
+            product_id: item.id,
+            quantity: item.quantity
+          }))
+        })
       });
 
-      // 2. Agrega cada item al carrito del backend
-      for (const item of cart) {
-        try {
-          const response = await fetch('http://127.0.0.1:8000/api/cart/items/', {
-            method: 'POST',
-            headers: {
-              'Authorization': `Bearer ${token}`,
-              'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-              product_id: item.id,
-              quantity: item.quantity
-            })
-          });
-
-          if (!response.ok) {
-            const errorData = await response.json();
-            console.error(`Error agregando item ${item.id}:`, errorData);
-          }
-        } catch (itemError) {
-          console.error(`Error sincronizando item ${item.id}:`, itemError);
-        }
+      if (!response.ok) {
+        const errorData = await response.json();
+        console.error('❌ Error sincronizando carrito:', errorData);
+        return false;
       }
 
       console.log('✅ Carrito sincronizado con backend');
@@ -0,0 +1,25 @@
+"""
+Genera los recursos del frontend con hash y precomprimidos (ver frontend.assets)
+Uso: python manage.py build_frontend_assets
+
+Es incremental: los ficheros cuyo hash ya existe en FRONTEND_ASSETS_DIR no se
+vuelven a copiar ni comprimir. Reiniciar el servidor después para que lea el
+manifest nuevo.
+"""
+from django.core.management.base import BaseCommand
+from frontend.assets import brotli, build_assets, output_dir
+
+
+class Command(BaseCommand):
+    help = 'Copiar con hash, comprimir (gzip/brotli) y escribir el manifest de los recursos del frontend'
+
+    def handle(self, *args, **options):
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('⚠️  Paquete brotli no instalado: solo se generan .gz'))
+        manifest = build_assets()
+        size = sum(entry['size'] for entry in manifest.values())
+        compressed = sum(len(entry['encodings']) for entry in manifest.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(manifest)} recursos ({size / 1024 / 1024:.1f} MB), '
+            f'{compressed} versiones comprimidas en {output_dir()}'
+        ))
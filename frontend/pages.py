@@ -0,0 +1,118 @@
+"""
+Caché de las páginas HTML del frontend
+
+index.html, shop.html, detail.html... no usan sintaxis de plantillas: son
+páginas fijas que el JavaScript rellena, y renderizarlas con el motor de
+plantillas devuelve el fichero tal cual. serve_page las lee una vez y guarda
+en memoria del proceso el HTML (minificado si FRONTEND_MINIFY_HTML), su
+versión gzip y su hash, con la fecha de modificación de la plantilla como
+parte de la clave: si el fichero cambia se vuelve a leer.
+
+Si hay build de recursos (frontend.assets), los src/href a css, js, imágenes y
+fuentes se reescriben a las rutas con hash del manifest, que el navegador
+cachea como inmutables.
+
+Con FRONTEND_PRERENDER_PAGES todas las páginas se renderizan al arrancar
+(FrontendConfig.ready) y ya no se comprueba la fecha: servir una página es
+una búsqueda en un diccionario. Las plantillas que sí usan {{ }} o {% %} no
+se cachean y se renderizan en cada petición como antes.
+"""
+import gzip
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.template import engines
+from django.template.loader import get_template
+
+from .assets import load_manifest
+
+TEMPLATE_SYNTAX = re.compile(r'{{|{%|{#')
+# Bloques cuyo contenido no se toca al minificar
+PRESERVE = re.compile(r'(<pre\b.*?</pre>|<textarea\b.*?</textarea>)', re.S | re.I)
+# En scripts y estilos solo se quita la sangría (sin tocar comentarios ni saltos de línea)
+CODE = re.compile(r'(<script\b.*?</script>|<style\b.*?</style>)', re.S | re.I)
+COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.S)
+INDENT = re.compile(r'^[ \t]+|[ \t]+$', re.M)
+BLANK_LINES = re.compile(r'\n{2,}')
+# src/href relativos o absolutos del sitio (sin esquema, query ni fragmento)
+ASSET_URL = re.compile(r"""(\b(?:src|href)=["']/?)([^"'?#:]+)(?=["'])""", re.I)
+
+_pages = {}
+
+
+def strip_indent(text):
+    return BLANK_LINES.sub('\n', INDENT.sub('', text))
+
+
+def minify_html(html):
+    """Quita sangrías, líneas vacías y comentarios HTML sin cambiar <pre>/<textarea> ni el código"""
+    parts = []
+    for i, block in enumerate(PRESERVE.split(html)):
+        if i % 2:
+            parts.append(block)
+            continue
+        for j, chunk in enumerate(CODE.split(block)):
+            parts.append(strip_indent(chunk if j % 2 else COMMENT.sub('', chunk)))
+    return ''.join(parts).strip() + '\n'
+
+
+def hash_asset_urls(html):
+    """Cambia los enlaces a recursos del manifest por sus rutas con hash"""
+    routes = load_manifest()
+    if not routes:
+        return html
+
+    def replace(match):
+        route = routes.get(match.group(2))
+        if route is None or route[1]:
+            return match.group(0)
+        return match.group(1) + route[0]['path']
+    return ASSET_URL.sub(replace, html)
+
+
+def render_page(path):
+    """Entrada de la caché para una plantilla, o None si usa sintaxis de plantillas"""
+    with open(path, encoding='utf-8') as fh:
+        html = fh.read()
+    if TEMPLATE_SYNTAX.search(html):
+        return None
+    if getattr(settings, 'FRONTEND_MINIFY_HTML', False):
+        html = minify_html(html)
+    body = hash_asset_urls(html).encode('utf-8')
+    return {
+        'body': body,
+        'hash': hashlib.sha1(body).hexdigest(),
+        'encodings': {'gzip': gzip.compress(body, mtime=0)},
+    }
+
+
+def get_page(filename):
+    """
+    Página cacheada ({'body', 'hash', 'encodings'}) o None si no se puede
+    cachear. TemplateDoesNotExist se propaga como con render()
+    """
+    if getattr(settings, 'FRONTEND_PRERENDER_PAGES', False) and filename in _pages:
+        return _pages[filename][1]
+    path = get_template(filename).origin.name
+    mtime = os.stat(path).st_mtime_ns
+    cached = _pages.get(filename)
+    if cached is None or cached[0] != mtime:
+        cached = _pages[filename] = (mtime, render_page(path))
+    return cached[1]
+
+
+def prerender_pages():
+    """Carga todas las páginas .html de los DIRS de plantillas; devuelve cuántas quedaron en caché"""
+    names = {
+        name
+        for directory in engines['django'].engine.dirs
+        for name in os.listdir(directory)
+        if name.endswith('.html')
+    }
+    return sum(get_page(name) is not None for name in sorted(names))
+
+
+def clear_pages():
+    _pages.clear()
@@ -1,3 +1,194 @@
-from django.test import TestCase
+import gzip
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from frontend.assets import build_assets, choose_encoding, load_manifest
+from frontend.pages import clear_pages, minify_html, prerender_pages
+
+CSS = b"body { color: #d4af37; }\n" * 200
+
+
+class FrontendAssetsTest(TestCase):
+    """Tests para los recursos con hash y precomprimidos"""
+
+    def setUp(self):
+        self.src = tempfile.mkdtemp()
+        self.out = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.src)
+        self.addCleanup(shutil.rmtree, self.out)
+        os.makedirs(os.path.join(self.src, "css"))
+        os.makedirs(os.path.join(self.src, "img"))
+        with open(os.path.join(self.src, "css", "site.css"), "wb") as fh:
+            fh.write(CSS)
+        with open(os.path.join(self.src, "img", "logo.png"), "wb") as fh:
+            fh.write(b"\x89PNG fake")
+
+        settings_override = override_settings(FRONTEND_ASSETS_DIR=self.out)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(load_manifest.cache_clear)
+        self.manifest = build_assets(self.src)
+
+    def test_build(self):
+        """Test que el build genera copias con hash, .gz y el manifest"""
+        css = self.manifest["css/site.css"]
+        self.assertRegex(css["path"], r"^css/site\.[0-9a-f]{12}\.css$")
+        self.assertIn("gzip", css["encodings"])
+        with gzip.open(os.path.join(self.out, css["encodings"]["gzip"])) as fh:
+            self.assertEqual(fh.read(), CSS)
+        self.assertEqual(self.manifest["img/logo.png"]["encodings"], {})
+        # Incremental: mismo contenido, misma salida
+        self.assertEqual(build_assets(self.src), self.manifest)
+
+    def test_original_path_gzip_and_revalidation(self):
+        """Test que la ruta original se sirve comprimida y se revalida con ETag"""
+        response = self.client.get("/css/site.css", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), CSS)
+
+        response = self.client.get("/css/site.css", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_per_encoding(self):
+        """Test que cada codificación tiene su ETag y solo se revalida con el suyo"""
+        plain = self.client.get("/css/site.css")
+        compressed = self.client.get("/css/site.css", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(compressed["ETag"], '"%s-gzip"' % self.manifest["css/site.css"]["hash"])
+        self.assertNotEqual(plain["ETag"], compressed["ETag"])
+        response = self.client.get("/css/site.css", HTTP_IF_NONE_MATCH=compressed["ETag"])
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get("/css/site.css", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=compressed["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_pages_link_hashed_assets(self):
+        """Test que las páginas enlazan las rutas con hash del manifest"""
+        templates = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, templates)
+        with open(os.path.join(templates, "pagina.html"), "w") as fh:
+            fh.write(
+                '<link href="css/site.css" rel="stylesheet"><link href="https://cdn.example.com/css/site.css">'
+                "<img src='/img/logo.png'><script src=\"js/otro.js\"></script>"
+            )
+        with self.settings(TEMPLATES=[{**settings.TEMPLATES[0], "DIRS": [templates]}]):
+            clear_pages()
+            self.addCleanup(clear_pages)
+            response = self.client.get("/pagina.html")
+        self.assertEqual(
+            response.content.decode(),
+            '<link href="%s" rel="stylesheet"><link href="https://cdn.example.com/css/site.css">'
+            "<img src='/%s'><script src=\"js/otro.js\"></script>"
+            % (self.manifest["css/site.css"]["path"], self.manifest["img/logo.png"]["path"]),
+        )
+
+    def test_hashed_path_is_immutable(self):
+        """Test que la ruta con hash es immutable"""
+        response = self.client.get("/" + self.manifest["css/site.css"]["path"])
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("max-age=31536000", response["Cache-Control"])
+        self.assertEqual(b"".join(response.streaming_content), CSS)
+
+    def test_unbuilt_asset_falls_back_to_static_serve(self):
+        """Test que lo que no está en el manifest se sirve como antes"""
+        response = self.client.get("/js/cart-utils.js")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("immutable", response.get("Cache-Control", ""))
+
+    def test_choose_encoding(self):
+        """Test que se elige la codificación según Accept-Encoding"""
+        entry = {"encodings": {"br": "x.br", "gzip": "x.gz"}}
+        self.assertEqual(choose_encoding(entry, "gzip, br"), "br")
+        self.assertEqual(choose_encoding(entry, "br;q=0, gzip"), "gzip")
+        self.assertEqual(choose_encoding(entry, "br;q=0.5, gzip;q=0.8"), "gzip")
+        self.assertIsNone(choose_encoding(entry, "identity"))
+        self.assertEqual(choose_encoding({"encodings": {"gzip": "x.gz"}}, "*"), "gzip")
+
+
+class PageCacheTest(TestCase):
+    """Tests para la caché de páginas HTML"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        templates = [{**settings.TEMPLATES[0], "DIRS": [self.dir]}]
+        settings_override = override_settings(TEMPLATES=templates)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        clear_pages()
+        self.addCleanup(clear_pages)
+        self.write("pagina.html", "<html>\n  <body>\n    <h1>Alma de Oro</h1>\n  </body>\n</html>\n")
+
+    def write(self, name, html, mtime=None):
+        path = os.path.join(self.dir, name)
+        with open(path, "w") as fh:
+            fh.write(html)
+        if mtime:
+            os.utime(path, (mtime, mtime))
+
+    def test_etag_and_gzip(self):
+        """Test que las páginas llevan ETag y se sirven con gzip"""
+        response = self.client.get("/pagina.html")
+        self.assertContains(response, "<h1>Alma de Oro</h1>")
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        self.assertEqual(self.client.get("/pagina.html", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        compressed = self.client.get("/pagina.html", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(compressed.content), response.content)
+
+    def test_etag_per_encoding(self):
+        """Test que la versión gzip tiene su propio ETag y cada una se revalida con el suyo"""
+        plain = self.client.get("/pagina.html")
+        compressed = self.client.get("/pagina.html", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(compressed["ETag"], plain["ETag"][:-1] + '-gzip"')
+        for accept, etag, status in [
+            ("", plain["ETag"], 304),
+            ("", compressed["ETag"], 200),
+            ("gzip", compressed["ETag"], 304),
+            ("gzip", plain["ETag"], 200),
+        ]:
+            response = self.client.get("/pagina.html", HTTP_ACCEPT_ENCODING=accept, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status, (accept, etag))
+
+    def test_rerendered_when_template_changes(self):
+        """Test que una plantilla modificada se vuelve a leer"""
+        etag = self.client.get("/pagina.html")["ETag"]
+        self.write("pagina.html", "<h1>Nueva</h1>", mtime=2_000_000_000)
+        response = self.client.get("/pagina.html", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Nueva")
+
+    @override_settings(FRONTEND_PRERENDER_PAGES=True)
+    def test_prerendered_pages_skip_the_filesystem(self):
+        """Test que las páginas prerenderizadas no consultan el disco"""
+        self.assertEqual(prerender_pages(), 1)
+        self.write("pagina.html", "<h1>Nueva</h1>", mtime=2_000_000_000)
+        self.assertContains(self.client.get("/pagina.html"), "Alma de Oro")
+
+    def test_templates_with_tags_not_cached(self):
+        """Test que las plantillas con etiquetas no se cachean"""
+        self.write("dinamica.html", "{% if user.is_authenticated %}hola{% else %}anónimo{% endif %}")
+        response = self.client.get("/dinamica.html")
+        self.assertContains(response, "anónimo")
+        self.assertFalse(response.has_header("ETag"))
+
+    @override_settings(FRONTEND_MINIFY_HTML=True)
+    def test_minified(self):
+        """Test que FRONTEND_MINIFY_HTML minifica la página"""
+        self.assertEqual(self.client.get("/pagina.html").content, b"<html>\n<body>\n<h1>Alma de Oro</h1>\n</body>\n</html>\n")
+
+    def test_minify_preserves_code_and_pre(self):
+        """Test que minificar no cambia <pre> ni el código"""
+        html = "<div>\n    <!-- nota -->\n    <pre>  a\n\n  b</pre>\n  <script>\n    // <!-- x -->\n    let a = 1\n    a++\n  </script>\n</div>"
+        self.assertEqual(
+            minify_html(html),
+            "<div>\n<pre>  a\n\n  b</pre>\n<script>\n// <!-- x -->\nlet a = 1\na++\n</script>\n</div>\n",
+        )
@@ -1,18 +1,73 @@
 import os
 from django.conf import settings
-from django.http import Http404
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views.static import serve as static_serve
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
+from .assets import choose_encoding, encoding_etag, load_manifest, output_dir
+from .pages import get_page
 
 FRONTEND_DIR = os.path.join(settings.BASE_DIR, "frontend")
 
 def serve_page(request, filename="index.html"):
+    """
+    Páginas HTML desde la caché de frontend.pages, con ETag (304 si no
+    cambió) y gzip si el cliente lo acepta
+    """
     safe_name = os.path.normpath(filename)
     if safe_name.startswith("..") or os.path.isabs(safe_name):
         raise Http404("Archivo no válido")
-    return render(request, filename)
+    page = get_page(filename)
+    if page is None:
+        return render(request, filename)
+
+    encoding = choose_encoding(page, request.META.get("HTTP_ACCEPT_ENCODING"))
+    etag = encoding_etag(page["hash"], encoding)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(page["encodings"][encoding] if encoding else page["body"])
+        if encoding:
+            response["Content-Encoding"] = encoding
+    response["ETag"] = etag
+    patch_vary_headers(response, ["Accept-Encoding"])
+    # El HTML se revalida siempre: así enlaza enseguida los recursos con hash nuevos
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def serve_asset(request, path):
+    """
+    Sirve css/js/imágenes/fuentes desde FRONTEND_ASSETS_DIR (ver frontend.assets).
+    Las rutas con hash se cachean un año como inmutables; las originales se
+    revalidan con ETag. Sin build, o si el recurso no está, como static.serve.
+    """
+    route = load_manifest().get(path)
+    if route is None:
+        return static_serve(request, path, document_root=FRONTEND_DIR)
+    entry, immutable = route
+
+    encoding = choose_encoding(entry, request.META.get("HTTP_ACCEPT_ENCODING"))
+    etag = encoding_etag(entry["hash"], encoding)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        name = entry["encodings"][encoding] if encoding else entry["path"]
+        try:
+            fh = open(os.path.join(output_dir(), name), "rb")
+        except FileNotFoundError:
+            raise Http404("Recurso no encontrado")
+        response = FileResponse(fh, content_type=entry["content_type"], filename=os.path.basename(path))
+        if encoding:
+            response["Content-Encoding"] = encoding
+    response["ETag"] = etag
+    patch_vary_headers(response, ["Accept-Encoding"])
+    if immutable:
+        patch_cache_control(response, public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
 
 
 
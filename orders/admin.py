@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Order, OrderItem, Cart, CartItem
+from .models import Order, OrderItem, Cart, CartItem, StockReservation
+from .summary import invalidate_cart_summary
 
 
 class OrderItemInline(admin.TabularInline):
@@ -45,8 +46,34 @@ class CartAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
     inlines = [CartItemInline]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        invalidate_cart_summary(form.instance.user_id)
+
 
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ('cart', 'product', 'quantity', 'price_cents', 'subtotal')
     readonly_fields = ('subtotal',)
+
+    # Mantener al día el resumen cacheado del carrito (orders.summary)
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate_cart_summary(obj.cart.user_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_cart_summary(obj.cart.user_id)
+
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('cart__user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for user_id in user_ids:
+            invalidate_cart_summary(user_id)
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('order', 'product', 'quantity', 'expires_at')
+    list_filter = ('expires_at',)
+    readonly_fields = ('order', 'product', 'quantity', 'created_at', 'expires_at')
@@ -0,0 +1,155 @@
+"""
+Buffer de escritura del carrito (opcional, ORDERS_CART_WRITE_BEHIND)
+
+Los PATCH que solo cambian la cantidad de una línea no escriben en la base de
+datos: la cantidad nueva se guarda en la caché `cart_writes` y se vuelca
+después, con un único bulk_update por carrito, cuando:
+
+- otra petición del mismo carrito necesita leerlo o escribirlo (listado,
+  PUT, alta o baja de líneas, resumen sin caché) y siempre antes del checkout;
+- llega un PATCH y lo pendiente tiene más de ORDERS_CART_FLUSH_DELAY segundos;
+- se ejecuta `python manage.py flush_cart_writes` (cron o --every).
+
+Claves (sin caducidad):
+
+- cart:pending:<user>:<línea> = cantidad, una por línea: dos PATCH
+  concurrentes de líneas distintas no se pisan;
+- cart:pending:<user> = momento del primer cambio sin volcar, creada con
+  add(): solo el primer PATCH registra el carrito;
+- cart:pending:log:<n> = user, con n = incr(cart:pending:seq): el registro de
+  carritos que flush_all recorre desde la última posición volcada, como el
+  de la lista negra de tokens (users.blacklist).
+
+El buffer tiene que verlo cualquier proceso que lea el carrito o haga el
+checkout, y lo pendiente no puede expulsarse: con una caché que no es
+compartida (locmem, dummy) queda desactivado y los PATCH escriben directamente.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from products.cache import is_shared_cache
+
+from .models import CartItem
+
+LOG_SEQ_KEY = 'cart:pending:seq'
+LOG_DONE_KEY = 'cart:pending:done'
+
+
+def is_enabled():
+    return getattr(settings, 'ORDERS_CART_WRITE_BEHIND', False) and is_shared_cache(get_buffer_cache())
+
+
+def get_buffer_cache():
+    return caches['cart_writes']
+
+
+def since_key(user_id):
+    return f'cart:pending:{user_id}'
+
+
+def pending_key(user_id, item_id):
+    return f'cart:pending:{user_id}:{item_id}'
+
+
+def log_key(n):
+    return f'cart:pending:log:{n}'
+
+
+def _register(user_id):
+    """Marca el carrito como pendiente; si es el primer cambio lo anota en el registro"""
+    cache = get_buffer_cache()
+    if cache.add(since_key(user_id), time.time(), timeout=None):
+        cache.add(LOG_SEQ_KEY, 0, timeout=None)
+        cache.set(log_key(cache.incr(LOG_SEQ_KEY)), user_id, timeout=None)
+
+
+def _pending_keys(user_id):
+    item_ids = CartItem.objects.filter(cart__user_id=user_id).values_list('pk', flat=True)
+    return {pending_key(user_id, item_id): item_id for item_id in item_ids}
+
+
+def buffer_quantity(user_id, item_id, quantity):
+    """
+    Anota la cantidad nueva de una línea. Devuelve la cantidad que tenía
+    pendiente (o None) para que el llamador pueda ajustar el resumen.
+    """
+    cache = get_buffer_cache()
+    key = pending_key(user_id, item_id)
+    previous = cache.get(key)
+    cache.set(key, quantity, timeout=None)
+    _register(user_id)
+
+    since = cache.get(since_key(user_id))
+    if since is not None and time.time() - since >= settings.ORDERS_CART_FLUSH_DELAY:
+        flush_cart_writes(user_id)
+    return previous
+
+
+def flush_cart_writes(user_id):
+    """
+    Vuelca lo pendiente del carrito de `user_id` con un bulk_update.
+    Las claves se borran al confirmar la transacción, y solo las que nadie
+    modificó mientras tanto. Devuelve cuántas líneas se escribieron.
+    """
+    if not is_enabled():
+        return 0
+    cache = get_buffer_cache()
+    if cache.get(since_key(user_id)) is None:
+        return 0
+    keys = _pending_keys(user_id)
+    pending = cache.get_many(list(keys))
+    # Líneas borradas entretanto simplemente no se actualizan
+    CartItem.objects.bulk_update(
+        [CartItem(pk=keys[key], quantity=quantity) for key, quantity in pending.items()], ['quantity']
+    )
+
+    def forget():
+        # Primero la marca: un PATCH posterior vuelve a registrar el carrito
+        cache.delete(since_key(user_id))
+        current = cache.get_many(list(pending))
+        flushed = [key for key, quantity in pending.items() if current.get(key) == quantity]
+        cache.delete_many(flushed)
+        if len(flushed) < len(current):
+            _register(user_id)
+    transaction.on_commit(forget)
+    return len(pending)
+
+
+def discard_cart_writes(user_id):
+    """Olvida lo pendiente (p. ej. al vaciar el carrito, antes de borrar las líneas)"""
+    if not is_enabled():
+        return
+    cache = get_buffer_cache()
+    cache.delete_many([since_key(user_id), *_pending_keys(user_id)])
+
+
+def flush_all(min_age=0):
+    """Vuelca los carritos con escrituras pendientes de al menos `min_age` segundos"""
+    if not is_enabled():
+        return 0
+    cache = get_buffer_cache()
+    done, seq = cache.get(LOG_DONE_KEY, 0), cache.get(LOG_SEQ_KEY, 0)
+    if seq <= done:
+        return 0
+    entries = cache.get_many([log_key(n) for n in range(done + 1, seq + 1)])
+    lines = 0
+    now = time.time()
+    waiting = set()
+    for user_id in dict.fromkeys(entries.values()):
+        since = cache.get(since_key(user_id))
+        if since is None:
+            continue
+        if now - since >= min_age:
+            with transaction.atomic():
+                lines += flush_cart_writes(user_id)
+        else:
+            waiting.add(user_id)
+    cache.set(LOG_DONE_KEY, seq, timeout=None)
+    cache.delete_many(list(entries))
+    # Los que aún no tienen la antigüedad mínima se vuelven a anotar al final
+    for user_id in waiting:
+        cache.set(log_key(cache.incr(LOG_SEQ_KEY)), user_id, timeout=None)
+    return lines
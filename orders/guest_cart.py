@@ -0,0 +1,98 @@
+"""
+Carrito de invitado en una cookie firmada
+
+Los visitantes sin sesión guardan su carrito en la cookie
+ORDERS_GUEST_CART_COOKIE: una lista [[product_id, cantidad, price_cents], ...]
+firmada y comprimida con django.core.signing. Leerlo o modificarlo no escribe
+nada en la base de datos (solo una consulta de productos para validar y poner
+precio); al iniciar sesión se une al Cart del usuario con una única
+escritura en bloque (ver merge_guest_cart).
+"""
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+
+from products.models import Product
+from .cart_buffer import flush_cart_writes
+from .models import Cart, CartItem
+from .summary import invalidate_cart_summary
+
+SALT = 'orders.guest_cart'
+
+
+def load_guest_cart(request):
+    """{product_id: cantidad} de la cookie, o {} si no hay o no es válida"""
+    value = request.COOKIES.get(settings.ORDERS_GUEST_CART_COOKIE)
+    if not value:
+        return {}
+    try:
+        lines = signing.loads(value, salt=SALT, max_age=settings.ORDERS_GUEST_CART_MAX_AGE)
+        return {int(product_id): int(quantity) for product_id, quantity, _ in lines if int(quantity) > 0}
+    except (signing.BadSignature, TypeError, ValueError):
+        return {}
+
+
+def price_guest_cart(quantities):
+    """
+    Valida y pone precio a las líneas con una sola consulta: se descartan los
+    productos que ya no existen o no están activos. Devuelve [(id, cantidad, price_cents)]
+    """
+    prices = dict(
+        Product.objects.filter(pk__in=quantities, is_active=True)
+        .order_by()
+        .values_list('id', 'price')
+    )
+    return [
+        (product_id, quantity, int(prices[product_id] * 100))
+        for product_id, quantity in quantities.items()
+        if product_id in prices
+    ][:settings.ORDERS_GUEST_CART_MAX_LINES]
+
+
+def set_guest_cart_cookie(response, request, lines):
+    if not lines:
+        delete_guest_cart_cookie(response)
+        return
+    value = signing.dumps([list(line) for line in lines], salt=SALT, compress=True)
+    response.set_cookie(
+        settings.ORDERS_GUEST_CART_COOKIE,
+        value,
+        max_age=settings.ORDERS_GUEST_CART_MAX_AGE,
+        httponly=True,
+        samesite='Lax',
+        secure=request.is_secure(),
+    )
+
+
+def delete_guest_cart_cookie(response):
+    response.delete_cookie(settings.ORDERS_GUEST_CART_COOKIE, samesite='Lax')
+
+
+@transaction.atomic
+def merge_guest_cart(user, quantities):
+    """
+    Suma el carrito de invitado al carrito del usuario. Lecturas: productos y
+    líneas actuales; escritura: un único INSERT ... ON CONFLICT (cart, product)
+    DO UPDATE con las cantidades ya sumadas. Devuelve el carrito.
+    """
+    cart, _ = Cart.objects.get_or_create(user=user)
+    lines = price_guest_cart(quantities)
+    if lines:
+        flush_cart_writes(user.pk)
+        current = dict(
+            cart.items.filter(product_id__in=[line[0] for line in lines]).values_list('product_id', 'quantity')
+        )
+        CartItem.objects.bulk_create(
+            [
+                CartItem(
+                    cart=cart, product_id=product_id,
+                    quantity=current.get(product_id, 0) + quantity, price_cents=price_cents,
+                )
+                for product_id, quantity, price_cents in lines
+            ],
+            update_conflicts=True,
+            unique_fields=['cart', 'product'],
+            update_fields=['quantity', 'price_cents'],
+        )
+        invalidate_cart_summary(user.pk)
+    return cart
@@ -0,0 +1,86 @@
+"""
+Benchmark de la sincronización del carrito desde el frontend
+Uso: python manage.py benchmark_cart_sync [--sizes 1 10 50] [--repeat 10]
+
+Compara el patrón anterior de cart-utils.js (DELETE /api/cart/clear/ y un
+POST /api/cart/items/ por línea) con un único PUT /api/cart/. Todo ocurre
+dentro de una transacción que se revierte al final.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from orders.views import CartItemViewSet, CartViewSet
+from products.models import Product
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Comparar N POST secuenciales contra un PUT /api/cart/ en bloque'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 50])
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['sizes'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, sizes, repeat):
+        self.user = User.objects.create_user(username='bench-cart', email='bench-cart@bench.local', password='x')
+        products = Product.objects.bulk_create([
+            Product(name=f'Bench {i}', description='', stock=100, price='1234.56', material='oro')
+            for i in range(max(sizes))
+        ])
+        self.factory = APIRequestFactory()
+        self.clear = CartViewSet.as_view({'delete': 'clear'})
+        self.add = CartItemViewSet.as_view({'post': 'create'})
+        self.replace = CartViewSet.as_view({'put': 'replace'})
+
+        self.stdout.write(self.style.WARNING('🛒 Sincronización del carrito'))
+        self.stdout.write(
+            f'   {"líneas":>7} {"peticiones":>11} {"consultas":>10} {"ms":>9}   '
+            f'{"peticiones":>11} {"consultas":>10} {"ms":>9}'
+        )
+        for size in sizes:
+            items = [{'product_id': p.pk, 'quantity': 2} for p in products[:size]]
+            before = self.measure(lambda: self.sequential(items), repeat)
+            after = self.measure(lambda: self.bulk(items), repeat)
+            self.stdout.write(
+                f'   {size:>7} {size + 1:>11} {before[0]:>10} {before[1]:>9.2f}   '
+                f'{1:>11} {after[0]:>10} {after[1]:>9.2f}'
+            )
+
+    def request(self, method, path, data=None):
+        request = getattr(self.factory, method)(path, data, format='json')
+        force_authenticate(request, user=self.user)
+        return request
+
+    def sequential(self, items):
+        self.clear(self.request('delete', '/api/cart/clear/'))
+        for item in items:
+            self.add(self.request('post', '/api/cart/items/', item))
+
+    def bulk(self, items):
+        self.replace(self.request('put', '/api/cart/', {'items': items, 'mode': 'replace'}))
+
+    def measure(self, sync, repeat):
+        elapsed = 0.0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                sync()
+                elapsed += time.perf_counter() - start
+        return len(ctx.captured_queries), elapsed / repeat * 1000
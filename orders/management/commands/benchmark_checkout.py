@@ -0,0 +1,67 @@
+"""
+Micro-benchmark del checkout según el tamaño del carrito
+Uso: python manage.py benchmark_checkout [--sizes 1 10 50 100] [--repeat 20]
+
+Todo ocurre dentro de una transacción que se revierte al final.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from orders.models import Cart, CartItem
+from orders.views import OrderViewSet
+from products.models import Product
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Medir consultas y tiempo del checkout para distintos tamaños de carrito'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 50, 100])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['sizes'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, sizes, repeat):
+        user = User.objects.create_user(username='bench', email='bench@bench.local', password='x')
+        cart = Cart.objects.create(user=user)
+        products = Product.objects.bulk_create([
+            Product(name=f'Bench {i}', description='', stock=10**6, price='1000', material='oro')
+            for i in range(max(sizes))
+        ])
+        view = OrderViewSet.as_view({'post': 'checkout'})
+        factory = APIRequestFactory()
+
+        self.stdout.write(self.style.WARNING('🧾 Checkout'))
+        self.stdout.write(f'   {"líneas":>7} {"consultas":>10} {"ms/checkout":>12}')
+        for size in sizes:
+            elapsed = 0.0
+            for i in range(repeat):
+                CartItem.objects.bulk_create([
+                    CartItem(cart=cart, product=p, quantity=1, price_cents=100000)
+                    for p in products[:size]
+                ])
+                request = factory.post('/api/orders/checkout/', {}, format='json')
+                force_authenticate(request, user=user)
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    view(request)
+                    elapsed += time.perf_counter() - start
+            self.stdout.write(
+                f'   {size:>7} {len(ctx.captured_queries):>10} {elapsed / repeat * 1000:>12.2f}'
+            )
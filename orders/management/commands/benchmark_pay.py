@@ -0,0 +1,112 @@
+"""
+Benchmark de pagos concurrentes sobre un producto con stock limitado
+Uso: python manage.py benchmark_pay [--orders 200] [--threads 8] [--stock 100]
+
+Compara el pago anterior (leer stock, comprobar y save() en Python) con
+OrderViewSet.pay (UPDATE condicional por producto). Los hilos usan sus propias
+conexiones, así que los datos se confirman y se borran al terminar: usar una
+base de datos de pruebas.
+"""
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+from orders.models import Order, OrderItem
+from orders.views import OrderViewSet
+from products.models import Product
+
+User = get_user_model()
+
+
+@transaction.atomic
+def legacy_pay(order_id):
+    """Pago como se hacía antes: comprobación y descuento en Python"""
+    order = Order.objects.get(pk=order_id)
+    if order.status != 'pending':
+        return False
+    for item in order.items.all():
+        if item.product.stock < item.quantity:
+            return False
+    for item in order.items.all():
+        item.product.stock -= item.quantity
+        item.product.save()
+    order.status = 'paid'
+    order.save()
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Comparar el pago con lectura-comprobación-save contra el UPDATE condicional'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--stock', type=int, default=100)
+
+    def handle(self, *args, **options):
+        self.user = User.objects.create_user(username='bench-pay', email='bench-pay@bench.local', password='x')
+        try:
+            self.stdout.write(self.style.WARNING('💳 Pagos concurrentes'))
+            self.stdout.write(f'   {"modo":<12} {"pagadas":>8} {"stock final":>12} {"vendidas":>9} {"pagos/s":>9}')
+            self.run('anterior', self.legacy, options)
+            self.run('condicional', self.conditional, options)
+        finally:
+            self.user.delete()
+            Product.objects.filter(name='Bench pay').delete()
+
+    def legacy(self, order):
+        return legacy_pay(order.pk)
+
+    def conditional(self, order):
+        request = APIRequestFactory().post(f'/api/orders/{order.pk}/pay/', {}, format='json')
+        force_authenticate(request, user=self.user)
+        response = OrderViewSet.as_view({'post': 'pay'})(request, pk=order.pk)
+        return response.status_code == 200
+
+    def run(self, label, pay, options):
+        product = Product.objects.create(name='Bench pay', description='', stock=options['stock'], price='1000')
+        orders = []
+        for _ in range(options['orders']):
+            order = Order.objects.create(user=self.user)
+            orders.append(order)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price_cents=100000) for order in orders
+        ])
+
+        pending = list(orders)
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if not pending:
+                            return
+                        order = pending.pop()
+                    for _ in range(100):
+                        try:
+                            pay(order)
+                            break
+                        except OperationalError:
+                            time.sleep(0.001)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        product.refresh_from_db()
+        paid = Order.objects.filter(pk__in=[o.pk for o in orders], status='paid').count()
+        sold = options['stock'] - product.stock
+        style = self.style.SUCCESS if paid == sold else self.style.ERROR
+        self.stdout.write(style(
+            f'   {label:<12} {paid:>8} {product.stock:>12} {sold:>9} {len(orders) / elapsed:>9.1f}'
+        ))
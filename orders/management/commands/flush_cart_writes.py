@@ -0,0 +1,32 @@
+"""
+Vuelca a la base de datos las cantidades del carrito pendientes en caché
+(solo con ORDERS_CART_WRITE_BEHIND = True, ver orders.cart_buffer)
+Uso: python manage.py flush_cart_writes [--min-age 5] [--every 5]
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from orders.cart_buffer import flush_all
+
+
+class Command(BaseCommand):
+    help = 'Volcar en bloque las cantidades del carrito pendientes en caché'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=float, default=None,
+                            help='Solo carritos con cambios de hace al menos N segundos '
+                                 '(por defecto ORDERS_CART_FLUSH_DELAY)')
+        parser.add_argument('--every', type=float, default=0,
+                            help='Repetir cada N segundos en lugar de ejecutar una vez')
+
+    def handle(self, *args, **options):
+        min_age = options['min_age']
+        if min_age is None:
+            min_age = settings.ORDERS_CART_FLUSH_DELAY
+        while True:
+            lines = flush_all(min_age=min_age)
+            self.stdout.write(self.style.SUCCESS(f'✅ {lines} líneas volcadas'))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,37 @@
+"""
+Libera las reservas de stock vencidas (órdenes no pagadas a tiempo)
+Uso: python manage.py release_reservations [--batch-size 500] [--every 60] [--reconcile]
+
+Pensado para cron; con --every se queda ejecutándose como barrido en segundo plano.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from orders.reservations import reconcile_reserved_stock, release_expired
+from products.cache import bump_generation
+
+
+class Command(BaseCommand):
+    help = 'Devolver al catálogo el stock de las reservas vencidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--every', type=int, default=0,
+                            help='Repetir cada N segundos en lugar de ejecutar una vez')
+        parser.add_argument('--reconcile', action='store_true',
+                            help='Recalcular además Product.reserved_stock desde las reservas')
+
+    def handle(self, *args, **options):
+        while True:
+            self.sweep(options)
+            if not options['every']:
+                return
+            time.sleep(options['every'])
+
+    def sweep(self, options):
+        released = release_expired(batch_size=options['batch_size'])
+        if options['reconcile']:
+            reconcile_reserved_stock()
+        if released or options['reconcile']:
+            bump_generation()
+        self.stdout.write(self.style.SUCCESS(f'✅ {released} reservas liberadas'))
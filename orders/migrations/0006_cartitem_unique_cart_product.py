@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:29
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """
+    Une las líneas repetidas (mismo carrito y producto) en la más antigua,
+    sumando cantidades, y borra el resto con un único DELETE
+    """
+    CartItem = apps.get_model('orders', 'CartItem')
+    groups = (
+        CartItem.objects.order_by()
+        .values('cart', 'product')
+        .annotate(lines=Count('id'), keep=Min('id'), total=Sum('quantity'))
+        .filter(lines__gt=1)
+    )
+    totals = {group['keep']: group['total'] for group in groups}
+    if not totals:
+        return
+    kept = list(CartItem.objects.filter(pk__in=totals))
+    for item in kept:
+        item.quantity = totals[item.pk]
+    CartItem.objects.bulk_update(kept, ['quantity'], batch_size=500)
+
+    first_lines = CartItem.objects.order_by().values('cart', 'product').annotate(keep=Min('id')).values('keep')
+    CartItem.objects.exclude(pk__in=first_lines).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_stockreservation'),
+        ('products', '0007_product_reserved_stock'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
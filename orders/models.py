@@ -15,6 +15,12 @@ class CartItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     price_cents = models.IntegerField(default=0)
 
+    class Meta:
+        # Una línea por producto: agregar otra vez suma a la cantidad
+        constraints = [
+            models.UniqueConstraint(fields=["cart", "product"], name="unique_cart_product"),
+        ]
+
     def subtotal(self):
         return self.quantity * self.price_cents
 
@@ -48,3 +54,19 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.product.name} x{self.quantity}"
 
+
+
+class StockReservation(models.Model):
+    """
+    Unidades apartadas para una orden pendiente. Mientras existe, su cantidad
+    está sumada en Product.reserved_stock; se consume al pagar o se libera al
+    vencer (python manage.py release_reservations).
+    """
+    order = models.ForeignKey(Order, related_name="reservations", on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name="reservations", on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.product_id} x{self.quantity} (orden {self.order_id})"
@@ -0,0 +1,148 @@
+"""
+Reservas de stock
+
+El checkout aparta el stock de todo el carrito con un único UPDATE
+condicional (reserved_stock += q donde stock - reserved_stock >= q) y deja
+una StockReservation por producto. pay consume las reservas de la orden
+(stock -= q, reserved_stock -= q); las que vencen sin pagarse las devuelve
+release_expired(), que ejecuta el comando release_reservations.
+
+Product.reserved_stock solo se toca desde aquí, siempre con UPDATE.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from products.models import Product
+from .models import StockReservation
+
+
+class OutOfStock(Exception):
+    """No hay stock disponible para alguno de los productos"""
+
+    def __init__(self, products):
+        super().__init__(products)
+        self.products = products
+
+
+def reservation_ttl():
+    return timedelta(seconds=settings.ORDERS_RESERVATION_TTL)
+
+
+def _per_product(quantities):
+    """CASE id WHEN ... THEN q END: una cantidad distinta por producto en un solo UPDATE"""
+    return Case(
+        *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def reserve_stock(quantities):
+    """
+    Aparta `quantities` ({product_id: cantidad}). Si algún producto no tiene
+    stock disponible no se aparta nada y se lanza OutOfStock con esos productos.
+    """
+    wanted = _per_product(quantities)
+    try:
+        with transaction.atomic():
+            reserved = Product.objects.filter(
+                pk__in=quantities, stock__gte=F('reserved_stock') + wanted
+            ).update(reserved_stock=F('reserved_stock') + wanted, updated_at=timezone.now())
+            if reserved != len(quantities):
+                raise OutOfStock([])
+    except OutOfStock:
+        # Solo en el camino de error: averiguar qué productos faltan
+        products = Product.objects.filter(pk__in=quantities).only('id', 'name', 'stock', 'reserved_stock')
+        raise OutOfStock([p for p in products if p.available_stock < quantities[p.pk]])
+
+
+def record_reservations(order, quantities):
+    """Crea las StockReservation de lo apartado con reserve_stock()"""
+    expires_at = timezone.now() + reservation_ttl()
+    return StockReservation.objects.bulk_create([
+        StockReservation(order=order, product_id=product_id, quantity=quantity, expires_at=expires_at)
+        for product_id, quantity in quantities.items()
+    ])
+
+
+def _lock(reservations):
+    if connection.features.has_select_for_update_skip_locked:
+        return reservations.select_for_update(skip_locked=True)
+    return reservations.select_for_update()
+
+
+def _collect(reservations):
+    ids = []
+    quantities = defaultdict(int)
+    for pk, product_id, quantity in reservations.values_list('id', 'product_id', 'quantity'):
+        ids.append(pk)
+        quantities[product_id] += quantity
+    return ids, quantities
+
+
+@transaction.atomic
+def consume_reservations(order):
+    """
+    Convierte en venta lo reservado para `order`: descuenta stock y reserva a
+    la vez. Devuelve {product_id: cantidad} con lo consumido; las reservas
+    vencidas que el barrido aún no liberó siguen contando.
+    """
+    ids, quantities = _collect(order.reservations.select_for_update())
+    if not ids:
+        return {}
+    taken = _per_product(quantities)
+    Product.objects.filter(pk__in=quantities).update(
+        stock=F('stock') - taken,
+        reserved_stock=F('reserved_stock') - taken,
+        updated_at=timezone.now(),
+    )
+    StockReservation.objects.filter(pk__in=ids).delete()
+    return quantities
+
+
+@transaction.atomic
+def release_reservations(reservations):
+    """Devuelve al catálogo las reservas del queryset y las borra. Devuelve cuántas"""
+    ids, quantities = _collect(_lock(reservations))
+    if not ids:
+        return 0
+    freed = _per_product(quantities)
+    Product.objects.filter(pk__in=quantities).update(
+        reserved_stock=Greatest(F('reserved_stock') - freed, 0),
+        updated_at=timezone.now(),
+    )
+    StockReservation.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def release_expired(batch_size=500, now=None):
+    """Libera las reservas vencidas por lotes (una transacción corta por lote)"""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        batch = StockReservation.objects.filter(expires_at__lte=now).order_by('id')[:batch_size]
+        released = release_reservations(batch)
+        total += released
+        if released < batch_size:
+            return total
+
+
+def reconcile_reserved_stock():
+    """
+    Recalcula Product.reserved_stock desde las reservas existentes con un único
+    UPDATE. Útil si se borraron órdenes sin pasar por la API (admin, shell).
+    """
+    live = (
+        StockReservation.objects.filter(product=OuterRef('pk'))
+        .order_by()
+        .values('product')
+        .annotate(total=Sum('quantity'))
+        .values('total')
+    )
+    return Product.objects.update(reserved_stock=Coalesce(Subquery(live), 0))
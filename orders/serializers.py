@@ -10,17 +10,67 @@ class CartItemSerializer(serializers.ModelSerializer):
         source='product',
         write_only=True
     )
+    subtotal_cents = serializers.SerializerMethodField()
 
     class Meta:
         model = CartItem
-        fields = ["id", "product", "product_id", "quantity", "price_cents"]
+        fields = ["id", "product", "product_id", "quantity", "price_cents", "subtotal_cents"]
+
+    def get_subtotal_cents(self, obj):
+        # get_cart_for_read lo anota en la consulta; si no, se calcula aquí
+        if hasattr(obj, 'subtotal_cents'):
+            return obj.subtotal_cents
+        return obj.subtotal()
 
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
+    total_cents = serializers.SerializerMethodField()
 
     class Meta:
         model = Cart
-        fields = ["id", "items", "created_at"]
+        fields = ["id", "items", "total_cents", "created_at"]
+
+    def get_total_cents(self, obj):
+        # get_cart_for_read trae el total en cada línea (SUM OVER ())
+        items = obj.items.all()
+        if items and hasattr(items[0], 'cart_total'):
+            return items[0].cart_total
+        return sum(item.subtotal() for item in items)
+
+class CartLineSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+class CartReplaceSerializer(serializers.Serializer):
+    """
+    Cuerpo de PUT /api/cart/: la lista completa de líneas del carrito.
+    - mode=replace (por defecto): el carrito queda exactamente así
+    - mode=merge: las cantidades se suman a lo que ya hay
+    """
+    items = CartLineSerializer(many=True)
+    mode = serializers.ChoiceField(choices=["replace", "merge"], default="replace")
+
+    def validate_items(self, items):
+        # Líneas repetidas del mismo producto se suman
+        quantities = {}
+        for line in items:
+            product_id = line["product_id"]
+            quantities[product_id] = quantities.get(product_id, 0) + line["quantity"]
+        # Una sola consulta para todos los productos
+        prices = dict(Product.objects.filter(pk__in=quantities).order_by().values_list("id", "price"))
+        missing = sorted(set(quantities) - set(prices))
+        if missing:
+            raise serializers.ValidationError(
+                f"Productos inexistentes: {', '.join(str(pk) for pk in missing)}"
+            )
+        return [
+            {"product_id": product_id, "quantity": quantity, "price": prices[product_id]}
+            for product_id, quantity in quantities.items()
+        ]
+
+class GuestCartSerializer(serializers.Serializer):
+    """Cuerpo de PUT /api/cart/guest/"""
+    items = CartLineSerializer(many=True)
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source="product.name", read_only=True)
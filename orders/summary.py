@@ -0,0 +1,63 @@
+"""
+Resumen del carrito para el contador del header: unidades y total
+
+Se guarda por usuario en la caché `carts` (ver CACHES en settings), así que
+con la caché caliente GET /api/cart/summary/ no toca la base de datos. Cada
+escritura de líneas del carrito (orders.views, admin) llama a
+invalidate_cart_summary(); no se usan señales porque las escrituras en bloque
+(bulk_create, update, delete de querysets) no las emiten. Los cambios de
+cantidad que quedan en el buffer de escritura (orders.cart_buffer) ajustan
+el resumen en caché con adjust_cart_summary().
+"""
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+
+from .cart_buffer import flush_cart_writes
+from .models import CartItem
+
+
+def get_summary_cache():
+    return caches['carts']
+
+
+def summary_key(user_id):
+    return f'cart:summary:{user_id}'
+
+
+def get_cart_summary(user):
+    """{'item_count', 'total_cents'} del carrito de `user`, desde la caché si está"""
+    cache = get_summary_cache()
+    key = summary_key(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        flush_cart_writes(user.pk)
+        summary = CartItem.objects.filter(cart__user=user).aggregate(
+            item_count=Coalesce(Sum('quantity'), 0),
+            total_cents=Coalesce(Sum(F('quantity') * F('price_cents')), 0),
+        )
+        cache.set(key, summary)
+    return summary
+
+
+def invalidate_cart_summary(user_id):
+    """
+    Borra el resumen ya y otra vez al confirmar la transacción, por si una
+    lectura concurrente lo recalculó con el estado anterior
+    """
+    key = summary_key(user_id)
+    get_summary_cache().delete(key)
+    transaction.on_commit(lambda: get_summary_cache().delete(key))
+
+
+def adjust_cart_summary(user_id, quantity_delta, cents_delta):
+    """Corrige el resumen cacheado sin recalcularlo (si no está, no hace nada)"""
+    cache = get_summary_cache()
+    key = summary_key(user_id)
+    summary = cache.get(key)
+    if summary is not None:
+        cache.set(key, {
+            'item_count': summary['item_count'] + quantity_delta,
+            'total_cents': summary['total_cents'] + cents_delta,
+        })
@@ -1,3 +1,633 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
 
-# Create your tests here.
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from orders import cart_buffer
+from orders.models import Cart, CartItem, Order, OrderItem, StockReservation
+from orders.summary import get_summary_cache
+from products.models import Category, Product, ProductImage
+
+User = get_user_model()
+
+
+class OrdersAPITestCase(APITestCase):
+    """Base: usuario autenticado con carrito y productos"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="cliente", email="cliente@test.com", password="test12345"
+        )
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        # Los ids de usuario se repiten entre tests: empezar sin resúmenes cacheados
+        get_summary_cache().clear()
+
+    def make_products(self, count, stock=10, price="1000"):
+        return Product.objects.bulk_create([
+            Product(name=f"Producto {i}", description="d", stock=stock, price=price, material="oro")
+            for i in range(count)
+        ])
+
+    def fill_cart(self, count, quantity=2, price_cents=100000):
+        products = self.make_products(count)
+        CartItem.objects.bulk_create([
+            CartItem(cart=self.cart, product=p, quantity=quantity, price_cents=price_cents)
+            for p in products
+        ])
+        return products
+
+
+class CheckoutTest(OrdersAPITestCase):
+    """Tests para OrderViewSet.checkout"""
+
+    def checkout(self):
+        return self.client.post(
+            reverse("order-checkout"),
+            {"nombre": "Ana", "direccion": "Calle 1", "telefono": "300"},
+            format="json",
+        )
+
+    def test_checkout_creates_order_and_clears_cart(self):
+        """Test que el checkout crea la orden con su total y vacía el carrito"""
+        self.fill_cart(3, quantity=2, price_cents=150000)
+        response = self.checkout()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["total_cents"], 3 * 2 * 150000)
+        self.assertEqual(len(response.data["items"]), 3)
+        self.assertEqual(response.data["items"][0]["product_name"], "Producto 0")
+        order = Order.objects.get(pk=response.data["id"])
+        self.assertEqual((order.nombre, order.direccion, order.telefono), ("Ana", "Calle 1", "300"))
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+
+    def test_empty_cart(self):
+        """Test que un carrito vacío devuelve 400"""
+        response = self.checkout()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+    def test_constant_query_count(self):
+        """Test que el número de consultas no depende del tamaño del carrito"""
+        for size in (1, 10, 50):
+            self.fill_cart(size)
+            # savepoint, carrito, líneas+total, reserva de stock (savepoint,
+            # update, release), orden, items, reservas, vaciar carrito,
+            # orden + items para la respuesta, release
+            with self.assertNumQueries(13):
+                response = self.checkout()
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(response.data["items"]), size)
+
+
+class PayTest(OrdersAPITestCase):
+    """Tests para OrderViewSet.pay"""
+
+    def make_order(self, lines):
+        order = Order.objects.create(user=self.user, total_cents=0)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantity, price_cents=100000)
+            for product, quantity in lines
+        ])
+        return order
+
+    def pay(self, order):
+        return self.client.post(reverse("order-pay", kwargs={"pk": order.pk}))
+
+    def test_pay_decrements_stock(self):
+        """Test que pagar descuenta stock, sumando líneas del mismo producto"""
+        a, b = self.make_products(2, stock=5)
+        order = self.make_order([(a, 2), (b, 1), (a, 1)])
+        response = self.pay(order)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "paid")
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual((a.stock, b.stock), (2, 4))
+
+    def test_insufficient_stock_rolls_back(self):
+        """Test que si un producto no alcanza no se descuenta ninguno"""
+        a, b = self.make_products(2, stock=3)
+        order = self.make_order([(a, 1), (b, 4)])
+        response = self.pay(order)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["detail"], "Sin stock para Producto 1")
+        a.refresh_from_db()
+        order.refresh_from_db()
+        self.assertEqual(a.stock, 3)
+        self.assertEqual(order.status, "pending")
+
+    def test_cannot_pay_twice(self):
+        """Test que una orden pagada no se vuelve a cobrar"""
+        (a,) = self.make_products(1, stock=3)
+        order = self.make_order([(a, 1)])
+        self.pay(order)
+        response = self.pay(order)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        a.refresh_from_db()
+        self.assertEqual(a.stock, 2)
+
+
+class StockReservationTest(OrdersAPITestCase):
+    """Tests de las reservas de stock entre checkout y pago"""
+
+    def checkout(self):
+        return self.client.post(reverse("order-checkout"), {}, format="json")
+
+    def test_checkout_reserves_stock(self):
+        """Test que el checkout aparta el stock sin descontarlo"""
+        (product,) = self.fill_cart(1, quantity=3)
+        response = self.checkout()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.reserved_stock, product.available_stock), (10, 3, 7))
+        reservation = StockReservation.objects.get(order_id=response.data["id"])
+        self.assertEqual(reservation.quantity, 3)
+        self.assertGreater(reservation.expires_at, timezone.now())
+
+    def test_sold_out_checkout_creates_nothing(self):
+        """Test que si no hay stock disponible no se crea la orden ni se reserva nada"""
+        available, sold_out = self.make_products(2, stock=2)
+        Product.objects.filter(pk=sold_out.pk).update(reserved_stock=1)
+        CartItem.objects.bulk_create([
+            CartItem(cart=self.cart, product=available, quantity=2),
+            CartItem(cart=self.cart, product=sold_out, quantity=2),
+        ])
+        response = self.checkout()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["detail"], "Sin stock para Producto 1")
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 2)
+        available.refresh_from_db()
+        self.assertEqual(available.reserved_stock, 0)
+
+    def test_pay_consumes_reservation(self):
+        """Test que pagar convierte la reserva en venta"""
+        (product,) = self.fill_cart(1, quantity=4)
+        order_id = self.checkout().data["id"]
+        response = self.client.post(reverse("order-pay", kwargs={"pk": order_id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.reserved_stock), (6, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_reservations_block_other_buyers(self):
+        """Test que lo reservado no se puede vender a otro cliente"""
+        (product,) = self.fill_cart(1, quantity=8)
+        self.checkout()
+        other = User.objects.create_user(username="otro", email="otro@test.com", password="x")
+        order = Order.objects.create(user=other)
+        OrderItem.objects.create(order=order, product=product, quantity=3)
+        self.client.force_authenticate(other)
+        response = self.client.post(reverse("order-pay", kwargs={"pk": order.pk}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 10)
+
+    def test_release_expired(self):
+        """Test que el barrido devuelve al catálogo solo las reservas vencidas"""
+        a, b = self.fill_cart(2, quantity=2)
+        expired_order = self.checkout().data["id"]
+        StockReservation.objects.filter(order_id=expired_order).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        CartItem.objects.create(cart=self.cart, product=a, quantity=1)
+        self.checkout()
+
+        call_command("release_reservations", stdout=StringIO())
+
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual((a.reserved_stock, b.reserved_stock), (1, 0))
+        self.assertFalse(StockReservation.objects.filter(order_id=expired_order).exists())
+
+    def test_delete_order_releases(self):
+        """Test que borrar una orden pendiente libera su reserva"""
+        (product,) = self.fill_cart(1, quantity=2)
+        order_id = self.checkout().data["id"]
+        response = self.client.delete(reverse("order-detail", kwargs={"pk": order_id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        product.refresh_from_db()
+        self.assertEqual(product.reserved_stock, 0)
+
+    def test_available_filter(self):
+        """Test que el listado filtra por stock disponible descontando reservas"""
+        a, b = self.make_products(2, stock=5)
+        Product.objects.filter(pk=a.pk).update(reserved_stock=4)
+        response = self.client.get(reverse("product-list"), {"available_min": 2})
+        self.assertEqual([p["id"] for p in response.data], [b.pk])
+        self.assertEqual(response.data[0]["available_stock"], 5)
+
+    def test_save_keeps_reserved_stock(self):
+        """Test que un save() con la instancia desactualizada no pisa la reserva"""
+        (product,) = self.make_products(1)
+        product = Product.objects.get(pk=product.pk)
+        Product.objects.filter(pk=product.pk).update(reserved_stock=3)
+        product.stock = 20
+        product.save()
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.reserved_stock), (20, 3))
+
+    def test_stock_below_reserved_rejected(self):
+        """Test que la API y el admin rechazan un stock menor que lo reservado"""
+        from django.core.exceptions import ValidationError
+        (product,) = self.make_products(1, stock=5)
+        Product.objects.filter(pk=product.pk).update(reserved_stock=3)
+        admin = User.objects.create_user(username="jefa", email="jefa@test.com", password="x", is_admin=True)
+        self.client.force_authenticate(admin)
+        url = reverse("product-detail", kwargs={"pk": product.pk})
+        response = self.client.patch(url, {"stock": 2}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("stock", response.data)
+        self.assertEqual(self.client.patch(url, {"stock": 3}, format="json").status_code, status.HTTP_200_OK)
+
+        product = Product.objects.get(pk=product.pk)
+        product.stock = 1
+        with self.assertRaises(ValidationError):
+            product.full_clean()
+
+
+class ConcurrentPayTest(TransactionTestCase):
+    """Pagos concurrentes desde varios hilos contra el mismo producto"""
+
+    def test_no_oversell(self):
+        """Test que con N hilos pagando a la vez nunca se vende más del stock"""
+        stock, buyers = 5, 12
+        product = Product.objects.create(name="Edición limitada", price="1000", stock=stock)
+        orders = []
+        for i in range(buyers):
+            user = User.objects.create_user(username=f"u{i}", email=f"u{i}@test.com", password="x")
+            order = Order.objects.create(user=user)
+            OrderItem.objects.create(order=order, product=product, quantity=1, price_cents=100000)
+            orders.append(order)
+
+        barrier = threading.Barrier(buyers)
+
+        def buy(order):
+            client = APIClient()
+            client.force_authenticate(order.user)
+            barrier.wait()
+            try:
+                # SQLite tiene un único escritor: reintentar si la tabla está bloqueada
+                for _ in range(50):
+                    try:
+                        client.post(reverse("order-pay", kwargs={"pk": order.pk}))
+                        break
+                    except OperationalError:
+                        time.sleep(0.01)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=buy, args=(order,)) for order in orders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Se comprueba el estado confirmado en la base de datos: con la base de
+        # tests en memoria un reintento puede perder la respuesta del primer intento
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(Order.objects.filter(status="paid").count(), stock)
+
+
+class CartReadTest(OrdersAPITestCase):
+    """Tests para la lectura del carrito (GET /api/cart/)"""
+
+    def fill_cart(self, count, quantity=2, price_cents=100000):
+        category, _ = Category.objects.get_or_create(name="Collares", slug="collares")
+        products = super().fill_cart(count, quantity=quantity, price_cents=price_cents)
+        Product.objects.filter(pk__in=[p.pk for p in products]).update(category=category)
+        ProductImage.objects.bulk_create([
+            ProductImage(product=p, image=f"products/{p.pk}.jpg") for p in products
+        ])
+        return products
+
+    def test_subtotals_and_total(self):
+        """Test que el carrito trae subtotales por línea y el total"""
+        self.fill_cart(3, quantity=2, price_cents=150000)
+        data = self.client.get(reverse("cart-list")).json()
+        self.assertEqual([item["subtotal_cents"] for item in data["items"]], [300000] * 3)
+        self.assertEqual(data["total_cents"], 900000)
+        self.assertEqual(data["items"][0]["product"]["category_name"], "Collares")
+        self.assertEqual(len(data["items"][0]["product"]["uploaded_images"]), 1)
+
+    def test_empty_cart_total(self):
+        """Test que un carrito vacío tiene total 0"""
+        data = self.client.get(reverse("cart-list")).json()
+        self.assertEqual((data["items"], data["total_cents"]), ([], 0))
+
+    def test_constant_query_count(self):
+        """Test que el número de consultas no depende del número de líneas"""
+        for size in (1, 10, 100):
+            CartItem.objects.filter(cart=self.cart).delete()
+            self.fill_cart(size)
+            # carrito, líneas con producto y categoría, imágenes
+            with self.assertNumQueries(3):
+                response = self.client.get(reverse("cart-list"))
+            self.assertEqual(len(response.data["items"]), size)
+            self.assertEqual(response.data["total_cents"], size * 2 * 100000)
+
+
+class CartReplaceTest(OrdersAPITestCase):
+    """Tests para PUT /api/cart/ (reemplazo y mezcla del carrito completo)"""
+
+    def put(self, items, mode=None):
+        body = {"items": [{"product_id": p.pk, "quantity": q} for p, q in items]}
+        if mode:
+            body["mode"] = mode
+        return self.client.put(reverse("cart-list"), body, format="json")
+
+    def quantities(self):
+        return dict(CartItem.objects.filter(cart=self.cart).values_list("product_id", "quantity"))
+
+    def test_replace(self):
+        """Test que replace deja el carrito exactamente como la lista recibida"""
+        kept, dropped = self.fill_cart(2, quantity=1)
+        (new,) = self.make_products(1, price="2500.50")
+        response = self.put([(kept, 3), (new, 2), (new, 1)])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.quantities(), {kept.pk: 3, new.pk: 3})
+        line = next(item for item in response.data["items"] if item["product"]["id"] == new.pk)
+        self.assertEqual((line["price_cents"], line["subtotal_cents"]), (250050, 750150))
+
+    def test_merge(self):
+        """Test que merge suma cantidades y conserva las líneas que no venían"""
+        a, b = self.fill_cart(2, quantity=1)
+        (c,) = self.make_products(1)
+        self.put([(a, 2), (c, 1)], mode="merge")
+        self.assertEqual(self.quantities(), {a.pk: 3, b.pk: 1, c.pk: 1})
+
+    def test_unknown_product_changes_nothing(self):
+        """Test que un producto inexistente devuelve 400 sin tocar el carrito"""
+        (a,) = self.fill_cart(1, quantity=1)
+        response = self.client.put(
+            reverse("cart-list"),
+            {"items": [{"product_id": a.pk, "quantity": 5}, {"product_id": 999999, "quantity": 1}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.quantities(), {a.pk: 1})
+
+    def test_constant_query_count(self):
+        """Test que el número de consultas no depende del número de líneas"""
+        for size in (2, 10, 50):
+            CartItem.objects.filter(cart=self.cart).delete()
+            existing = self.fill_cart(size, quantity=1)
+            new = self.make_products(size)
+            # savepoint, productos, carrito, líneas actuales, delete, update,
+            # insert, líneas para la respuesta, imágenes, release
+            with self.assertNumQueries(10):
+                response = self.put([(p, 2) for p in existing[: size // 2] + new])
+            self.assertEqual(len(response.data["items"]), size // 2 + size)
+
+
+class CartItemUpsertTest(OrdersAPITestCase):
+    """Tests para POST /api/cart/items/ como upsert"""
+
+    def add(self, product, quantity):
+        return self.client.post(
+            reverse("cart-item-list"), {"product_id": product.pk, "quantity": quantity}, format="json"
+        )
+
+    def test_adding_twice_sums_quantity(self):
+        """Test que agregar el mismo producto dos veces suma en una sola línea"""
+        (product,) = self.make_products(1)
+        self.add(product, 2)
+        response = self.add(product, 3)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["quantity"], 5)
+        self.assertEqual(
+            list(CartItem.objects.filter(cart=self.cart).values_list("quantity", flat=True)), [5]
+        )
+
+    def test_unique_constraint(self):
+        """Test que la base de datos no admite líneas repetidas"""
+        (product,) = self.make_products(1)
+        CartItem.objects.create(cart=self.cart, product=product)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CartItem.objects.create(cart=self.cart, product=product)
+
+
+class CartSummaryTest(OrdersAPITestCase):
+    """Tests para GET /api/cart/summary/ y el carrito memoizado por petición"""
+
+    def summary(self):
+        return self.client.get(reverse("cart-summary")).json()
+
+    def test_summary(self):
+        """Test que el resumen trae unidades y total"""
+        self.fill_cart(2, quantity=3, price_cents=1000)
+        self.assertEqual(self.summary(), {"item_count": 6, "total_cents": 6000})
+
+    def test_warm_cache_does_no_queries(self):
+        """Test que con la caché caliente el resumen no toca la base de datos"""
+        self.fill_cart(1)
+        self.summary()
+        with self.assertNumQueries(0):
+            self.summary()
+
+    def test_writes_invalidate(self):
+        """Test que cada escritura del carrito actualiza el resumen"""
+        (product,) = self.make_products(1, price="10")
+        self.assertEqual(self.summary()["item_count"], 0)
+
+        response = self.client.post(
+            reverse("cart-item-list"), {"product_id": product.pk, "quantity": 2}, format="json"
+        )
+        self.assertEqual(self.summary(), {"item_count": 2, "total_cents": 2000})
+
+        self.client.patch(
+            reverse("cart-item-detail", kwargs={"pk": response.data["id"]}), {"quantity": 5}, format="json"
+        )
+        self.assertEqual(self.summary()["item_count"], 5)
+
+        self.client.put(reverse("cart-list"), {"items": [{"product_id": product.pk, "quantity": 1}]}, format="json")
+        self.assertEqual(self.summary()["item_count"], 1)
+
+        self.client.delete(reverse("cart-clear"))
+        self.assertEqual(self.summary(), {"item_count": 0, "total_cents": 0})
+
+        self.fill_cart(1)
+        get_summary_cache().clear()
+        self.summary()
+        self.client.post(reverse("order-checkout"), {}, format="json")
+        self.assertEqual(self.summary()["item_count"], 0)
+
+    def test_cart_resolved_once_per_request(self):
+        """Test que agregar una línea resuelve el carrito una sola vez"""
+        (product,) = self.make_products(1)
+        # producto, carrito (una vez), update, savepoint, insert, release,
+        # imágenes para la respuesta
+        with self.assertNumQueries(7):
+            self.client.post(
+                reverse("cart-item-list"), {"product_id": product.pk, "quantity": 1}, format="json"
+            )
+
+
+CART_WRITES_DIR = os.path.join(tempfile.gettempdir(), "almadeoro-test-cart-writes")
+
+
+@override_settings(
+    ORDERS_CART_WRITE_BEHIND=True, ORDERS_CART_FLUSH_DELAY=60,
+    CACHES={**settings.CACHES, "cart_writes": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": CART_WRITES_DIR, "TIMEOUT": None,
+    }},
+)
+class CartWriteBehindTest(OrdersAPITestCase):
+    """Tests para el buffer de escritura de cantidades del carrito"""
+
+    def setUp(self):
+        super().setUp()
+        caches["cart_writes"].clear()
+        (self.product,) = self.fill_cart(1, quantity=1, price_cents=1000)
+        self.item = CartItem.objects.get(cart=self.cart)
+        self.url = reverse("cart-item-detail", kwargs={"pk": self.item.pk})
+
+    def patch(self, quantity):
+        return self.client.patch(self.url, {"quantity": quantity}, format="json")
+
+    def stored_quantity(self):
+        self.item.refresh_from_db()
+        return self.item.quantity
+
+    def test_patch_is_buffered(self):
+        """Test que los PATCH de cantidad no escriben en la base de datos"""
+        self.client.get(reverse("cart-summary"))
+        for quantity in (2, 3, 4):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.patch(quantity)
+            self.assertEqual(response.data["quantity"], quantity)
+            self.assertTrue(all(q["sql"].startswith("SELECT") for q in ctx.captured_queries))
+        self.assertEqual(self.stored_quantity(), 1)
+        # El resumen cacheado se ajusta sin volver a la base de datos
+        with self.assertNumQueries(0):
+            summary = self.client.get(reverse("cart-summary")).json()
+        self.assertEqual(summary, {"item_count": 4, "total_cents": 4000})
+
+    def test_reads_flush_first(self):
+        """Test que leer el carrito vuelca antes lo pendiente"""
+        self.patch(5)
+        response = self.client.get(reverse("cart-list"))
+        self.assertEqual(response.data["items"][0]["quantity"], 5)
+        self.assertEqual(self.stored_quantity(), 5)
+
+    def test_checkout_sees_flushed_state(self):
+        """Test que el checkout usa las cantidades pendientes"""
+        self.patch(3)
+        response = self.client.post(reverse("order-checkout"), {}, format="json")
+        self.assertEqual(response.data["total_cents"], 3000)
+        self.assertEqual(response.data["items"][0]["quantity"], 3)
+
+    def test_upsert_after_buffered_patch(self):
+        """Test que agregar unidades parte de la cantidad pendiente"""
+        self.patch(4)
+        self.client.post(
+            reverse("cart-item-list"), {"product_id": self.product.pk, "quantity": 1}, format="json"
+        )
+        self.assertEqual(self.stored_quantity(), 5)
+
+    def test_flush_command(self):
+        """Test que flush_cart_writes vuelca los carritos pendientes"""
+        self.patch(7)
+        call_command("flush_cart_writes", min_age=0, stdout=StringIO())
+        self.assertEqual(self.stored_quantity(), 7)
+
+    def test_flush_command_keeps_recent_carts(self):
+        """Test que un carrito sin la antigüedad mínima se vuelca en la siguiente pasada"""
+        self.patch(6)
+        self.assertEqual(cart_buffer.flush_all(min_age=60), 0)
+        self.assertEqual(self.stored_quantity(), 1)
+        self.assertEqual(cart_buffer.flush_all(min_age=0), 1)
+        self.assertEqual(self.stored_quantity(), 6)
+
+    def test_lines_buffered_separately(self):
+        """Test que cada línea tiene su propia clave y se vuelcan todas juntas"""
+        (other,) = self.fill_cart(1, quantity=1, price_cents=1000)
+        other_item = CartItem.objects.get(cart=self.cart, product=other)
+        self.patch(2)
+        self.client.patch(
+            reverse("cart-item-detail", kwargs={"pk": other_item.pk}), {"quantity": 9}, format="json"
+        )
+        cache = caches["cart_writes"]
+        self.assertEqual(cache.get(cart_buffer.pending_key(self.user.pk, other_item.pk)), 9)
+        self.assertEqual(cart_buffer.flush_cart_writes(self.user.pk), 2)
+        other_item.refresh_from_db()
+        self.assertEqual((self.stored_quantity(), other_item.quantity), (2, 9))
+
+    def test_local_cache_writes_directly(self):
+        """Test que con una caché no compartida (locmem) el PATCH escribe en la base de datos"""
+        local = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "cart-writes-test"}
+        with self.settings(CACHES={**settings.CACHES, "cart_writes": local}):
+            self.patch(8)
+            self.assertEqual(self.stored_quantity(), 8)
+
+
+class GuestCartTest(APITestCase):
+    """Tests para el carrito de invitado en cookie firmada"""
+
+    def setUp(self):
+        get_summary_cache().clear()
+        self.ring, self.chain = Product.objects.bulk_create([
+            Product(name="Anillo", description="", stock=5, price="1200.50", material="oro"),
+            Product(name="Cadena", description="", stock=5, price="800", material="oro"),
+        ])
+        self.inactive = Product.objects.create(
+            name="Retirado", description="", stock=5, price="10", material="oro", is_active=False
+        )
+
+    def put(self, items):
+        return self.client.put(
+            reverse("guest-cart"),
+            {"items": [{"product_id": p.pk, "quantity": q} for p, q in items]},
+            format="json",
+        )
+
+    def test_put_and_get_without_writes(self):
+        """Test que el carrito de invitado vive en la cookie y no escribe en la base de datos"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.put([(self.ring, 2), (self.chain, 1), (self.inactive, 1)])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(response.data["total_cents"], 2 * 120050 + 80000)
+        self.assertIn("guest_cart", response.cookies)
+        self.assertFalse(Cart.objects.exists())
+
+        data = self.client.get(reverse("guest-cart")).data
+        self.assertEqual([i["product_id"] for i in data["items"]], [self.ring.pk, self.chain.pk])
+
+    def test_tampered_cookie_is_ignored(self):
+        """Test que una cookie alterada se trata como carrito vacío"""
+        self.put([(self.ring, 1)])
+        self.client.cookies["guest_cart"] = self.client.cookies["guest_cart"].value + "x"
+        self.assertEqual(self.client.get(reverse("guest-cart")).data["items"], [])
+
+    def test_login_merges_into_cart(self):
+        """Test que al iniciar sesión el carrito de invitado se suma al del usuario"""
+        user = User.objects.create_user(username="ana", email="ana@test.com", password="clave12345")
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.ring, quantity=1, price_cents=100000)
+        self.put([(self.ring, 2), (self.chain, 1)])
+
+        response = self.client.post(
+            reverse("token_obtain_pair"), {"email": "ana@test.com", "password": "clave12345"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access", response.data)
+        self.assertEqual(response.cookies["guest_cart"].value, "")
+        lines = dict(CartItem.objects.filter(cart=cart).values_list("product_id", "quantity"))
+        self.assertEqual(lines, {self.ring.pk: 3, self.chain.pk: 1})
+        self.assertEqual(CartItem.objects.get(cart=cart, product=self.ring).price_cents, 120050)
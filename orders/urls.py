@@ -1,12 +1,23 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CartViewSet, CartItemViewSet, OrderViewSet
+from .views import CartViewSet, CartItemViewSet, GuestCartAPIView, OrderViewSet
 
-router = DefaultRouter()
+
+class CartRouter(DefaultRouter):
+    """DefaultRouter que además acepta PUT en la ruta de listado (`replace`)"""
+    routes = [
+        route._replace(mapping={**route.mapping, "put": "replace"})
+        if getattr(route, "name", None) == "{basename}-list" else route
+        for route in DefaultRouter.routes
+    ]
+
+
+router = CartRouter()
 router.register(r"cart", CartViewSet, basename="cart")
 router.register(r"cart/items", CartItemViewSet, basename="cart-item")
 router.register(r"orders", OrderViewSet, basename="order")
 
 urlpatterns = [
+    path("cart/guest/", GuestCartAPIView.as_view(), name="guest-cart"),
     path("", include(router.urls)),
 ]
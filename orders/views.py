@@ -1,45 +1,262 @@
+from collections import defaultdict
 from decimal import Decimal
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch, Sum, Window, prefetch_related_objects
+from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.views import TokenObtainPairView
 from .models import Cart, CartItem, Order, OrderItem
+from .reservations import OutOfStock, consume_reservations, record_reservations, release_reservations, reserve_stock
+from products.cache import bump_generation
 from products.models import Product
-from .serializers import CartSerializer, CartItemSerializer, OrderSerializer
+from . import cart_buffer
+from .guest_cart import (
+    delete_guest_cart_cookie, load_guest_cart, merge_guest_cart, price_guest_cart, set_guest_cart_cookie,
+)
+from .summary import adjust_cart_summary, get_cart_summary, invalidate_cart_summary
+from .serializers import CartReplaceSerializer, CartSerializer, CartItemSerializer, GuestCartSerializer, OrderSerializer
 
 
-def get_or_create_cart(user):
-    cart, _ = Cart.objects.get_or_create(user=user)
+def get_or_create_cart(request):
+    """Carrito del usuario de la petición; se resuelve una sola vez por petición"""
+    cart = getattr(request, "_cart", None)
+    if cart is None:
+        cart, _ = Cart.objects.get_or_create(user=request.user)
+        request._cart = cart
     return cart
 
 
+def price_to_cents(price):
+    return int(Decimal(price) * 100)
+
+
+def prefetch_cart_for_read(cart):
+    """
+    Deja las líneas de `cart` listas para CartSerializer en un número fijo de
+    consultas: producto y categoría por JOIN, imágenes en una sola consulta y
+    subtotales y total calculados por la base de datos
+    """
+    subtotal = F("quantity") * F("price_cents")
+    items = (
+        CartItem.objects.select_related("product__category")
+        .prefetch_related("product__uploaded_images")
+        .annotate(subtotal_cents=subtotal, cart_total=Window(Sum(subtotal)))
+        .order_by("id")
+    )
+    prefetch_related_objects([cart], Prefetch("items", queryset=items))
+    return cart
+
+
+def get_cart_for_read(request):
+    return prefetch_cart_for_read(get_or_create_cart(request))
+
+
 class CartViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def list(self, request):
-        cart = get_or_create_cart(request.user)
+        cart_buffer.flush_cart_writes(request.user.pk)
+        cart = get_cart_for_read(request)
         return Response(CartSerializer(cart).data)
 
+    @transaction.atomic
+    def replace(self, request):
+        """
+        PUT /api/cart/ - Reemplaza (o mezcla, con mode=merge) el carrito
+        completo en una sola petición:
+        {"items": [{"product_id": 1, "quantity": 2}, ...], "mode": "replace"}
+
+        Una consulta de productos, una de líneas actuales y a lo sumo un
+        bulk_create, un bulk_update y un DELETE.
+        """
+        serializer = CartReplaceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        merge = serializer.validated_data["mode"] == "merge"
+
+        cart_buffer.flush_cart_writes(request.user.pk)
+        cart = get_or_create_cart(request)
+        current = {item.product_id: item for item in cart.items.all()}
+
+        to_create, to_update = [], []
+        for line in serializer.validated_data["items"]:
+            price_cents = price_to_cents(line["price"])
+            item = current.pop(line["product_id"], None)
+            if item is None:
+                to_create.append(CartItem(
+                    cart=cart, product_id=line["product_id"],
+                    quantity=line["quantity"], price_cents=price_cents,
+                ))
+            else:
+                item.quantity = item.quantity + line["quantity"] if merge else line["quantity"]
+                item.price_cents = price_cents
+                to_update.append(item)
+        # En modo merge las líneas que no venían se conservan tal cual
+        stale = [] if merge else [item.pk for item in current.values()]
+
+        if stale:
+            CartItem.objects.filter(pk__in=stale).delete()
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ["quantity", "price_cents"])
+        if to_create:
+            CartItem.objects.bulk_create(to_create)
+        invalidate_cart_summary(cart.user_id)
+
+        return Response(CartSerializer(prefetch_cart_for_read(cart)).data)
+
     @action(detail=False, methods=["delete"])
     def clear(self, request):
-        cart = get_or_create_cart(request.user)
+        cart = get_or_create_cart(request)
+        cart_buffer.discard_cart_writes(cart.user_id)
         cart.items.all().delete()
+        invalidate_cart_summary(cart.user_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=["get"])
+    def summary(self, request):
+        """
+        GET /api/cart/summary/ - Unidades y total del carrito para el contador
+        del header: {"item_count": 3, "total_cents": 450000}. Con la caché
+        caliente no consulta la base de datos (ver orders.summary).
+        """
+        return Response(get_cart_summary(request.user))
+
 
 class CartItemViewSet(viewsets.ModelViewSet):
     serializer_class = CartItemSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        cart = get_or_create_cart(self.request.user)
+        cart = get_or_create_cart(self.request)
+        if not self.buffers_quantity():
+            # Cualquier otra operación ve (y escribe sobre) el estado volcado
+            cart_buffer.flush_cart_writes(cart.user_id)
         return CartItem.objects.filter(cart=cart)
 
+    def buffers_quantity(self):
+        """PATCH que solo cambia la cantidad, con el buffer de escritura activo"""
+        return (
+            cart_buffer.is_enabled()
+            and self.action == "partial_update"
+            and set(self.request.data) == {"quantity"}
+        )
+
     def perform_create(self, serializer):
-        cart = get_or_create_cart(self.request.user)
+        """
+        Upsert: si el producto ya está en el carrito se suma la cantidad con
+        un UPDATE atómico (quantity = quantity + n); si no, se inserta. Si
+        otra petición inserta la misma línea a la vez, la restricción
+        unique_cart_product lo detecta y se vuelve al UPDATE.
+        """
+        cart = get_or_create_cart(self.request)
+        # La suma debe partir de la cantidad pendiente en el buffer, si la hay
+        cart_buffer.flush_cart_writes(cart.user_id)
         product = serializer.validated_data["product"]
-        price_cents = int(Decimal(product.price) * 100)
-        serializer.save(cart=cart, price_cents=price_cents)
+        quantity = serializer.validated_data.get("quantity", 1)
+        price_cents = price_to_cents(product.price)
+        line = CartItem.objects.filter(cart=cart, product=product)
+
+        created = False
+        if not line.update(quantity=F("quantity") + quantity, price_cents=price_cents):
+            try:
+                with transaction.atomic():
+                    serializer.save(cart=cart, price_cents=price_cents)
+                created = True
+            except IntegrityError:
+                line.update(quantity=F("quantity") + quantity, price_cents=price_cents)
+        if not created:
+            serializer.instance = line.select_related("product__category").get()
+        invalidate_cart_summary(cart.user_id)
+
+    def perform_update(self, serializer):
+        if not self.buffers_quantity():
+            serializer.save()
+            invalidate_cart_summary(self.request.user.pk)
+            return
+        # Write-behind: la cantidad queda en la caché y se vuelca más tarde
+        item = serializer.instance
+        quantity = serializer.validated_data["quantity"]
+        user_id = self.request.user.pk
+        previous = cart_buffer.buffer_quantity(user_id, item.pk, quantity)
+        if previous is None:
+            previous = item.quantity
+        adjust_cart_summary(user_id, quantity - previous, (quantity - previous) * item.price_cents)
+        item.quantity = quantity
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_cart_summary(self.request.user.pk)
+
+
+class GuestCartAPIView(APIView):
+    """
+    Carrito de invitado en cookie firmada (ver orders.guest_cart)
+
+    GET /api/cart/guest/ - Líneas con el precio actual y total
+    PUT /api/cart/guest/ - Reemplaza las líneas: {"items": [{"product_id": 1, "quantity": 2}]}
+    DELETE /api/cart/guest/ - Vacía el carrito
+
+    Nunca escribe en la base de datos; se une al carrito del usuario al
+    iniciar sesión (CartMergingTokenObtainPairView).
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        lines = price_guest_cart(load_guest_cart(request))
+        return Response(self.represent(lines))
+
+    def put(self, request):
+        serializer = GuestCartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        quantities = defaultdict(int)
+        for line in serializer.validated_data["items"]:
+            quantities[line["product_id"]] += line["quantity"]
+        lines = price_guest_cart(quantities)
+        response = Response(self.represent(lines))
+        set_guest_cart_cookie(response, request, lines)
+        return response
+
+    def delete(self, request):
+        response = Response(status=status.HTTP_204_NO_CONTENT)
+        delete_guest_cart_cookie(response)
+        return response
+
+    @staticmethod
+    def represent(lines):
+        items = [
+            {
+                "product_id": product_id,
+                "quantity": quantity,
+                "price_cents": price_cents,
+                "subtotal_cents": quantity * price_cents,
+            }
+            for product_id, quantity, price_cents in lines
+        ]
+        return {"items": items, "total_cents": sum(item["subtotal_cents"] for item in items)}
+
+
+class CartMergingTokenObtainPairView(TokenObtainPairView):
+    """
+    Login JWT (POST /api/auth/token/) que además pasa el carrito de invitado
+    de la cookie al carrito del usuario y borra la cookie
+    """
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        response = Response(serializer.validated_data, status=status.HTTP_200_OK)
+        quantities = load_guest_cart(request)
+        if quantities:
+            merge_guest_cart(serializer.user, quantities)
+            delete_guest_cart_cookie(response)
+        return response
 
 
 # ===============================
@@ -50,70 +267,129 @@ class OrderViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).prefetch_related("items")
+        return Order.objects.filter(user=self.request.user).prefetch_related(
+            Prefetch("items", queryset=OrderItem.objects.select_related("product"))
+        )
 
     @transaction.atomic
     @action(detail=False, methods=["post"], url_path="checkout")
     def checkout(self, request):
         """
         Crea una orden desde el carrito y guarda los datos del cliente (nombre, dirección, teléfono)
+
+        El stock del carrito queda reservado (ORDERS_RESERVATION_TTL) hasta
+        que se paga la orden o vence la reserva; si algo está agotado se
+        responde 400 sin crear la orden.
         """
         user = request.user
-        cart = get_or_create_cart(user)
+        cart = get_or_create_cart(request)
+        # El checkout siempre parte del carrito con todas las cantidades volcadas
+        cart_buffer.flush_cart_writes(user.pk)
 
-        if not cart.items.exists():
+        # Una sola lectura del carrito; el total sale de la misma consulta
+        lines = list(
+            cart.items.order_by("id").values("product_id", "quantity", "price_cents").annotate(
+                cart_total=Window(Sum(F("quantity") * F("price_cents")))
+            )
+        )
+        if not lines:
             return Response({"detail": "Carrito vacío"}, status=status.HTTP_400_BAD_REQUEST)
 
+        quantities = defaultdict(int)
+        for line in lines:
+            quantities[line["product_id"]] += line["quantity"]
+        try:
+            reserve_stock(quantities)
+        except OutOfStock as exc:
+            names = ", ".join(product.name for product in exc.products) or "algunos productos"
+            return Response({"detail": f"Sin stock para {names}"}, status=status.HTTP_400_BAD_REQUEST)
+
         # 📦 Obtener datos de envío del cuerpo del request
         nombre = request.data.get("nombre", "")
         direccion = request.data.get("direccion", "")
         telefono = request.data.get("telefono", "")
 
-        # Crear la orden
+        # Crear la orden ya con su total
         order = Order.objects.create(
             user=user,
             status="pending",
             nombre=nombre,
             direccion=direccion,
             telefono=telefono,
+            total_cents=lines[0]["cart_total"],
         )
 
-        total = 0
-        for ci in cart.items.select_related("product"):
-            OrderItem.objects.create(
+        OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
-                product=ci.product,
-                quantity=ci.quantity,
-                price_cents=ci.price_cents,
+                product_id=line["product_id"],
+                quantity=line["quantity"],
+                price_cents=line["price_cents"],
             )
-            total += ci.quantity * ci.price_cents
-
-        order.total_cents = total
-        order.save()
+            for line in lines
+        ])
+        record_reservations(order, quantities)
 
         # Vaciar carrito
         cart.items.all().delete()
+        invalidate_cart_summary(cart.user_id)
 
+        # Cambió el stock disponible del catálogo
+        bump_generation()
+
+        order = self.get_queryset().get(pk=order.pk)
         return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
 
     @transaction.atomic
     @action(detail=True, methods=["post"], url_path="pay")
     def pay(self, request, pk=None):
         """
-        Marcar una orden como pagada y actualizar stock.
+        Marcar una orden como pagada y descontar stock.
+
+        Primero se consume lo reservado en el checkout; lo que no tenga reserva
+        (vencida y ya liberada) se descuenta con un UPDATE condicional
+        (stock = stock - q WHERE stock - reserved_stock >= q). Si algo no
+        alcanza se revierte toda la transacción, así dos pagos concurrentes
+        nunca sobrevenden.
         """
         order = self.get_object()
         if order.status != "pending":
             return Response({"detail": "La orden no está pendiente"}, status=status.HTTP_400_BAD_REQUEST)
 
-        for item in order.items.select_related("product"):
-            if item.quantity > item.product.stock:
-                return Response({"detail": f"Sin stock para {item.product.name}"}, status=status.HTTP_400_BAD_REQUEST)
+        # Reclamar la orden: solo uno de dos pagos simultáneos la encuentra pendiente
+        if not Order.objects.filter(pk=order.pk, status="pending").update(status="paid"):
+            return Response({"detail": "La orden no está pendiente"}, status=status.HTTP_400_BAD_REQUEST)
 
-        for item in order.items.select_related("product"):
-            item.product.stock -= item.quantity
-            item.product.save()
+        quantities = defaultdict(int)
+        names = {}
+        for item in order.items.all():
+            quantities[item.product_id] += item.quantity
+            names[item.product_id] = item.product.name
+
+        reserved = consume_reservations(order)
+
+        now = timezone.now()
+        # Orden fijo por id para no provocar interbloqueos entre pagos
+        for product_id in sorted(quantities):
+            quantity = quantities[product_id] - reserved.get(product_id, 0)
+            if quantity <= 0:
+                continue
+            updated = Product.objects.filter(pk=product_id, stock__gte=F("reserved_stock") + quantity).update(
+                stock=F("stock") - quantity, updated_at=now
+            )
+            if not updated:
+                transaction.set_rollback(True)
+                return Response({"detail": f"Sin stock para {names[product_id]}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # El stock cambió sin pasar por save(): invalidar la caché del catálogo
+        bump_generation()
 
         order.status = "paid"
-        order.save()
         return Response(OrderSerializer(order).data)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # Devolver al catálogo lo que la orden tenía reservado
+        if release_reservations(instance.reservations.all()):
+            bump_generation()
+        instance.delete()
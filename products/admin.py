@@ -1,4 +1,5 @@
 from django.contrib import admin
+from .images import create_derivatives
 from .models import Product, ProductImage, Category
 
 
@@ -7,6 +8,13 @@ class ProductImageInline(admin.TabularInline):
     extra = 1
 
 
+def changed_images(formset):
+    """ProductImage nuevas o con otro fichero tras guardar un formset"""
+    images = list(formset.new_objects)
+    images += [obj for obj, fields in formset.changed_objects if 'image' in fields]
+    return images
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ("name", "category", "price", "stock", "is_active")
@@ -14,11 +22,22 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ("is_active", "category")
     inlines = [ProductImageInline]
 
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        if formset.model is ProductImage:
+            for image in changed_images(formset):
+                create_derivatives(image)
+
 
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
     list_display = ("product",)
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            create_derivatives(obj)
+
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
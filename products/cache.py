@@ -0,0 +1,210 @@
+"""
+Caché de respuestas de lectura del catálogo
+
+Las respuestas de list/retrieve se guardan en la caché `catalog` (ver CACHES
+en settings) bajo una clave que incluye un contador de generación. Cualquier
+escritura en Product, Category o ProductImage incrementa la generación
+(products.signals), así que las entradas anteriores dejan de usarse y
+desaparecen solas por TTL/LRU.
+
+Además cada respuesta lleva ETag y Last-Modified, calculados con un único
+agregado (Max(updated_at) + Count) sobre el queryset filtrado, y las
+peticiones condicionales se responden con 304 antes de serializar nada.
+Last-Modified nunca es anterior a la última invalidación: desactivar o borrar
+un producto que no es el más reciente, o renombrar una categoría, no cambia
+Max(updated_at).
+
+La generación solo invalida a los demás procesos si `catalog` es una caché
+compartida (file, redis). Con locmem cada worker tiene la suya y no ve las
+escrituras de los otros, así que allí las respuestas se guardan solo
+CATALOG_CACHE_LOCAL_TTL segundos (0: sin caché de respuestas).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+GENERATION_KEY = 'catalog:generation'
+# Momento (segundos) de la última invalidación, para Last-Modified
+GENERATION_TIME_KEY = 'catalog:generation:time'
+
+
+def get_catalog_cache():
+    return caches['catalog']
+
+
+def is_shared_cache(cache):
+    """
+    True si todos los procesos ven las mismas entradas. locmem vive en la
+    memoria de cada proceso y dummy no guarda nada: lo que dependa de que
+    otro worker vea una escritura (invalidaciones, buffers) no puede usarlos
+    """
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def response_cache_ttl():
+    """TTL de las respuestas y validadores: el de la caché si es compartida, si no el local"""
+    if is_shared_cache(get_catalog_cache()):
+        return DEFAULT_TIMEOUT
+    return settings.CATALOG_CACHE_LOCAL_TTL
+
+
+def get_generation():
+    cache = get_catalog_cache()
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Se parte del reloj: si la clave se pierde no se reutiliza una generación vieja
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY, 0)
+    return generation
+
+
+def get_generation_time():
+    """Segundos de la última invalidación; si la clave se perdió cuenta como ahora"""
+    cache = get_catalog_cache()
+    generation_time = cache.get(GENERATION_TIME_KEY)
+    if generation_time is None:
+        cache.add(GENERATION_TIME_KEY, int(time.time()), timeout=None)
+        generation_time = cache.get(GENERATION_TIME_KEY, int(time.time()))
+    return generation_time
+
+
+def _incr_generation():
+    cache = get_catalog_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
+    cache.set(GENERATION_TIME_KEY, int(time.time()), timeout=None)
+
+
+def bump_generation():
+    """
+    Invalida todas las respuestas cacheadas. Se incrementa ya y otra vez al
+    confirmar la transacción, por si una lectura concurrente cacheó el estado
+    anterior con la generación nueva.
+    """
+    _incr_generation()
+    transaction.on_commit(_incr_generation)
+
+
+def is_catalog_admin(user):
+    return bool(user and user.is_authenticated and getattr(user, "is_admin", False))
+
+
+class CachedReadMixin:
+    """
+    Mixin para ViewSets del catálogo: cachea las respuestas 200 de list y
+    retrieve. La clave depende de la generación, la vista, el pk, si el
+    usuario es admin (ven distintos datos), el host (URLs absolutas) y el
+    query string normalizado (orden de parámetros irrelevante).
+
+    También responde GET condicionales (If-None-Match / If-Modified-Since).
+    Los validadores se cachean con la misma clave, así que con la caché
+    caliente ni el 304 ni el 200 tocan la base de datos.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cache_key(self, request):
+        params = sorted(
+            (key, sorted(values)) for key, values in request.query_params.lists()
+        )
+        raw = repr((
+            self.basename,
+            self.action,
+            self.kwargs.get(self.lookup_url_kwarg or self.lookup_field),
+            is_catalog_admin(request.user),
+            request.scheme,
+            request.get_host(),
+            params,
+        ))
+        digest = hashlib.sha1(raw.encode()).hexdigest()
+        return f'catalog:{get_generation()}:{digest}'
+
+    def get_conditional_queryset(self):
+        """Queryset sobre el que se calculan los validadores (sin anotaciones caras)"""
+        return self.filter_queryset(self.get_queryset())
+
+    def is_keyset_page(self):
+        params = self.request.query_params
+        paginator = self.paginator
+        return paginator is not None and any(
+            getattr(paginator, name, None) in params
+            for name in ('cursor_query_param', 'page_size_query_param')
+        )
+
+    def get_validators(self, cache_key):
+        """
+        (etag, last_modified) del queryset filtrado con una sola consulta,
+        o None si no hay filas (se deja que la vista responda 404/lista vacía)
+        """
+        queryset = self.get_conditional_queryset()
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            try:
+                queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            except (TypeError, ValueError, ValidationError):
+                return None
+        aggregates = {'last_modified': Max('updated_at')}
+        # Las páginas por cursor nunca hacen COUNT; la generación ya cubre los borrados
+        if not self.is_keyset_page():
+            aggregates['count'] = Count('pk')
+        stats = queryset.order_by().aggregate(**aggregates)
+        last_modified = stats['last_modified']
+        if last_modified is None:
+            return None
+        # La clave ya incluye la generación: cambia también si cambian datos anidados
+        raw = f'{cache_key}:{stats.get("count")}:{last_modified.isoformat()}'
+        etag = '"%s"' % hashlib.sha1(raw.encode()).hexdigest()
+        return etag, max(int(last_modified.timestamp()), get_generation_time())
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        cache = get_catalog_cache()
+        ttl = response_cache_ttl()
+        key = self.get_cache_key(request)
+        validators = cache.get(f'{key}:validators') if ttl else None
+        if validators is None:
+            validators = self.get_validators(key) or ()
+            if ttl:
+                cache.set(f'{key}:validators', validators, ttl)
+
+        if validators:
+            not_modified = get_conditional_response(
+                request, etag=validators[0], last_modified=validators[1]
+            )
+            if not_modified is not None:
+                return self.add_validators(not_modified, validators)
+
+        data = cache.get(key) if ttl else None
+        if data is not None:
+            return self.add_validators(Response(data), validators)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            if ttl:
+                cache.set(key, response.data, ttl)
+            self.add_validators(response, validators)
+        return response
+
+    @staticmethod
+    def add_validators(response, validators):
+        if validators:
+            response['ETag'] = validators[0]
+            response['Last-Modified'] = http_date(validators[1])
+        # Admins y público reciben representaciones distintas
+        patch_vary_headers(response, ['Authorization'])
+        return response
@@ -2,7 +2,10 @@
 Filtros personalizados para productos
 """
 from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
 from .models import Product, Category
+from .search import get_search_backend
 
 
 class ProductFilter(filters.FilterSet):
@@ -12,6 +15,9 @@ class ProductFilter(filters.FilterSet):
     - Rango de precio (min/max)
     - Stock disponible
     - Búsqueda por nombre, descripción, material
+
+    `name` y `material` usan el índice de texto completo cuando hay backend
+    (coincidencia por prefijo de palabra); si no, icontains.
     """
     # Filtro por categoría
     category = filters.ModelChoiceFilter(
@@ -42,15 +48,18 @@ class ProductFilter(filters.FilterSet):
         field_name='stock',
         lookup_expr='gte'
     )
+    available_min = filters.NumberFilter(
+        method='filter_available_min'
+    )
 
     # Búsqueda por nombre
     name = filters.CharFilter(
-        lookup_expr='icontains'
+        method='filter_text'
     )
 
     # Búsqueda por material
     material = filters.CharFilter(
-        lookup_expr='icontains'
+        method='filter_text'
     )
 
     class Meta:
@@ -61,8 +70,44 @@ class ProductFilter(filters.FilterSet):
 
     def filter_in_stock(self, queryset, name, value):
         """
-        Filtra productos con stock disponible (> 0)
+        Filtra productos con stock disponible (> 0), descontando reservas
         """
         if value:
-            return queryset.filter(stock__gt=0)
+            return queryset.alias(available=Product.available_expression()).filter(available__gt=0)
+        return queryset
+
+    def filter_available_min(self, queryset, name, value):
+        """
+        Productos con al menos `value` unidades disponibles para la venta
+        """
+        return queryset.alias(available=Product.available_expression()).filter(available__gte=value)
+
+    def filter_text(self, queryset, name, value):
+        """
+        Busca `value` en el campo `name` con el backend de texto completo
+        """
+        backend = get_search_backend(queryset.db)
+        if backend is None:
+            return queryset.filter(**{f'{name}__icontains': value})
+        return backend.filter(queryset, value.split(), fields=[name])
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    ?search= sobre el índice de texto completo (products.search).
+    Sin ?ordering= los resultados salen por relevancia (también con ?page_size=,
+    ver ProductCursorPagination.keyset_annotations); sin backend
+    disponible se comporta como el SearchFilter de DRF (icontains).
+
+    Debe ir después de OrderingFilter en `filter_backends`.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        backend = get_search_backend(queryset.db)
+        if not terms or backend is None:
+            return super().filter_queryset(request, queryset, view)
+        queryset = backend.search(queryset, terms)
+        if api_settings.ORDERING_PARAM not in request.query_params:
+            queryset = queryset.order_by('-search_rank', '-id')
         return queryset
@@ -0,0 +1,124 @@
+"""
+Derivados de las imágenes de producto (anchos fijos en WebP y JPEG)
+
+Las imágenes originales pesan ~1.6 MB y la tienda las muestra en tarjetas
+de ~300 px. Por cada ProductImage se generan con Pillow versiones de
+PRODUCTS_IMAGE_WIDTHS píxeles de ancho (solo las menores que el original)
+en PRODUCTS_IMAGE_FORMATS, guardadas en derivatives/ junto al original con su
+nombre y extensión (products/Royal.png -> products/derivatives/Royal-png-320w.webp,
+así Royal.png y Royal.jpg no se pisan). ProductImage.variants guarda
+{formato: {ancho: nombre}} y la API expone `srcset` =
+{formato: "url 320w, url 640w, ..."}, listo para <picture>/<img>.
+
+Se generan al subir (ProductSerializer.create y el admin) y para las imágenes
+existentes con `python manage.py generate_image_derivatives`. Los que dejan
+de usarse (imagen cambiada o borrada, ver products.signals) se eliminan.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+DERIVATIVES_DIR = 'derivatives'
+# Formato de la API -> (formato de Pillow, extensión, opciones de guardado)
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def derivative_name(name, width, fmt):
+    directory, filename = os.path.split(name)
+    stem, ext = os.path.splitext(filename)
+    prefix = f'{directory}/{DERIVATIVES_DIR}' if directory else DERIVATIVES_DIR
+    return f'{prefix}/{stem}-{ext.lstrip(".").lower()}-{width}w.{FORMATS[fmt][1]}'
+
+
+def variant_names(variants):
+    return {name for widths in (variants or {}).values() for name in widths.values()}
+
+
+def delete_derivatives(names, storage=default_storage):
+    """Borra del almacenamiento los derivados `names` (los que ya no existan se ignoran)"""
+    for name in names:
+        storage.delete(name)
+
+
+def _flatten(image):
+    """RGB para JPEG: la transparencia se compone sobre PRODUCTS_IMAGE_BACKGROUND"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, settings.PRODUCTS_IMAGE_BACKGROUND)
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate_variants(name, storage=default_storage):
+    """
+    Genera y guarda los derivados del original `name`; devuelve
+    {formato: {ancho: nombre}}. Sobrescribe los de una ejecución anterior.
+    """
+    with storage.open(name, 'rb') as fh:
+        original = Image.open(fh)
+        original.load()
+    widths = [width for width in settings.PRODUCTS_IMAGE_WIDTHS if width < original.width]
+    variants = {}
+    for fmt in settings.PRODUCTS_IMAGE_FORMATS:
+        pil_format, _, options = FORMATS[fmt]
+        source = _flatten(original) if pil_format == 'JPEG' else original
+        if pil_format == 'WEBP' and source.mode not in ('RGB', 'RGBA'):
+            source = source.convert('RGBA' if 'A' in source.getbands() else 'RGB')
+        variants[fmt] = {}
+        for width in widths:
+            height = round(original.height * width / original.width)
+            buffer = io.BytesIO()
+            source.resize((width, height), Image.LANCZOS).save(buffer, pil_format, **options)
+            target = derivative_name(name, width, fmt)
+            if storage.exists(target):
+                storage.delete(target)
+            variants[fmt][str(width)] = storage.save(target, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def create_derivatives(product_image):
+    """
+    Genera los derivados de una ProductImage recién subida (o con otro
+    fichero), los guarda en `variants` y borra los de la imagen anterior
+    """
+    if not product_image.image:
+        return
+    storage = product_image.image.storage
+    previous = variant_names(product_image.variants)
+    product_image.variants = generate_variants(product_image.image.name, storage)
+    product_image.save(update_fields=['variants'])
+    delete_derivatives(previous - variant_names(product_image.variants), storage)
+
+
+def build_srcset(variants, storage, request=None):
+    """{formato: "url 320w, url 640w"} a partir de ProductImage.variants"""
+    srcset = {}
+    for fmt, widths in (variants or {}).items():
+        entries = []
+        for width, name in sorted(widths.items(), key=lambda item: int(item[0])):
+            url = storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            entries.append(f'{url} {width}w')
+        srcset[fmt] = ', '.join(entries)
+    return srcset
+
+
+def backfill_worker(name):
+    """
+    Tarea del pool de procesos de generate_image_derivatives: solo lee y
+    escribe ficheros, la base de datos la actualiza el proceso principal.
+    Devuelve (name, variants, error)
+    """
+    try:
+        return name, generate_variants(name), None
+    except Exception as exc:  # una imagen dañada no detiene el resto
+        return name, None, str(exc)
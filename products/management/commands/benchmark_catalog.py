@@ -0,0 +1,110 @@
+"""
+Benchmark de los índices del catálogo sobre un catálogo sintético
+Uso: python manage.py benchmark_catalog [--products 100000]
+
+Todo ocurre dentro de una transacción que se revierte al final: la base de
+datos queda como estaba.
+"""
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from products.models import Category, Product
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Comparar planes de consulta del catálogo con y sin índices compuestos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['products'])
+                queries = self.queries()
+                self.stdout.write(self.style.WARNING('\n📈 Con índices'))
+                with_idx = self.run(queries, options['repeat'], 'con-indices')
+                self.drop_indexes()
+                self.stdout.write(self.style.WARNING('\n📉 Sin índices'))
+                without_idx = self.run(queries, options['repeat'], 'sin-indices')
+                self.summary(queries, with_idx, without_idx)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, total):
+        self.stdout.write(f'🌱 Creando {total} productos...')
+        categories = [
+            Category.objects.create(name=f'Bench {i}', slug=f'bench-{i}') for i in range(10)
+        ]
+        rng = random.Random(42)
+        batch = []
+        for i in range(total):
+            batch.append(Product(
+                name=f'Producto {i}',
+                description='Producto de benchmark',
+                category=rng.choice(categories),
+                stock=rng.randint(0, 50),
+                price=Decimal(rng.randint(50_000, 2_000_000)),
+                material='Oro 18k',
+                is_active=rng.random() < 0.9,
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.category = categories[0]
+
+    def queries(self):
+        # Mismas formas que genera ProductViewSet (orden + desempate por id)
+        active = Product.objects.filter(is_active=True)
+        return {
+            'recientes': active.order_by('-created_at', '-id'),
+            'precio': active.filter(price__gte=100_000, price__lte=300_000).order_by('price', 'id'),
+            'categoría+precio': active.filter(category=self.category, price__lte=500_000).order_by('price', 'id'),
+            'stock': active.filter(stock__gte=40).order_by('-stock', '-id'),
+        }
+
+    def run(self, queries, repeat, phase):
+        timings = {}
+        for label, qs in queries.items():
+            page = qs.values_list('id', flat=True)[:24]
+            self.stdout.write(f'\n▶ {label}')
+            for line in self.explain(page, phase):
+                self.stdout.write(f'   {line}')
+            start = time.perf_counter()
+            for _ in range(repeat):
+                list(page)
+            timings[label] = (time.perf_counter() - start) / repeat * 1000
+        return timings
+
+    def explain(self, qs, phase):
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            # El comentario cambia el texto de la consulta para que SQLite no
+            # reutilice el EXPLAIN preparado en la fase anterior
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql} /* {phase} */', params)
+            return [' '.join(str(col) for col in row) for row in cursor.fetchall()]
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for index in Product._meta.indexes:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+
+    def summary(self, queries, with_idx, without_idx):
+        self.stdout.write(self.style.SUCCESS('\n📋 Resumen (ms por consulta, primera página)'))
+        for label in queries:
+            self.stdout.write(
+                f'   - {label:<18} con índices: {with_idx[label]:8.2f}   '
+                f'sin índices: {without_idx[label]:8.2f}'
+            )
@@ -0,0 +1,93 @@
+"""
+Benchmark de la serialización del listado de productos
+Uso: python manage.py benchmark_product_list [--products 10000] [--repeat 3]
+
+Compara ProductSerializer(many=True) con ProductListSerializer sobre el mismo
+queryset (consultas incluidas) y comprueba que el JSON sea idéntico. Todo
+ocurre dentro de una transacción que se revierte al final.
+"""
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from products.models import Category, Product, ProductImage
+from products.serializers import ProductListSerializer, ProductSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Medir el tiempo de serialización del listado de productos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['products'])
+                self.run(options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, total):
+        self.stdout.write(f'🌱 Creando {total} productos...')
+        categories = [
+            Category.objects.create(name=f'Bench {i}', slug=f'bench-{i}') for i in range(10)
+        ]
+        rng = random.Random(42)
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Producto {i}',
+                description='Producto de benchmark',
+                category=rng.choice(categories + [None]),
+                weight=Decimal(rng.randint(100, 5000)) / 100,
+                stock=rng.randint(0, 50),
+                price=Decimal(rng.randint(50_000, 2_000_000)),
+                material='Oro 18k',
+            )
+            for i in range(total)
+        ], batch_size=2000)
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=f'products/bench-{product.pk}-{n}.jpg')
+            for product in products
+            for n in range(rng.randint(0, 3))
+        ], batch_size=2000)
+
+    def run(self, repeat):
+        request = APIRequestFactory().get('/api/products/', HTTP_HOST='localhost')
+        context = {'request': request}
+        queryset = Product.objects.order_by('-created_at', '-id')
+
+        def before():
+            qs = queryset.select_related('category').prefetch_related('uploaded_images')
+            return ProductSerializer(qs, many=True, context=context).data
+
+        def after():
+            rows = list(queryset.values(*ProductListSerializer.value_fields))
+            return ProductListSerializer(rows, context=context).data
+
+        renderer = JSONRenderer()
+        timings = {}
+        outputs = {}
+        for label, serialize in (('ProductSerializer', before), ('ProductListSerializer', after)):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                outputs[label] = serialize()
+            timings[label] = (time.perf_counter() - start) / repeat * 1000
+
+        identical = renderer.render(outputs['ProductSerializer']) == renderer.render(outputs['ProductListSerializer'])
+        self.stdout.write(self.style.WARNING('\n📋 Serialización del listado (ms, consultas incluidas)'))
+        for label, ms in timings.items():
+            self.stdout.write(f'   - {label:<22} {ms:10.1f}')
+        self.stdout.write(f'   Aceleración: {timings["ProductSerializer"] / timings["ProductListSerializer"]:.1f}x')
+        style = self.style.SUCCESS if identical else self.style.ERROR
+        self.stdout.write(style(f'   JSON idéntico: {"sí" if identical else "no"}'))
@@ -0,0 +1,67 @@
+"""
+Genera los derivados (anchos fijos en WebP/JPEG) de las imágenes de producto existentes
+Uso: python manage.py generate_image_derivatives [--workers 4] [--force]
+
+Las imágenes se procesan en paralelo con un pool de procesos (Pillow usa
+CPU; con --workers 1 en el mismo proceso); el proceso principal guarda
+ProductImage.variants con un bulk_update al final e invalida la caché del
+catálogo.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from products.cache import bump_generation
+from products.images import backfill_worker, delete_derivatives, variant_names
+from products.models import ProductImage
+
+
+def init_worker():
+    # Con el método spawn (macOS/Windows) cada proceso arranca Django de nuevo
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Generar en paralelo los derivados de las imágenes de producto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerar también las imágenes que ya tienen derivados')
+
+    def handle(self, *args, **options):
+        queryset = ProductImage.objects.exclude(image='').order_by('id')
+        if not options['force']:
+            queryset = queryset.filter(variants={})
+        images = list(queryset.only('id', 'image', 'variants'))
+        if not images:
+            self.stdout.write(self.style.SUCCESS('✅ No hay imágenes pendientes'))
+            return
+
+        names = [image.image.name for image in images]
+        if options['workers'] > 1:
+            # Los procesos hijos no deben heredar conexiones abiertas
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as pool:
+                results = list(pool.map(backfill_worker, names))
+        else:
+            results = [backfill_worker(name) for name in names]
+
+        updated, failed, stale = [], 0, set()
+        for image, (name, variants, error) in zip(images, results):
+            if error:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f'❌ {name}: {error}'))
+                continue
+            stale |= variant_names(image.variants) - variant_names(variants)
+            image.variants = variants
+            updated.append(image)
+
+        ProductImage.objects.bulk_update(updated, ['variants'], batch_size=500)
+        if updated:
+            bump_generation()
+        # Derivados con nombres de una ejecución anterior que ya no se usan
+        delete_derivatives(stale)
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(updated)} imágenes procesadas, {failed} con error'))
@@ -0,0 +1,27 @@
+"""
+Reconstruye el índice de texto completo de productos
+Uso: python manage.py rebuild_search_index [--database default]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from products.cache import bump_generation
+from products.models import Product
+from products.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Reconstruir el índice de búsqueda de productos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        backend = get_search_backend(using)
+        if backend is None:
+            raise CommandError('No hay backend de búsqueda disponible para esta base de datos')
+        self.stdout.write(self.style.WARNING(f'🔎 Reindexando con {type(backend).__name__}...'))
+        with transaction.atomic(using=using):
+            backend.rebuild()
+            bump_generation()
+        self.stdout.write(self.style.SUCCESS(f'✅ {Product.objects.using(using).count()} productos indexados'))
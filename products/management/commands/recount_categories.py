@@ -0,0 +1,16 @@
+"""
+Recalcula el contador desnormalizado Category.products_count
+Uso: python manage.py recount_categories
+"""
+from django.core.management.base import BaseCommand
+from products.cache import bump_generation
+from products.signals import recount_products
+
+
+class Command(BaseCommand):
+    help = 'Recalcular el número de productos activos de cada categoría'
+
+    def handle(self, *args, **options):
+        updated = recount_products()
+        bump_generation()
+        self.stdout.write(self.style.SUCCESS(f'✅ {updated} categorías actualizadas'))
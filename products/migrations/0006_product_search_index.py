@@ -0,0 +1,77 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import products.models
+
+FIELDS = ('name', 'description', 'material', 'size')
+
+
+def create_search_index(apps, schema_editor):
+    """Crea y llena el índice de texto completo según el motor de base de datos"""
+    connection = schema_editor.connection
+    columns = ', '.join(FIELDS)
+    values = ', '.join(f"COALESCE({field}, '')" for field in FIELDS)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE products_product_fts USING fts5("
+                f"{columns}, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            # Relevancia: nombre > material > descripción > talla
+            cursor.execute(
+                "INSERT INTO products_product_fts (products_product_fts, rank) "
+                "VALUES ('rank', 'bm25(10.0, 1.0, 5.0, 0.5)')"
+            )
+            cursor.execute(
+                f"INSERT INTO products_product_fts (rowid, {columns}) "
+                f"SELECT id, {values} FROM products_product"
+            )
+    elif connection.vendor == 'postgresql':
+        vector = ' || '.join(
+            f"setweight(to_tsvector('spanish', COALESCE({field}, '')), '{weight}')"
+            for field, weight in zip(FIELDS, 'ACBD')
+        )
+        schema_editor.execute(
+            "CREATE TABLE products_product_search ("
+            "product_id bigint PRIMARY KEY REFERENCES products_product (id) "
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX products_product_search_gin "
+            "ON products_product_search USING gin (document)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO products_product_search (product_id, document) "
+            f"SELECT id, {vector} FROM products_product"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS products_product_fts')
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS products_product_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchEntry',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='products.product')),
+                ('document', products.models.FullTextField(db_column='products_product_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'products_product_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
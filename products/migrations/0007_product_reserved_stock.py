@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:22
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reserved_stock',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.expressions.CombinedExpression(models.F('stock'), '-', models.F('reserved_stock')), models.F('id'), condition=models.Q(('is_active', True)), name='product_active_available_idx'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 
 
@@ -7,6 +8,8 @@ class Category(models.Model):
     slug = models.SlugField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
+    # Contador desnormalizado de productos activos (ver products.signals)
+    products_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -30,6 +33,8 @@ class Product(models.Model):
     )
     weight = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
     stock = models.PositiveIntegerField()
+    # Unidades apartadas por checkouts aún sin pagar (orders.reservations)
+    reserved_stock = models.PositiveIntegerField(default=0, editable=False)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     size = models.CharField(max_length=50, blank=True, null=True)
     material = models.CharField(max_length=100)
@@ -39,11 +44,109 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        # Lecturas públicas: siempre is_active=True, luego rango/orden del listado.
+        # Índices parciales (WHERE is_active) terminados en id para el desempate
+        # de la paginación por cursor.
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_active=True),
+                         name='product_active_created_idx'),
+            models.Index(fields=['price', 'id'], condition=models.Q(is_active=True),
+                         name='product_active_price_idx'),
+            models.Index(fields=['category', 'price', 'id'], condition=models.Q(is_active=True),
+                         name='product_active_cat_price_idx'),
+            models.Index(fields=['stock', 'id'], condition=models.Q(is_active=True),
+                         name='product_active_stock_idx'),
+            models.Index(models.F('stock') - models.F('reserved_stock'), models.F('id'),
+                         condition=models.Q(is_active=True), name='product_active_available_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def available_stock(self):
+        """Unidades que se pueden vender: stock menos lo reservado"""
+        return max(self.stock - self.reserved_stock, 0)
+
+    @classmethod
+    def available_expression(cls):
+        """Expresión SQL de available_stock, para filtrar sin traer filas"""
+        return models.F('stock') - models.F('reserved_stock')
+
+    def clean(self):
+        # El admin lo valida antes de guardar; ProductSerializer hace lo mismo en la API
+        if self.pk and self.stock is not None and self.stock < self.reserved_stock:
+            raise ValidationError({'stock': self.stock_below_reserved_message()})
+
+    def stock_below_reserved_message(self):
+        return f"El stock no puede ser menor que las unidades reservadas ({self.reserved_stock})."
+
+    def save(self, *args, **kwargs):
+        # reserved_stock solo cambia con UPDATE atómicos (orders.reservations):
+        # un save() con la instancia desactualizada no debe pisarlo
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'reserved_stock' and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_counted_state()
+        return instance
+
+    def _remember_counted_state(self):
+        """Guarda el estado que afecta a Category.products_count tal como está en BD"""
+        if 'category_id' in self.__dict__ and 'is_active' in self.__dict__:
+            self._counted_state = (self.category_id, self.is_active)
+        else:
+            self._counted_state = None
+
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='uploaded_images')
     image = models.ImageField(upload_to='products/')
+    # {formato: {ancho: nombre}} de los derivados (products.images)
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+
+
+class FullTextField(models.TextField):
+    """Columna de una tabla FTS5; admite el lookup `__match`"""
+
+
+@FullTextField.register_lookup
+class FullTextMatch(models.Lookup):
+    """`campo__match='expr'` → `campo MATCH expr`"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class ProductSearchEntry(models.Model):
+    """
+    Fila del índice FTS5 de productos (tabla virtual creada por la migración
+    0006 solo en SQLite). Se mantiene desde products.search, nunca con save().
+    """
+    product = models.OneToOneField(
+        Product,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name='search_entry',
+    )
+    # Columna oculta con el nombre de la tabla: `tabla MATCH expr` busca en todas
+    document = FullTextField(db_column='products_product_fts')
+    # Columna oculta de FTS5 con la relevancia bm25 (menor es mejor)
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'products_product_fts'
+
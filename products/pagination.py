@@ -0,0 +1,217 @@
+"""
+Paginación por cursor (keyset) para listados ordenados por campos del modelo
+"""
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación keyset: cada página se obtiene con un WHERE sobre los valores
+    de la última fila vista, nunca con OFFSET ni COUNT(*).
+
+    El orden se toma del queryset (el que dejó OrderingFilter o el Meta.ordering
+    del modelo) y se completa con `id` como desempate, de modo que el cursor
+    es estable aunque se inserten filas nuevas entre página y página.
+
+    - ?cursor=<token> - Página a partir del cursor
+    - ?page_size=<n> - Tamaño de página (máx `max_page_size`)
+
+    Con `opt_in = True` solo se pagina si llega alguno de esos parámetros;
+    en caso contrario se devuelve la lista completa como hasta ahora.
+
+    `keyset_annotations` lista anotaciones (nunca nulas) por las que también
+    se puede ordenar la página, p. ej. la relevancia de la búsqueda.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+    tie_breaker = 'id'
+    opt_in = False
+    keyset_annotations = ()
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.opt_in and self.cursor_query_param not in params \
+                and self.page_size_query_param not in params:
+            return None
+
+        ordering = self.get_ordering(queryset)
+        if ordering is None:
+            # Orden por expresiones que no son campos: no hay clave para el cursor
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.ordering = ordering
+        self.fields = {name: self.get_field(queryset, name) for name, _ in ordering}
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        self.has_cursor = cursor is not None
+        self.reverse = bool(cursor and cursor['r'])
+
+        # Al ir hacia atrás se recorre el índice en sentido contrario
+        scan = [(name, desc != self.reverse) for name, desc in ordering]
+        if cursor is not None:
+            queryset = queryset.filter(self.seek_filter(scan, cursor['v']))
+        queryset = queryset.order_by(*[f'-{name}' if desc else name for name, desc in scan])
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """
+        Devuelve [(campo, descendente), ...] terminando en el desempate,
+        o None si el queryset está ordenado por algo que no es un campo.
+        """
+        terms = queryset.query.order_by or queryset.model._meta.ordering
+        ordering = []
+        for term in terms:
+            if not isinstance(term, str):
+                return None
+            name = term.lstrip('-')
+            if name == 'pk':
+                name = self.tie_breaker
+            field = self.get_field(queryset, name)
+            if field is None or field.is_relation or field.null:
+                return None
+            ordering.append((name, term.startswith('-')))
+            if name == self.tie_breaker:
+                return ordering
+        descending = ordering[0][1] if ordering else False
+        ordering.append((self.tie_breaker, descending))
+        return ordering
+
+    def get_field(self, queryset, name):
+        """Campo del modelo o de una anotación de `keyset_annotations`, o None"""
+        if name in self.keyset_annotations and name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        try:
+            return queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def seek_filter(self, scan, values):
+        """
+        Construye (a > va) OR (a = va AND b > vb) OR ... respetando el sentido
+        de cada campo, equivalente a comparar la tupla completa.
+        """
+        condition = Q()
+        equal = Q()
+        for (name, desc), value in zip(scan, values):
+            lookup = 'lt' if desc else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    # ---- Cursores ----
+
+    def get_next_link(self):
+        if self.reverse:
+            # Veníamos desde una página posterior: siempre hay siguiente
+            if not self.page:
+                return None
+        elif not self.has_more:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if self.reverse:
+            # Recorriendo hacia atrás sin más filas: esta ya es la primera página
+            if not self.has_more:
+                return None
+        elif not self.has_cursor:
+            return None
+        if not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, row, reverse):
+        values = [self._dump_value(self._row_value(row, name)) for name, _ in self.ordering]
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            raw_values = data['v']
+            if len(raw_values) != len(self.ordering):
+                raise ValueError
+            values = [
+                self.fields[name].to_python(raw)
+                for (name, _), raw in zip(self.ordering, raw_values)
+            ]
+            return {'v': values, 'r': bool(data.get('r'))}
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _row_value(row, name):
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
+
+    @staticmethod
+    def _dump_value(value):
+        if isinstance(value, Decimal):
+            return str(value)
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat()
+        return value
+
+
+class ProductCursorPagination(KeysetPagination):
+    """Cursor opcional para /api/products/ (?cursor= o ?page_size=)"""
+    page_size = 24
+    opt_in = True
+    # ?search= sin ?ordering= ordena por relevancia (products.filters.FullTextSearchFilter)
+    keyset_annotations = ('search_rank',)
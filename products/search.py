@@ -0,0 +1,234 @@
+"""
+Backends de búsqueda de texto completo para productos
+
+- SQLiteFTS5Backend: tabla virtual FTS5 `products_product_fts` (db.sqlite3)
+- PostgresSearchBackend: tabla `products_product_search` con tsvector + GIN
+
+Ambas tablas las crea la migración 0006 según el motor de base de datos y se
+mantienen al día con las señales de Product (products.signals). Si el motor
+no tiene backend (o la tabla no existe), se usa el icontains de siempre.
+
+Configuración: PRODUCTS_SEARCH_BACKEND = None (automático según el motor) o
+la ruta a una clase, p. ej. 'products.search.SQLiteFTS5Backend'.
+"""
+import re
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Product, ProductSearchEntry
+
+SEARCH_FIELDS = ('name', 'description', 'material', 'size')
+
+
+class BaseSearchBackend:
+    """Interfaz común de los backends de búsqueda"""
+    table = None
+    vendor = None
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    @property
+    def connection(self):
+        # Los backends se comparten entre hilos; cada hilo usa su propia conexión
+        return connections[self.using]
+
+    def is_available(self):
+        return (
+            self.connection.vendor == self.vendor
+            and self.table in self.connection.introspection.table_names()
+        )
+
+    def index(self, products):
+        raise NotImplementedError
+
+    def remove(self, product_ids):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def search(self, queryset, terms):
+        """
+        Filtra `queryset` por los términos (todos deben aparecer) y lo anota
+        con `search_rank`, mayor cuanto más relevante
+        """
+        raise NotImplementedError
+
+    def filter(self, queryset, terms, fields):
+        """Solo filtra, buscando los términos en `fields`"""
+        raise NotImplementedError
+
+    @staticmethod
+    def _documents(products):
+        for product in products:
+            yield product.pk, [getattr(product, field) or '' for field in SEARCH_FIELDS]
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    table = 'products_product_fts'
+    vendor = 'sqlite'
+
+    def index(self, products):
+        rows = list(self._documents(products))
+        if not rows:
+            return
+        columns = ', '.join(SEARCH_FIELDS)
+        placeholders = ', '.join(['%s'] * (len(SEARCH_FIELDS) + 1))
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk, _ in rows])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, {columns}) VALUES ({placeholders})',
+                [(pk, *values) for pk, values in rows],
+            )
+
+    def remove(self, product_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in product_ids])
+
+    def rebuild(self):
+        columns = ', '.join(SEARCH_FIELDS)
+        values = ', '.join(f"COALESCE({field}, '')" for field in SEARCH_FIELDS)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, {columns}) '
+                f'SELECT id, {values} FROM {Product._meta.db_table}'
+            )
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+
+    def search(self, queryset, terms):
+        expression = self.build_query(terms)
+        if expression is None:
+            return queryset
+        return queryset.filter(search_entry__document__match=expression).annotate(
+            # bm25 es negativo y menor cuanto más relevante
+            search_rank=F('search_entry__rank') * -1
+        )
+
+    def filter(self, queryset, terms, fields):
+        expression = self.build_query(terms, fields)
+        if expression is None:
+            return queryset
+        # Subconsulta: una tabla FTS5 no admite dos MATCH en la misma consulta
+        matches = ProductSearchEntry.objects.filter(document__match=expression)
+        return queryset.filter(id__in=matches.values('product_id'))
+
+    @staticmethod
+    def build_query(terms, fields=None):
+        """Cada término como prefijo entre comillas: `"oro"* "18k"*` (AND implícito)"""
+        phrases = []
+        for term in terms:
+            term = term.replace('"', ' ').strip()
+            if term:
+                phrases.append(f'"{term}"*')
+        if not phrases:
+            return None
+        query = ' '.join(phrases)
+        if fields:
+            query = '{%s} : (%s)' % (' '.join(fields), query)
+        return query
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    table = 'products_product_search'
+    vendor = 'postgresql'
+    config = 'spanish'
+    # Pesos por campo en el mismo orden que SEARCH_FIELDS
+    weights = ('A', 'C', 'B', 'D')
+
+    def _vector_sql(self):
+        return ' || '.join(
+            f"setweight(to_tsvector('{self.config}', COALESCE(%s, '')), '{weight}')"
+            for weight in self.weights
+        )
+
+    def index(self, products):
+        rows = list(self._documents(products))
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (product_id, document) VALUES (%s, {self._vector_sql()}) '
+                f'ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document',
+                [(pk, *values) for pk, values in rows],
+            )
+
+    def remove(self, product_ids):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE product_id = ANY(%s)', [list(product_ids)])
+
+    def rebuild(self):
+        vector = self._vector_sql() % SEARCH_FIELDS
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (product_id, document) '
+                f'SELECT id, {vector} FROM {Product._meta.db_table}'
+            )
+
+    @property
+    def _tsquery(self):
+        return f"to_tsquery('{self.config}', %s)"
+
+    def search(self, queryset, terms):
+        expression = self.build_query(terms)
+        if expression is None:
+            return queryset
+        table = Product._meta.db_table
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT product_id FROM {self.table} WHERE document @@ {self._tsquery}', [expression]
+        )).annotate(search_rank=RawSQL(
+            f'SELECT ts_rank(document, {self._tsquery}) FROM {self.table} '
+            f'WHERE product_id = {table}.id',
+            [expression],
+            output_field=FloatField(),
+        ))
+
+    def filter(self, queryset, terms, fields):
+        expression = self.build_query(terms)
+        if expression is None:
+            return queryset
+        # Cada campo tiene su propio peso dentro del documento
+        labels = ','.join(self.weights[SEARCH_FIELDS.index(field)] for field in fields)
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT product_id FROM {self.table} "
+            f"WHERE ts_filter(document, '{{{labels}}}') @@ {self._tsquery}",
+            [expression],
+        ))
+
+    @staticmethod
+    def build_query(terms):
+        lexemes = []
+        for term in terms:
+            for word in re.findall(r'\w+', term):
+                lexemes.append(f'{word}:*')
+        return ' & '.join(lexemes) or None
+
+
+BACKENDS = (SQLiteFTS5Backend, PostgresSearchBackend)
+
+# Backend por alias de conexión; False si ese alias no tiene índice
+_backends = {}
+
+
+def get_search_backend(using=DEFAULT_DB_ALIAS):
+    """Backend configurado o detectado para `using`, o None si hay que usar icontains"""
+    if using not in _backends:
+        path = getattr(settings, 'PRODUCTS_SEARCH_BACKEND', None)
+        if path:
+            _backends[using] = import_string(path)(using)
+        else:
+            _backends[using] = next(
+                (backend for backend in (cls(using) for cls in BACKENDS) if backend.is_available()), False
+            )
+    return _backends[using] or None
+
+
+def clear_search_backends():
+    """Vuelve a detectar los backends (p. ej. tras migrate, que puede crear las tablas)"""
+    _backends.clear()
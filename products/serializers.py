@@ -1,4 +1,6 @@
+from django.conf import settings
 from rest_framework import serializers
+from .images import build_srcset, create_derivatives
 from .models import Product, ProductImage, Category
 
 
@@ -10,18 +12,29 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug', 'description', 'is_active', 'products_count']
 
     def get_products_count(self, obj):
+        # CategoryViewSet anota el conteo; si no, se usa el contador o una consulta
+        if hasattr(obj, 'active_products_count'):
+            return obj.active_products_count
+        if settings.PRODUCTS_DENORMALIZED_COUNTS:
+            return obj.products_count
         return obj.products.filter(is_active=True).count()
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = ProductImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'srcset']
+
+    def get_srcset(self, obj):
+        return build_srcset(obj.variants, obj.image.storage, self.context.get('request'))
 
 
 class ProductSerializer(serializers.ModelSerializer):
     uploaded_images = ProductImageSerializer(many=True, read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
+    available_stock = serializers.IntegerField(read_only=True)
     images = serializers.ListField(
         child=serializers.ImageField(max_length=100000, allow_empty_file=False, use_url=False),
         write_only=True,
@@ -32,13 +45,90 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = [
             'id', 'name', 'description', 'category', 'category_name',
-            'weight', 'stock', 'price', 'size', 'material', 'is_active',
+            'weight', 'stock', 'available_stock', 'price', 'size', 'material', 'is_active',
             'created_at', 'updated_at', 'uploaded_images', 'images'
         ]
 
+    def validate_stock(self, value):
+        # Lo apartado por checkouts pendientes no puede quedar por encima del stock
+        if self.instance is not None and value < self.instance.reserved_stock:
+            raise serializers.ValidationError(self.instance.stock_below_reserved_message())
+        return value
+
     def create(self, validated_data):
         images = validated_data.pop('images', [])
         product = Product.objects.create(**validated_data)
         for img in images:
-            ProductImage.objects.create(product=product, image=img)
+            create_derivatives(ProductImage.objects.create(product=product, image=img))
         return product
+
+
+class ProductListSerializer(serializers.BaseSerializer):
+    """
+    Listado de productos de solo lectura a partir de filas
+    `.values(*value_fields)`. Produce el mismo JSON que
+    ProductSerializer(many=True) sin instanciar modelos ni serializadores por
+    fila: las imágenes salen de una sola consulta para toda la página y los
+    decimales y fechas se formatean con los campos de ProductSerializer.
+    """
+    value_fields = (
+        'id', 'name', 'description', 'category', 'category__name', 'weight', 'stock',
+        'reserved_stock', 'price', 'size', 'material', 'is_active', 'created_at', 'updated_at',
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = ProductSerializer(context=self.context).fields
+        self.weight = fields['weight'].to_representation
+        self.price = fields['price'].to_representation
+        self.datetime = fields['created_at'].to_representation
+        self.storage = ProductImage._meta.get_field('image').storage
+
+    def image_urls(self, product_ids):
+        """{product_id: [{'id', 'image', 'srcset'}, ...]} con las URLs ya resueltas"""
+        request = self.context.get('request')
+        images = {pk: [] for pk in product_ids}
+        rows = (
+            ProductImage.objects.filter(product_id__in=product_ids)
+            .order_by('id')
+            .values_list('product_id', 'id', 'image', 'variants')
+        )
+        for product_id, image_id, name, variants in rows:
+            url = None
+            if name:
+                url = self.storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+            images[product_id].append({
+                'id': image_id,
+                'image': url,
+                'srcset': build_srcset(variants, self.storage, request),
+            })
+        return images
+
+    def to_representation(self, rows):
+        images = self.image_urls([row['id'] for row in rows])
+        weight, price, datetime = self.weight, self.price, self.datetime
+        data = []
+        for row in rows:
+            item = {
+                'id': row['id'],
+                'name': row['name'],
+                'description': row['description'],
+                'category': row['category'],
+            }
+            # Como `source='category.name'`: sin categoría la clave no aparece
+            if row['category__name'] is not None:
+                item['category_name'] = row['category__name']
+            item['weight'] = None if row['weight'] is None else weight(row['weight'])
+            item['stock'] = row['stock']
+            item['available_stock'] = max(row['stock'] - row['reserved_stock'], 0)
+            item['price'] = price(row['price'])
+            item['size'] = row['size']
+            item['material'] = row['material']
+            item['is_active'] = row['is_active']
+            item['created_at'] = datetime(row['created_at'])
+            item['updated_at'] = datetime(row['updated_at'])
+            item['uploaded_images'] = images[row['id']]
+            data.append(item)
+        return data
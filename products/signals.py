@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from .cache import bump_generation
+from .images import delete_derivatives, variant_names
+from .models import Category, Product, ProductImage
+from .search import clear_search_backends, get_search_backend
+
+
+def _counted_category(state):
+    """Categoría a la que suma un producto con estado (category_id, is_active)"""
+    category_id, is_active = state
+    return category_id if is_active else None
+
+
+def _shift_products_count(category_id, delta):
+    Category.objects.filter(pk=category_id).update(
+        products_count=Greatest(F('products_count') + delta, 0)
+    )
+
+
+def recount_products(category_ids=None):
+    """
+    Recalcula Category.products_count desde cero con un único UPDATE.
+    Útil tras cambios masivos con queryset.update(), que no emiten señales.
+    """
+    active = (
+        Product.objects.filter(category=OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('category')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    qs = Category.objects.all()
+    if category_ids is not None:
+        qs = qs.filter(pk__in=[pk for pk in category_ids if pk is not None])
+    return qs.update(products_count=Coalesce(Subquery(active), 0))
+
+
+@receiver(post_save, sender=Product)
+def update_category_count_on_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Mantiene Category.products_count cuando se crea un producto o cambia
+    su categoría o su estado activo
+    """
+    if raw:
+        return
+    old_state = (None, False) if created else getattr(instance, '_counted_state', None)
+    new_state = (instance.category_id, instance.is_active)
+    if old_state is None:
+        # Instancia sin estado conocido (campos diferidos, pk manual...): recuento exacto
+        recount_products()
+    else:
+        old_category = _counted_category(old_state)
+        new_category = _counted_category(new_state)
+        if old_category != new_category:
+            if old_category is not None:
+                _shift_products_count(old_category, -1)
+            if new_category is not None:
+                _shift_products_count(new_category, 1)
+    instance._remember_counted_state()
+
+
+@receiver(post_delete, sender=Product)
+def update_category_count_on_delete(sender, instance, **kwargs):
+    state = getattr(instance, '_counted_state', None) or (instance.category_id, instance.is_active)
+    category_id = _counted_category(state)
+    if category_id is not None:
+        _shift_products_count(category_id, -1)
+
+
+@receiver(post_save, sender=Product)
+def index_product_for_search(sender, instance, raw=False, using=None, **kwargs):
+    """Mantiene el índice de texto completo al crear o editar un producto"""
+    # loaddata: la tabla del índice puede no existir aún; rebuild_search_index lo rellena
+    if raw:
+        return
+    backend = get_search_backend(using)
+    if backend is not None:
+        backend.index([instance])
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search(sender, instance, using=None, **kwargs):
+    backend = get_search_backend(using)
+    if backend is not None:
+        backend.remove([instance.pk])
+
+
+@receiver(post_migrate)
+def redetect_search_backends(sender, **kwargs):
+    """migrate puede crear (o borrar) las tablas del índice"""
+    clear_search_backends()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Cualquier escritura en el catálogo invalida las respuestas cacheadas"""
+    bump_generation()
+
+
+@receiver(post_delete, sender=ProductImage)
+def delete_image_derivatives(sender, instance, **kwargs):
+    """Borra los derivados de una imagen eliminada (al confirmar la transacción)"""
+    names = variant_names(instance.variants)
+    if names:
+        storage = instance.image.storage
+        transaction.on_commit(lambda: delete_derivatives(names, storage))
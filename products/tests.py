@@ -1,9 +1,24 @@
+import io
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.urls import reverse
-from django.test import TestCase
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from products.models import Product, Category
+from products.cache import get_catalog_cache
+from products.images import create_derivatives, generate_variants, variant_names
+from products.models import Product, Category, ProductImage
+from products.search import get_search_backend
 
 User = get_user_model()
 
@@ -184,3 +199,557 @@ class CategoryAPITest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['name'], category.name)
+
+
+class ProductCursorPaginationTest(APITestCase):
+    """Tests para la paginación por cursor de productos"""
+
+    def setUp(self):
+        for i in range(7):
+            Product.objects.create(
+                name=f"Producto {i}",
+                price=str(1000 * (i % 3)),
+                stock=i,
+            )
+
+    def _walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(p['id'] for p in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_without_params_returns_plain_list(self):
+        """Test que sin parámetros la respuesta sigue siendo una lista"""
+        response = self.client.get(reverse("product-list"))
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 7)
+
+    def test_walk_all_pages_for_each_ordering(self):
+        """Test recorrer todas las páginas con cada campo de ordenamiento"""
+        url = reverse("product-list")
+        for ordering in ["price", "-price", "created_at", "-created_at", "stock", "-stock", "name", "-name"]:
+            tie = '-id' if ordering.startswith('-') else 'id'
+            expected = list(Product.objects.order_by(ordering, tie).values_list('id', flat=True))
+            self.assertEqual(self._walk(f'{url}?ordering={ordering}&page_size=3'), expected, ordering)
+
+    def test_previous_link(self):
+        """Test volver a la página anterior con el enlace `previous`"""
+        url = reverse("product-list")
+        first = self.client.get(f'{url}?ordering=price&page_size=3').data
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [p['id'] for p in back['results']],
+            [p['id'] for p in first['results']],
+        )
+        self.assertIsNone(back['previous'])
+
+    def test_stable_across_inserts(self):
+        """Test que insertar productos no duplica ni salta filas ya paginadas"""
+        url = reverse("product-list")
+        first = self.client.get(f'{url}?ordering=-created_at&page_size=3').data
+        Product.objects.create(name="Nuevo", price="500", stock=1)
+        rest = self._walk(first['next'])
+        seen = [p['id'] for p in first['results']] + rest
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), 7)
+
+    def test_no_offset_or_count(self):
+        """Test que las páginas profundas no usan OFFSET ni COUNT"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = reverse("product-list")
+        first = self.client.get(f'{url}?page_size=2').data
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(first['next'])
+        for query in ctx.captured_queries:
+            self.assertNotIn('OFFSET', query['sql'].upper())
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_invalid_cursor(self):
+        """Test cursor inválido devuelve 404"""
+        response = self.client.get(f'{reverse("product-list")}?cursor=basura')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CategoryProductsCountTest(APITestCase):
+    """Tests para el conteo de productos por categoría"""
+
+    def setUp(self):
+        self.anillos = Category.objects.create(name="Anillos", slug="anillos")
+        self.collares = Category.objects.create(name="Collares", slug="collares")
+
+    def _create(self, category, **kwargs):
+        return Product.objects.create(name="P", category=category, price="1", stock=1, **kwargs)
+
+    def test_list_uses_constant_queries(self):
+        """Test que /api/categories/ no hace una consulta por categoría"""
+        url = reverse("category-list")
+        self._create(self.anillos)
+        # Validadores (ETag) + listado
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        for i in range(5):
+            cat = Category.objects.create(name=f"Extra {i}", slug=f"extra-{i}")
+            self._create(cat)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 7)
+
+    def test_annotated_count_only_active(self):
+        """Test que solo se cuentan productos activos"""
+        self._create(self.anillos)
+        self._create(self.anillos, is_active=False)
+        response = self.client.get(reverse("category-detail", kwargs={'pk': self.anillos.pk}))
+        self.assertEqual(response.data['products_count'], 1)
+
+    def test_denormalized_counter_maintained(self):
+        """Test que el contador se mantiene al crear, mover, desactivar y borrar"""
+        product = self._create(self.anillos)
+        self._create(self.anillos, is_active=False)
+        self.anillos.refresh_from_db()
+        self.assertEqual(self.anillos.products_count, 1)
+
+        product = Product.objects.get(pk=product.pk)
+        product.category = self.collares
+        product.save()
+        self.anillos.refresh_from_db()
+        self.collares.refresh_from_db()
+        self.assertEqual((self.anillos.products_count, self.collares.products_count), (0, 1))
+
+        product.is_active = False
+        product.save()
+        self.collares.refresh_from_db()
+        self.assertEqual(self.collares.products_count, 0)
+
+        product.is_active = True
+        product.save()
+        product.delete()
+        self.collares.refresh_from_db()
+        self.assertEqual(self.collares.products_count, 0)
+
+    def test_denormalized_mode_in_api(self):
+        """Test que con PRODUCTS_DENORMALIZED_COUNTS se lee el contador"""
+        self._create(self.anillos)
+        with self.settings(PRODUCTS_DENORMALIZED_COUNTS=True):
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse("category-list"))
+        counts = {c['slug']: c['products_count'] for c in response.data}
+        self.assertEqual(counts, {'anillos': 1, 'collares': 0})
+
+
+class ProductFullTextSearchTest(APITestCase):
+    """Tests para la búsqueda de texto completo"""
+
+    def setUp(self):
+        self.collar = Product.objects.create(
+            name="Collar Lágrima Celestial", description="Pieza con zafiro",
+            material="Oro blanco", price="420000", stock=6,
+        )
+        self.anillo = Product.objects.create(
+            name="Anillo Royal", description="Inspirado en un collar antiguo",
+            material="Oro 18k", price="180000", stock=12,
+        )
+        self.url = reverse("product-list")
+
+    def _names(self, query):
+        response = self.client.get(f'{self.url}?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [p['name'] for p in response.data]
+
+    def test_ranked_by_relevance(self):
+        """Test que una coincidencia en el nombre pesa más que en la descripción"""
+        self.assertEqual(self._names('search=collar'), ["Collar Lágrima Celestial", "Anillo Royal"])
+
+    def test_accent_insensitive_prefix(self):
+        """Test que se ignoran tildes y se buscan prefijos"""
+        self.assertEqual(self._names('search=lagri'), ["Collar Lágrima Celestial"])
+
+    def test_all_terms_required(self):
+        """Test que todos los términos deben aparecer"""
+        self.assertEqual(self._names('search=oro zafiro'), ["Collar Lágrima Celestial"])
+
+    def test_explicit_ordering_wins(self):
+        """Test que ?ordering= reemplaza el orden por relevancia"""
+        self.assertEqual(self._names('search=collar&ordering=price'), ["Anillo Royal", "Collar Lágrima Celestial"])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test que el índice se actualiza al editar y borrar productos"""
+        self.anillo.name = "Anillo Minimal"
+        self.anillo.save()
+        self.assertEqual(self._names('search=royal'), [])
+        self.assertEqual(self._names('search=minimal'), ["Anillo Minimal"])
+        self.anillo.delete()
+        self.assertEqual(self._names('search=minimal'), [])
+
+    def test_field_filters_use_index(self):
+        """Test filtros ?name= y ?material= sobre el índice"""
+        self.assertEqual(self._names('name=collar'), ["Collar Lágrima Celestial"])
+        self.assertEqual(self._names('material=18k'), ["Anillo Royal"])
+
+    def test_rebuild_command(self):
+        """Test que rebuild_search_index reconstruye el índice"""
+        from django.core.management import call_command
+        from io import StringIO
+        Product.objects.filter(pk=self.anillo.pk).update(name="Anillo Vanguardia")
+        self.assertEqual(self._names('search=vanguardia'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self._names('search=vanguardia'), ["Anillo Vanguardia"])
+
+    def test_ranked_search_paginated(self):
+        """Test que ?search= con ?page_size= y sin ?ordering= pagina por relevancia"""
+        Product.objects.create(name="Collar Aurora", description="collar", material="Oro", price="1", stock=1)
+        names = []
+        url = f'{self.url}?search=collar&page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            names += [p['name'] for p in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(names, self._names('search=collar'))
+        self.assertEqual(len(names), 3)
+        self.assertEqual(names[-1], "Anillo Royal")
+
+    def test_raw_save_skips_index(self):
+        """Test que loaddata (raw) no escribe en el índice"""
+        from django.core import serializers
+        from django.utils import timezone
+        now = timezone.now()
+        data = serializers.serialize('json', [Product(
+            pk=9999, name="Dije Estrella", description="", material="Plata", price="1", stock=1,
+            created_at=now, updated_at=now,
+        )])
+        for obj in serializers.deserialize('json', data):
+            obj.save()
+        self.assertEqual(self._names('search=estrella'), [])
+
+
+class SearchIndexThreadTest(TransactionTestCase):
+    """Índice de búsqueda escrito desde otro hilo"""
+
+    def test_backend_shared_between_threads(self):
+        """Test que un backend creado en un hilo sirve para guardar productos desde otro"""
+        self.assertIsNotNone(get_search_backend())
+        errors = []
+
+        def create():
+            try:
+                Product.objects.create(name="Aretes Aurora", description="", price="1", stock=1, material="Oro")
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=create)
+        thread.start()
+        thread.join()
+        self.assertEqual(errors, [])
+        matches = get_search_backend().search(Product.objects.all(), ["aurora"])
+        self.assertEqual([p.name for p in matches], ["Aretes Aurora"])
+
+
+class CatalogCacheTest(APITestCase):
+    """Tests para la caché de lecturas del catálogo"""
+
+    def setUp(self):
+        from products.cache import get_catalog_cache
+        get_catalog_cache().clear()
+        self.category = Category.objects.create(name="Relojes", slug="relojes")
+        self.product = Product.objects.create(
+            name="Reloj Royal", category=self.category, price="600000", stock=5,
+        )
+        self.url = reverse("product-list")
+
+    def test_second_read_hits_cache(self):
+        """Test que la segunda lectura no toca la base de datos"""
+        first = self.client.get(f'{self.url}?ordering=price&in_stock=true')
+        with self.assertNumQueries(0):
+            second = self.client.get(f'{self.url}?in_stock=true&ordering=price')
+        self.assertEqual(first.json(), second.json())
+
+    def test_writes_invalidate(self):
+        """Test que guardar un producto, categoría o imagen invalida la caché"""
+        self.client.get(self.url)
+        self.product.name = "Reloj Royal Cronógrafo"
+        self.product.save()
+        self.assertEqual(self.client.get(self.url).data[0]['name'], "Reloj Royal Cronógrafo")
+
+        self.category.name = "Relojes de lujo"
+        self.category.save()
+        self.assertEqual(self.client.get(self.url).data[0]['category_name'], "Relojes de lujo")
+
+    def test_visibility_is_part_of_key(self):
+        """Test que admins y público no comparten entradas"""
+        Product.objects.create(name="Oculto", price="1", stock=1, is_active=False)
+        self.assertEqual(len(self.client.get(self.url).data), 1)
+        admin = User.objects.create_user(
+            username="admin", email="admin@test.com", password="x", is_admin=True
+        )
+        self.client.force_authenticate(admin)
+        self.assertEqual(len(self.client.get(self.url).data), 2)
+
+    @override_settings(CATALOG_CACHE_LOCAL_TTL=7)
+    def test_local_cache_uses_short_ttl(self):
+        """Test que con locmem las respuestas caducan a los CATALOG_CACHE_LOCAL_TTL segundos"""
+        cache = get_catalog_cache()
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.client.get(self.url)
+        self.assertEqual([call.args[2] for call in cache_set.call_args_list], [7, 7])
+
+    @override_settings(CATALOG_CACHE_LOCAL_TTL=0)
+    def test_local_cache_ttl_zero_disables_response_cache(self):
+        """Test que CATALOG_CACHE_LOCAL_TTL=0 no guarda respuestas en una caché local"""
+        self.client.get(self.url)
+        # Validadores, página e imágenes
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+    def test_aliases_do_not_share_store(self):
+        """Test que vaciar la caché del catálogo no borra carritos ni usuarios"""
+        from django.core.cache import caches
+        from products.cache import get_catalog_cache
+        caches['carts'].set('summary', 1)
+        caches['users'].set('auth', 2)
+        get_catalog_cache().clear()
+        self.assertEqual((caches['carts'].get('summary'), caches['users'].get('auth')), (1, 2))
+
+
+class ConditionalGetTest(APITestCase):
+    """Tests para ETag / Last-Modified en productos y categorías"""
+
+    def setUp(self):
+        from products.cache import get_catalog_cache
+        self.cache = get_catalog_cache()
+        self.cache.clear()
+        self.category = Category.objects.create(name="Aretes", slug="aretes")
+        self.product = Product.objects.create(
+            name="Aretes Luz de Luna", category=self.category, price="180000", stock=19,
+        )
+
+    def test_list_and_detail_emit_validators(self):
+        """Test que list y detail devuelven ETag y Last-Modified"""
+        for url in [
+            reverse("product-list"),
+            reverse("product-detail", kwargs={'pk': self.product.pk}),
+            reverse("category-list"),
+            reverse("category-detail", kwargs={'pk': self.category.pk}),
+        ]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response['ETag'].startswith('"'))
+            self.assertIn('Last-Modified', response)
+
+    def test_if_none_match_returns_304_from_warm_cache(self):
+        """Test que con la caché caliente el 304 no toca la base de datos"""
+        url = reverse("product-list")
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_if_none_match_returns_304_without_serializing(self):
+        """Test que sin caché If-None-Match responde 304 con solo el agregado"""
+        dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        with self.settings(CACHES={'default': dummy, 'catalog': dummy}):
+            url = reverse("category-list")
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since(self):
+        """Test que If-Modified-Since responde 304"""
+        url = reverse("product-detail", kwargs={'pk': self.product.pk})
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since_after_hiding_older_product(self):
+        """Test que ocultar un producto que no es el más reciente invalida If-Modified-Since"""
+        from unittest import mock
+        from django.utils.http import parse_http_date
+        from products.cache import bump_generation
+        older = Product.objects.create(name="Anillo Previo", category=self.category, price="1", stock=1)
+        Product.objects.filter(pk=older.pk).update(updated_at=self.product.updated_at.replace(year=2020))
+        url = reverse("product-list")
+        last_modified = self.client.get(url)['Last-Modified']
+        with mock.patch('products.cache.time.time', return_value=parse_http_date(last_modified) + 10):
+            Product.objects.filter(pk=older.pk).update(is_active=False)
+            bump_generation()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+    def test_change_produces_new_etag(self):
+        """Test que un cambio en el producto cambia el ETag"""
+        url = reverse("product-detail", kwargs={'pk': self.product.pk})
+        etag = self.client.get(url)['ETag']
+        self.product.stock = 3
+        self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['stock'], 3)
+
+    def test_missing_detail_still_404(self):
+        """Test que un detalle inexistente sigue devolviendo 404"""
+        response = self.client.get(reverse("product-detail", kwargs={'pk': 999999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductListSerializerTest(APITestCase):
+    """Tests para la representación ligera del listado de productos"""
+
+    def setUp(self):
+        from products.cache import get_catalog_cache
+        from products.models import ProductImage
+        get_catalog_cache().clear()
+        category = Category.objects.create(name="Pulseras", slug="pulseras")
+        full = Product.objects.create(
+            name="Pulsera Eslabón", description="Oro 18k", category=category, weight="12.5",
+            stock=4, price="350000", size="M", material="Oro",
+        )
+        Product.objects.filter(pk=full.pk).update(reserved_stock=1)
+        ProductImage.objects.create(product=full, image="products/eslabon.jpg", variants={
+            'webp': {'640': 'products/derivatives/eslabon-jpg-640w.webp', '320': 'products/derivatives/eslabon-jpg-320w.webp'},
+        })
+        ProductImage.objects.create(product=full, image="products/eslabon-2.jpg")
+        Product.objects.create(name="Sin categoría", description="", stock=0, price="1.5", material="Plata")
+
+    def test_same_json_as_product_serializer(self):
+        """Test que el listado produce exactamente el JSON de ProductSerializer"""
+        from rest_framework.renderers import JSONRenderer
+        from rest_framework.test import APIRequestFactory
+        from products.serializers import ProductSerializer
+
+        response = self.client.get(reverse("product-list"))
+        request = APIRequestFactory().get(reverse("product-list"))
+        queryset = Product.objects.filter(is_active=True).order_by('-created_at')
+        expected = ProductSerializer(queryset, many=True, context={'request': request}).data
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+        self.assertNotIn('category_name', response.json()[0])
+        self.assertEqual(len(response.json()[1]['uploaded_images']), 2)
+
+    def test_paginated_rows(self):
+        """Test que la paginación por cursor funciona con filas `.values()`"""
+        response = self.client.get(reverse("product-list"), {'page_size': 1})
+        first = response.json()
+        self.assertEqual(first['results'][0]['name'], "Sin categoría")
+        second = self.client.get(first['next']).json()
+        self.assertEqual(second['results'][0]['name'], "Pulsera Eslabón")
+
+    def test_query_count(self):
+        """Test que el listado usa una consulta de filas y otra de imágenes"""
+        Product.objects.bulk_create([
+            Product(name=f"Extra {i}", description="", stock=1, price="1", material="oro")
+            for i in range(20)
+        ])
+        from products.cache import get_catalog_cache
+        get_catalog_cache().clear()
+        # validadores, filas, imágenes
+        with self.assertNumQueries(3):
+            self.client.get(reverse("product-list"))
+
+
+class ProductImageDerivativesTest(APITestCase):
+    """Tests para los derivados WebP/JPEG de las imágenes de producto"""
+
+    def setUp(self):
+        get_catalog_cache().clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def png(self, size=(800, 400), color=(200, 160, 40, 128)):
+        buffer = io.BytesIO()
+        Image.new('RGBA', size, color).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_generate_variants(self):
+        """Test que solo se generan los anchos menores que el original y el JPEG es RGB"""
+        name = default_storage.save('products/anillo.png', ContentFile(self.png()))
+        variants = generate_variants(name)
+        self.assertEqual(set(variants), {'webp', 'jpeg'})
+        self.assertEqual(set(variants['webp']), {'320', '640'})
+        self.assertEqual(variants['jpeg']['320'], 'products/derivatives/anillo-png-320w.jpg')
+        with default_storage.open(variants['jpeg']['320']) as fh:
+            image = Image.open(fh)
+            self.assertEqual((image.mode, image.size), ('RGB', (320, 160)))
+
+        # Volver a generarlos reutiliza los mismos nombres
+        self.assertEqual(generate_variants(name), variants)
+
+    def test_same_stem_different_extension(self):
+        """Test que Royal.png y Royal.jpg no comparten derivados"""
+        product = Product.objects.create(name="Anillo Royal", price="1", stock=1, material="Oro")
+        png = ProductImage.objects.create(
+            product=product, image=default_storage.save('products/Royal.png', ContentFile(self.png())),
+        )
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 400), (10, 20, 200)).save(buffer, 'JPEG')
+        jpg = ProductImage.objects.create(
+            product=product, image=default_storage.save('products/Royal.jpg', ContentFile(buffer.getvalue())),
+        )
+        create_derivatives(png)
+        create_derivatives(jpg)
+        self.assertTrue(variant_names(png.variants).isdisjoint(variant_names(jpg.variants)))
+        with default_storage.open(png.variants['jpeg']['320']) as fh:
+            # Amarillo sobre el fondo oscuro, no el azul de Royal.jpg
+            red, _, blue = Image.open(fh).getpixel((10, 10))
+            self.assertGreater(red, blue)
+
+    def test_replaced_and_deleted_images_remove_derivatives(self):
+        """Test que cambiar o borrar la imagen elimina sus derivados"""
+        product = Product.objects.create(name="Dije", price="1", stock=1, material="Oro")
+        image = ProductImage.objects.create(
+            product=product, image=default_storage.save('products/dije.png', ContentFile(self.png())),
+        )
+        create_derivatives(image)
+        old = variant_names(image.variants)
+
+        image.image = default_storage.save('products/dije-2.png', ContentFile(self.png()))
+        image.save()
+        create_derivatives(image)
+        self.assertFalse(any(default_storage.exists(name) for name in old))
+        current = variant_names(image.variants)
+        self.assertTrue(all(default_storage.exists(name) for name in current))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertFalse(any(default_storage.exists(name) for name in current))
+
+    def test_upload_creates_derivatives(self):
+        """Test que crear un producto con imagen genera los derivados y el srcset"""
+        admin = User.objects.create_user(
+            username="admin", email="admin@test.com", password="x", is_admin=True
+        )
+        self.client.force_authenticate(admin)
+        response = self.client.post(reverse("product-list"), {
+            'name': "Anillo Sol", 'description': "Oro", 'price': "99000", 'stock': 2, 'material': "Oro",
+            'images': [SimpleUploadedFile("sol.png", self.png(), content_type="image/png")],
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        product = Product.objects.get(name="Anillo Sol")
+        image = product.uploaded_images.get()
+        self.assertEqual(set(image.variants['webp']), {'320', '640'})
+        srcset = self.client.get(reverse("product-list")).json()[0]['uploaded_images'][0]['srcset']
+        self.assertRegex(srcset['webp'], r'^http://testserver/media/products/derivatives/\S+-320w\.webp 320w, \S+-640w\.webp 640w$')
+
+    def test_backfill_command(self):
+        """Test que generate_image_derivatives completa las imágenes sin derivados"""
+        product = Product.objects.create(name="Collar", price="1", stock=1)
+        image = ProductImage.objects.create(
+            product=product, image=default_storage.save('products/collar.png', ContentFile(self.png((500, 500)))),
+        )
+        call_command('generate_image_derivatives', workers=1, stdout=io.StringIO())
+        image.refresh_from_db()
+        self.assertEqual(set(image.variants['jpeg']), {'320'})
@@ -1,8 +1,13 @@
+from django.conf import settings
+from django.db.models import Count, Q
 from rest_framework import viewsets, permissions, filters
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from .cache import CachedReadMixin, is_catalog_admin
 from .models import Product, Category
-from .serializers import ProductSerializer, CategorySerializer
-from .filters import ProductFilter
+from .serializers import ProductListSerializer, ProductSerializer, CategorySerializer
+from .filters import ProductFilter, FullTextSearchFilter
+from .pagination import ProductCursorPagination
 
 
 class IsAdminOrReadOnly(permissions.BasePermission):
@@ -10,10 +15,10 @@ class IsAdminOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return bool(request.user and request.user.is_authenticated and getattr(request.user, "is_admin", False))
+        return is_catalog_admin(request.user)
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedReadMixin, viewsets.ModelViewSet):
     """
     API endpoint para categorías de productos
 
@@ -22,6 +27,8 @@ class CategoryViewSet(viewsets.ModelViewSet):
     POST /api/categories/ - Crear categoría (solo admin)
     PUT/PATCH /api/categories/{id}/ - Actualizar (solo admin)
     DELETE /api/categories/{id}/ - Eliminar (solo admin)
+
+    Las lecturas se cachean (ver products.cache).
     """
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrReadOnly]
@@ -30,16 +37,28 @@ class CategoryViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
 
-    def get_queryset(self):
+    def get_visible_queryset(self):
         qs = Category.objects.all()
-        user = self.request.user
         # Usuarios no-admin solo ven categorías activas
-        if not (user and user.is_authenticated and getattr(user, "is_admin", False)):
+        if not is_catalog_admin(self.request.user):
             qs = qs.filter(is_active=True)
         return qs
 
+    def get_queryset(self):
+        qs = self.get_visible_queryset()
+        # Conteo de productos activos en la misma consulta (evita N+1)
+        if not settings.PRODUCTS_DENORMALIZED_COUNTS:
+            qs = qs.annotate(
+                active_products_count=Count('products', filter=Q(products__is_active=True))
+            )
+        return qs
+
+    def get_conditional_queryset(self):
+        # Los conteos dependen de productos: eso ya lo cubre la generación de la caché
+        return self.filter_queryset(self.get_visible_queryset())
 
-class ProductViewSet(viewsets.ModelViewSet):
+
+class ProductViewSet(CachedReadMixin, viewsets.ModelViewSet):
     """
     API endpoint para productos con filtros avanzados
 
@@ -52,26 +71,49 @@ class ProductViewSet(viewsets.ModelViewSet):
     - ?stock_min=<valor> - Stock mínimo
     - ?name=<texto> - Buscar por nombre
     - ?material=<texto> - Buscar por material
-    - ?search=<texto> - Búsqueda general
+    - ?search=<texto> - Búsqueda general (texto completo, por relevancia)
     - ?ordering=price,-price,created_at,-created_at,stock,-stock,name,-name
+    - ?page_size=<n> / ?cursor=<token> - Paginación por cursor (opcional)
 
     Ejemplos:
     - /api/products/?category_slug=anillos&price_max=5000000
     - /api/products/?in_stock=true&ordering=-price
     - /api/products/?search=oro&price_min=1000000
+    - /api/products/?ordering=-created_at&page_size=24 (luego seguir el enlace `next`)
+
+    Las lecturas se cachean (ver products.cache).
     """
     serializer_class = ProductSerializer
     permission_classes = [IsAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = ProductCursorPagination
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
     filterset_class = ProductFilter
     search_fields = ["name", "description", "material", "size"]
     ordering_fields = ["price", "created_at", "stock", "name"]
     ordering = ["-created_at"]
 
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(self.list_rows, request, *args, **kwargs)
+
+    def list_rows(self, request, *args, **kwargs):
+        """
+        Listado con filas `.values()` y ProductListSerializer: mismo JSON que
+        ProductSerializer sin construir modelos ni serializadores por fila
+        """
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        # Anotaciones por las que el cursor puede ordenar (relevancia de ?search=)
+        annotations = [
+            name for name in self.pagination_class.keyset_annotations if name in queryset.query.annotations
+        ]
+        rows = queryset.values(*ProductListSerializer.value_fields, *annotations)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(ProductListSerializer(page, context=self.get_serializer_context()).data)
+        return Response(ProductListSerializer(list(rows), context=self.get_serializer_context()).data)
+
     def get_queryset(self):
         # Lectura pública solo de activos; admins ven todos
         qs = Product.objects.select_related('category').prefetch_related('uploaded_images')
-        user = self.request.user
-        if not (user and user.is_authenticated and getattr(user, "is_admin", False)):
+        if not is_catalog_admin(self.request.user):
             qs = qs.filter(is_active=True)
         return qs
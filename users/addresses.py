@@ -0,0 +1,41 @@
+"""
+Importación en bloque de direcciones
+
+Crea todas las direcciones con un único INSERT. Como bulk_create no pasa por
+Address.save(), la dirección por defecto se resuelve aquí: si varias del mismo
+tipo vienen marcadas gana la última, y las anteriores del usuario se desmarcan
+con un único UPDATE condicional en la misma transacción. Tampoco se emiten
+señales, así que se invalida /me/ a mano.
+"""
+from django.db import IntegrityError, transaction
+
+from .me import invalidate_me
+from .models import DEFAULT_SWAP_ATTEMPTS, Address
+
+
+def import_addresses(user, rows):
+    """Crea las direcciones `rows` (datos validados por AddressSerializer) para `user`"""
+    defaults = {}
+    for row in rows:
+        if row.get("is_default"):
+            defaults[row.get("address_type", "shipping")] = row
+
+    for attempt in range(DEFAULT_SWAP_ATTEMPTS):
+        addresses = [
+            Address(user=user, **{**row, "is_default": defaults.get(row.get("address_type", "shipping")) is row})
+            for row in rows
+        ]
+        try:
+            with transaction.atomic():
+                if defaults:
+                    Address.objects.filter(
+                        user=user, address_type__in=defaults, is_default=True
+                    ).update(is_default=False)
+                created = Address.objects.bulk_create(addresses)
+            break
+        except IntegrityError:
+            # Otra petición marcó a la vez una dirección por defecto
+            if attempt == DEFAULT_SWAP_ATTEMPTS - 1:
+                raise
+    invalidate_me(user.pk)
+    return created
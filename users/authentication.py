@@ -0,0 +1,141 @@
+"""
+Autenticación JWT con el usuario en caché
+
+JWTAuthentication carga el User de la base de datos en cada petición.
+CachedJWTAuthentication lo busca primero en una caché local del proceso
+(USERS_AUTH_CACHE_LOCAL_TTL segundos) y después en la caché compartida
+`users` (USERS_AUTH_CACHE_TTL); solo si no está consulta la base de datos.
+
+Las comprobaciones son las mismas que en simplejwt (usuario existente,
+activo y, con CHECK_REVOKE_TOKEN, contraseña sin cambiar) y se hacen sobre
+el usuario cacheado. Cada User.save() / delete() borra la entrada compartida
+y la local del proceso (users.signals); otros procesos pueden ver el estado
+anterior como mucho USERS_AUTH_CACHE_LOCAL_TTL segundos (0 desactiva la capa
+local). Los cambios con queryset.update() no emiten señales: llamar a
+invalidate_cached_user() a mano.
+
+Ese límite solo se cumple si `users` es una caché compartida (file, redis).
+Con locmem cada proceso tiene la suya y la invalidación no llega a los
+demás, así que allí las entradas duran también USERS_AUTH_CACHE_LOCAL_TTL.
+La capa local guarda como mucho LOCAL_MAX_ENTRIES usuarios.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from products.cache import is_shared_cache
+
+LOCAL_MAX_ENTRIES = 1000
+
+# user_id -> (caduca, usuario serializado), del más antiguo al más reciente.
+# Se guarda serializado para que cada petición reciba su propia instancia y
+# pueda modificarla sin afectar a otras
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def get_auth_cache():
+    return caches['users']
+
+
+def auth_cache_ttl():
+    """TTL de la caché `users`: sin caché compartida, el mismo límite que la capa local"""
+    if is_shared_cache(get_auth_cache()):
+        return settings.USERS_AUTH_CACHE_TTL
+    return min(settings.USERS_AUTH_CACHE_TTL, settings.USERS_AUTH_CACHE_LOCAL_TTL)
+
+
+def user_cache_key(user_id):
+    return f'auth:{user_id}'
+
+
+def _local_get(user_id):
+    entry = _local.get(user_id)
+    if entry is None:
+        return None
+    expires, data = entry
+    if expires < time.monotonic():
+        with _local_lock:
+            _local.pop(user_id, None)
+        return None
+    return pickle.loads(data)
+
+
+def _local_set(user_id, user):
+    ttl = settings.USERS_AUTH_CACHE_LOCAL_TTL
+    if ttl <= 0:
+        return
+    now = time.monotonic()
+    data = pickle.dumps(user)
+    with _local_lock:
+        _local[user_id] = (now + ttl, data)
+        _local.move_to_end(user_id)
+        # Con el mismo TTL para todos, las primeras entradas son las que antes caducan
+        while _local and (len(_local) > LOCAL_MAX_ENTRIES or next(iter(_local.values()))[0] < now):
+            _local.popitem(last=False)
+
+
+def get_cached_user(user_id):
+    """User con ese id desde la caché local, la compartida o la base de datos (None si no existe)"""
+    user = _local_get(user_id)
+    if user is not None:
+        return user
+    cache = get_auth_cache()
+    user = cache.get(user_cache_key(user_id))
+    if user is None:
+        User = get_user_model()
+        try:
+            user = User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+        except User.DoesNotExist:
+            return None
+        ttl = auth_cache_ttl()
+        if ttl > 0:
+            cache.set(user_cache_key(user_id), user, ttl)
+    _local_set(user_id, user)
+    return user
+
+
+def invalidate_cached_user(user_id):
+    """Olvida el usuario ya y otra vez al confirmar la transacción"""
+    def forget():
+        with _local_lock:
+            _local.pop(user_id, None)
+        get_auth_cache().delete(user_cache_key(user_id))
+    forget()
+    transaction.on_commit(forget)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication con el usuario resuelto desde caché (ver el módulo)"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
@@ -0,0 +1,193 @@
+"""
+Lista negra de tokens con filtro de Bloom en memoria
+
+Con ROTATE_REFRESH_TOKENS y BLACKLIST_AFTER_ROTATION cada refresh y cada
+logout comprueban BlacklistedToken en la base de datos. Aquí cada proceso
+mantiene un filtro de Bloom con los jti en la lista negra (solo los de
+tokens sin caducar): si el jti no está en el filtro no está en la lista
+negra y no se consulta nada; si está (o es un falso positivo, con
+probabilidad USERS_BLACKLIST_ERROR_RATE) se confirma con la base de datos.
+
+Sincronización entre procesos a través de la caché `users`:
+
+- `blacklist:version` sube con cada token añadido y `blacklist:jti:<n>`
+  guarda el jti n-ésimo (se escriben al confirmar la transacción, ver
+  users.signals). Cada comprobación lee la versión y añade al filtro los
+  jti que le falten, sin tocar la base de datos.
+- `blacklist:epoch` obliga a reconstruir el filtro desde la base de datos
+  (tras prune_expired_tokens). También se reconstruye si faltan entradas
+  intermedias, si el proceso se quedó muy atrás, si el filtro se llena y,
+  en cualquier caso, cada USERS_BLACKLIST_REBUILD_INTERVAL segundos por si
+  la caché perdió algo sin que cambiara la versión.
+
+Si `users` no es una caché compartida (locmem, dummy) los demás procesos no
+verían los anuncios: no se usa el filtro y cada comprobación consulta
+BlacklistedToken como simplejwt.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from products.cache import is_shared_cache
+
+EPOCH_KEY = 'blacklist:epoch'
+VERSION_KEY = 'blacklist:version'
+# Un proceso con más entradas atrasadas que esto reconstruye en lugar de ponerse al día
+MAX_CATCH_UP = 1000
+MIN_CAPACITY = 10000
+
+
+def jti_key(version):
+    return f'blacklist:jti:{version}'
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre un bytearray (doble hash con blake2b)"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def full(self):
+        return self.count > self.capacity
+
+
+class _State:
+    bloom = None
+    epoch = None
+    version = 0
+    built_at = 0.0
+
+
+_state = _State()
+_lock = threading.Lock()
+
+
+def get_blacklist_cache():
+    return caches['users']
+
+
+def _rebuild(epoch, version):
+    """Carga en un filtro nuevo los jti en la lista negra de tokens sin caducar"""
+    jtis = (
+        BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        .order_by()
+        .values_list('token__jti', flat=True)
+    )
+    count = jtis.count()
+    bloom = BloomFilter(max(MIN_CAPACITY, count * 2), settings.USERS_BLACKLIST_ERROR_RATE)
+    for jti in jtis.iterator(chunk_size=5000):
+        bloom.add(jti)
+    _state.bloom, _state.epoch, _state.version = bloom, epoch, version
+    _state.built_at = time.monotonic()
+
+
+def _is_stale():
+    return time.monotonic() - _state.built_at >= settings.USERS_BLACKLIST_REBUILD_INTERVAL
+
+
+def sync_filter():
+    """Pone al día el filtro de este proceso con la caché (y la base de datos si hace falta)"""
+    cache = get_blacklist_cache()
+    shared = cache.get_many([EPOCH_KEY, VERSION_KEY])
+    epoch, version = shared.get(EPOCH_KEY, 0), shared.get(VERSION_KEY, 0)
+    if _state.bloom is not None and epoch == _state.epoch and version == _state.version and not _is_stale():
+        return _state.bloom
+    with _lock:
+        if _state.bloom is None or epoch != _state.epoch or version < _state.version or _is_stale():
+            _rebuild(epoch, version)
+        elif version > _state.version:
+            missing = range(_state.version + 1, version + 1)
+            found = cache.get_many([jti_key(n) for n in missing]) if len(missing) <= MAX_CATCH_UP else {}
+            if len(found) < len(missing) or _state.bloom.count + len(found) > _state.bloom.capacity:
+                _rebuild(epoch, version)
+            else:
+                for jti in found.values():
+                    _state.bloom.add(jti)
+                _state.version = version
+        return _state.bloom
+
+
+def is_blacklisted(jti):
+    """True si el jti está en la lista negra; solo consulta la base de datos si el filtro lo contiene"""
+    if is_shared_cache(get_blacklist_cache()) and jti not in sync_filter():
+        return False
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+def _incr(cache, key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def publish_blacklisted(jti):
+    """Anuncia un jti nuevo en la lista negra a todos los procesos (al confirmar la transacción)"""
+    def publish():
+        cache = get_blacklist_cache()
+        version = _incr(cache, VERSION_KEY)
+        cache.set(jti_key(version), jti, timeout=settings.USERS_BLACKLIST_ENTRY_TTL)
+        with _lock:
+            if _state.bloom is not None:
+                _state.bloom.add(jti)
+    transaction.on_commit(publish)
+
+
+def reset_filter():
+    """Obliga a todos los procesos a reconstruir el filtro"""
+    _incr(get_blacklist_cache(), EPOCH_KEY)
+
+
+def prune_expired_tokens(chunk_size=1000, pause=0):
+    """
+    Borra los OutstandingToken caducados (y sus BlacklistedToken en cascada)
+    en transacciones cortas de `chunk_size` filas recorriendo la clave
+    primaria, con `pause` segundos entre bloques. Devuelve cuántos se borraron.
+    """
+    now = timezone.now()
+    last_id = 0
+    total = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(pk__gt=last_id, expires_at__lte=now)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            OutstandingToken.objects.filter(pk__in=ids).delete()
+        total += len(ids)
+        last_id = ids[-1]
+        if pause:
+            time.sleep(pause)
+    if total:
+        reset_filter()
+    return total
@@ -0,0 +1,97 @@
+"""
+Buffer de escritura de last_login (opcional, USERS_LAST_LOGIN_WRITE_BEHIND)
+
+Con UPDATE_LAST_LOGIN cada login JWT hace un UPDATE del usuario. Con el
+buffer activo la fecha se guarda por usuario en la caché `users` y
+`python manage.py flush_last_logins` (cron o --every) la vuelca con un único
+bulk_update, que además no emite señales (no invalida cachés de usuario:
+last_login no forma parte de ninguna representación cacheada).
+
+Claves (sin caducidad), como en orders.cart_buffer:
+
+- last_login:pending:<user> = fecha del último login sin volcar, creada con
+  add(): solo el primer login registra al usuario y los siguientes la pisan;
+- last_login:pending:log:<n> = user, con n = incr(last_login:pending:seq): el
+  registro que flush_last_logins recorre desde la última posición volcada.
+  Dos logins concurrentes de usuarios distintos no se pisan.
+
+Todos los procesos tienen que ver el buffer: con una caché `users` que no es
+compartida (locmem, dummy) queda desactivado y cada login hace su UPDATE. Lo
+pendiente no caduca y conviene un backend sin expulsión; una expulsión solo
+pierde la fecha del último login.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.core.cache import caches
+from django.utils import timezone
+
+from products.cache import is_shared_cache
+
+LOG_SEQ_KEY = 'last_login:pending:seq'
+LOG_DONE_KEY = 'last_login:pending:done'
+
+
+def is_enabled():
+    return getattr(settings, 'USERS_LAST_LOGIN_WRITE_BEHIND', False) and is_shared_cache(get_buffer_cache())
+
+
+def get_buffer_cache():
+    return caches['users']
+
+
+def pending_key(user_id):
+    return f'last_login:pending:{user_id}'
+
+
+def log_key(n):
+    return f'last_login:pending:log:{n}'
+
+
+def _log(cache, user_id):
+    cache.add(LOG_SEQ_KEY, 0, timeout=None)
+    cache.set(log_key(cache.incr(LOG_SEQ_KEY)), user_id, timeout=None)
+
+
+def record_login(user):
+    """Actualiza last_login ya o lo deja en el buffer, según USERS_LAST_LOGIN_WRITE_BEHIND"""
+    if not is_enabled():
+        update_last_login(None, user)
+        return
+    user.last_login = timezone.now()
+    cache = get_buffer_cache()
+    if cache.add(pending_key(user.pk), user.last_login, timeout=None):
+        _log(cache, user.pk)
+    else:
+        cache.set(pending_key(user.pk), user.last_login, timeout=None)
+
+
+def flush_last_logins(batch_size=500):
+    """Vuelca las fechas pendientes con bulk_update. Devuelve cuántos usuarios se actualizaron"""
+    if not is_enabled():
+        return 0
+    cache = get_buffer_cache()
+    done, seq = cache.get(LOG_DONE_KEY, 0), cache.get(LOG_SEQ_KEY, 0)
+    if seq <= done:
+        return 0
+    entries = cache.get_many([log_key(n) for n in range(done + 1, seq + 1)])
+    users = list(dict.fromkeys(entries.values()))
+    pending = cache.get_many([pending_key(user_id) for user_id in users])
+    User = get_user_model()
+    updates = [
+        User(pk=user_id, last_login=pending[pending_key(user_id)])
+        for user_id in users if pending_key(user_id) in pending
+    ]
+    User.objects.bulk_update(updates, ['last_login'], batch_size=batch_size)
+    cache.set(LOG_DONE_KEY, seq, timeout=None)
+    cache.delete_many(list(entries))
+
+    # Solo se olvida lo que nadie volvió a modificar mientras tanto; lo demás
+    # se vuelve a anotar al final del registro
+    current = cache.get_many(list(pending))
+    cache.delete_many([key for key, value in pending.items() if current.get(key) == value])
+    for user_id in users:
+        key = pending_key(user_id)
+        if key in current and current[key] != pending[key]:
+            _log(cache, user_id)
+    return len(updates)
@@ -0,0 +1,25 @@
+"""
+Vuelca a la base de datos los last_login pendientes del buffer de users.last_login
+Uso: python manage.py flush_last_logins [--batch-size 500] [--every 60]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from users.last_login import flush_last_logins
+
+
+class Command(BaseCommand):
+    help = 'Escribir en bloque los last_login pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--every', type=int, default=0,
+                            help='Repetir cada N segundos en lugar de ejecutar una vez')
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = flush_last_logins(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'✅ {flushed} usuarios actualizados'))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
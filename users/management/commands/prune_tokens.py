@@ -0,0 +1,31 @@
+"""
+Borra los tokens JWT caducados (OutstandingToken y su BlacklistedToken)
+Uso: python manage.py prune_tokens [--chunk-size 1000] [--pause 0.05] [--every 3600]
+
+A diferencia de flushexpiredtokens (un único DELETE de todo) borra por
+bloques en transacciones cortas, sin bloquear las tablas mucho tiempo.
+Al terminar los procesos reconstruyen su filtro de la lista negra.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from users.blacklist import prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Borrar por bloques los tokens JWT caducados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Segundos de espera entre bloques')
+        parser.add_argument('--every', type=int, default=0,
+                            help='Repetir cada N segundos en lugar de ejecutar una vez')
+
+    def handle(self, *args, **options):
+        while True:
+            pruned = prune_expired_tokens(chunk_size=options['chunk_size'], pause=options['pause'])
+            self.stdout.write(self.style.SUCCESS(f'✅ {pruned} tokens caducados borrados'))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
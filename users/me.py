@@ -0,0 +1,70 @@
+"""
+Representación cacheada de GET /api/users/me/
+
+Las páginas del frontend piden /me/ en cada carga solo para pintar el header.
+La respuesta se guarda por usuario y variante (completa o `?fields=header`,
+sin perfil ni direcciones) en la caché `users`, junto con su ETag, así que
+con la caché caliente ni el 200 ni el 304 tocan la base de datos. Cualquier
+escritura de User, Profile o Address del usuario la invalida (users.signals).
+
+La invalidación solo llega a los demás procesos si `users` es una caché
+compartida; con locmem, como en users.authentication, las entradas duran
+USERS_AUTH_CACHE_LOCAL_TTL segundos.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from products.cache import is_shared_cache
+
+from .models import User
+from .serializers import UserDetailSerializer, UserSerializer
+
+VARIANTS = {
+    'full': UserDetailSerializer,
+    'header': UserSerializer,
+}
+
+
+def get_me_cache():
+    return caches['users']
+
+
+def me_key(user_id, variant):
+    return f'me:{variant}:{user_id}'
+
+
+def me_cache_ttl():
+    """TTL de las entradas: el de la caché si es compartida, si no el de la capa local"""
+    if is_shared_cache(get_me_cache()):
+        return DEFAULT_TIMEOUT
+    return settings.USERS_AUTH_CACHE_LOCAL_TTL
+
+
+def get_me_payload(user, variant='full'):
+    """(datos, etag) de /me/ para `user`, desde la caché si está"""
+    cache = get_me_cache()
+    key = me_key(user.pk, variant)
+    entry = cache.get(key)
+    if entry is None:
+        if variant == 'full':
+            user = User.objects.select_related('profile').prefetch_related('addresses').get(pk=user.pk)
+        data = VARIANTS[variant](user).data
+        raw = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+        entry = (data, '"%s"' % hashlib.sha1(raw.encode()).hexdigest())
+        ttl = me_cache_ttl()
+        if ttl:
+            cache.set(key, entry, ttl)
+    return entry
+
+
+def invalidate_me(user_id):
+    """Borra las variantes ya y otra vez al confirmar la transacción"""
+    keys = [me_key(user_id, variant) for variant in VARIANTS]
+    get_me_cache().delete_many(keys)
+    transaction.on_commit(lambda: get_me_cache().delete_many(keys))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:47
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def keep_latest_default(apps, schema_editor):
+    """
+    Si un usuario tiene varias direcciones por defecto del mismo tipo se deja
+    solo la más reciente (mayor id) y se desmarcan las demás con un UPDATE
+    """
+    Address = apps.get_model('users', 'Address')
+    duplicated = (
+        Address.objects.filter(is_default=True).order_by()
+        .values('user', 'address_type')
+        .annotate(defaults=Count('id'))
+        .filter(defaults__gt=1)
+    )
+    if not duplicated.exists():
+        return
+    latest = (
+        Address.objects.filter(is_default=True).order_by()
+        .values('user', 'address_type').annotate(keep=Max('id')).values('keep')
+    )
+    Address.objects.filter(is_default=True).exclude(pk__in=latest).update(is_default=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_latest_default, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='address',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('user', 'address_type'), name='unique_default_address_per_type'),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import IntegrityError, models, transaction
+
+# Intentos de Address.save() cuando otra petición cambia a la vez la dirección por defecto
+DEFAULT_SWAP_ATTEMPTS = 3
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
@@ -22,9 +25,38 @@ class Profile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Campos que save_user_profile compara antes de volver a guardar el perfil
+    TRACKED_FIELDS = ("phone", "date_of_birth", "avatar", "bio")
+
     def __str__(self):
         return f"Profile of {self.user.email}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance._tracked_values()
+        return instance
+
+    def _tracked_values(self):
+        values = {}
+        for name in self.TRACKED_FIELDS:
+            field = self._meta.get_field(name)
+            if field.attname in self.__dict__:
+                values[name] = field.get_prep_value(field.value_from_object(self))
+        return values
+
+    def get_dirty_fields(self):
+        """Campos de TRACKED_FIELDS modificados desde que se cargó o guardó (todos si es nuevo)"""
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            return list(self.TRACKED_FIELDS)
+        current = self._tracked_values()
+        return [name for name, value in current.items() if loaded.get(name) != value]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = self._tracked_values()
+
 
 class Address(models.Model):
     ADDRESS_TYPE_CHOICES = [
@@ -50,16 +82,58 @@ class Address(models.Model):
     class Meta:
         verbose_name_plural = "Addresses"
         ordering = ["-is_default", "-created_at"]
+        constraints = [
+            # Como mucho una dirección por defecto de cada tipo por usuario
+            models.UniqueConstraint(
+                fields=["user", "address_type"],
+                condition=models.Q(is_default=True),
+                name="unique_default_address_per_type",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.label} - {self.full_name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_default = instance._default_state()
+        return instance
+
+    def _default_state(self):
+        return (self.__dict__.get("is_default"), self.__dict__.get("address_type"), self.__dict__.get("user_id"))
+
     def save(self, *args, **kwargs):
-        # Si esta dirección se marca como default, quitar el default de las demás del mismo tipo
-        if self.is_default:
-            Address.objects.filter(
-                user=self.user,
-                address_type=self.address_type,
-                is_default=True
-            ).exclude(pk=self.pk).update(is_default=False)
-        super().save(*args, **kwargs)
+        """
+        Si la dirección pasa a ser la de por defecto de su tipo se desmarca la
+        anterior con un UPDATE condicional en la misma transacción. Guardar una
+        dirección que ya era la de por defecto no añade ninguna sentencia; si
+        otra petición marcó otra a la vez, la restricción única lo detecta y se
+        repite el cambio.
+        """
+        if not self.is_default:
+            super().save(*args, **kwargs)
+        elif getattr(self, "_loaded_default", None) != self._default_state():
+            self._save_as_default(*args, **kwargs)
+        else:
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+            except IntegrityError:
+                self._save_as_default(*args, **kwargs)
+        self._loaded_default = self._default_state()
+
+    def _save_as_default(self, *args, **kwargs):
+        for attempt in range(DEFAULT_SWAP_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    Address.objects.filter(
+                        user_id=self.user_id,
+                        address_type=self.address_type,
+                        is_default=True,
+                    ).exclude(pk=self.pk).update(is_default=False)
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                if attempt == DEFAULT_SWAP_ATTEMPTS - 1:
+                    raise
@@ -0,0 +1,10 @@
+"""
+Paginación del listado de usuarios (admin)
+"""
+from products.pagination import KeysetPagination
+
+
+class UserCursorPagination(KeysetPagination):
+    """/api/users/ siempre paginado por cursor, ordenado por id"""
+    page_size = 50
+    max_page_size = 500
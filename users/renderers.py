@@ -0,0 +1,28 @@
+"""
+Renderer NDJSON: un objeto JSON por línea (?format=ndjson)
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def ndjson_line(data):
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Las listas se escriben una fila por línea. Para exportaciones grandes la
+    vista devuelve un StreamingHttpResponse con ndjson_line() en lugar de
+    pasar por aquí (ver UserViewSet.list).
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(ndjson_line(row) for row in rows).encode(self.charset)
@@ -14,6 +14,8 @@ class ProfileSerializer(serializers.ModelSerializer):
 
 
 class AddressSerializer(serializers.ModelSerializer):
+    """Marcar una dirección por defecto desmarca la anterior del mismo tipo (ver Address.save)"""
+
     class Meta:
         model = Address
         fields = [
@@ -24,22 +26,15 @@ class AddressSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["created_at", "updated_at"]
 
-    def validate(self, data):
-        user = self.context["request"].user
-        is_default = data.get("is_default", False)
-        address_type = data.get("address_type", "shipping")
-
-        if is_default and user and user.is_authenticated:
-            qs = Address.objects.filter(
-                user=user, address_type=address_type, is_default=True
-            )
-            if self.instance:
-                qs = qs.exclude(pk=self.instance.pk)
-            if qs.exists():
-                raise serializers.ValidationError(
-                    {"is_default": "Ya tienes una dirección por defecto de este tipo."}
-                )
-        return data
+
+class AddressImportSerializer(serializers.Serializer):
+    """POST /api/users/me/addresses/import/: {"addresses": [...]}"""
+    addresses = AddressSerializer(many=True, allow_empty=False)
+
+    def validate_addresses(self, value):
+        if len(value) > 100:
+            raise serializers.ValidationError("Máximo 100 direcciones por importación.")
+        return value
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -1,6 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import User, Profile
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .authentication import invalidate_cached_user
+from .blacklist import publish_blacklisted
+from .me import invalidate_me
+from .models import User, Profile, Address
 
 
 @receiver(post_save, sender=User)
@@ -15,7 +19,40 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     """
-    Guarda el Profile cuando se guarda el User
+    Guarda el Profile cuando se guarda el User, solo si ya estaba cargado
+    (no se consulta) y tiene cambios sin guardar
     """
-    if hasattr(instance, 'profile'):
+    if User.profile.related.is_cached(instance) and instance.profile.get_dirty_fields():
         instance.profile.save()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    """
+    Borra el usuario de la caché de autenticación (cambios de datos,
+    contraseña o is_active tienen efecto en la siguiente petición)
+    """
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def announce_blacklisted_token(sender, instance, created, **kwargs):
+    """
+    Añade el jti al filtro de la lista negra de todos los procesos
+    """
+    if created:
+        publish_blacklisted(instance.token.jti)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+@receiver(post_save, sender=Address)
+@receiver(post_delete, sender=Address)
+def forget_me_payload(sender, instance, **kwargs):
+    """
+    Borra el /me/ cacheado del usuario afectado
+    """
+    invalidate_me(instance.pk if sender is User else instance.user_id)
@@ -1,3 +1,505 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest.mock
+from datetime import timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users import authentication, blacklist
+from users.authentication import get_auth_cache, get_cached_user
+from users.blacklist import BloomFilter, is_blacklisted, prune_expired_tokens
+from users.last_login import flush_last_logins
+from users.me import get_me_cache, me_key
+from users.models import Address, Profile
+from users.tokens import RefreshToken
+from users.views import UserViewSet
+
+User = get_user_model()
+
+# Caché `users` compartida entre procesos (ver products.cache.is_shared_cache)
+SHARED_USERS_CACHE = {
+    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+    "LOCATION": os.path.join(tempfile.gettempdir(), "almadeoro-test-users"),
+    "KEY_PREFIX": "users",
+}
+
+
+class CachedJWTAuthenticationTest(APITestCase):
+    """Tests para la autenticación JWT con el usuario en caché"""
+
+    def setUp(self):
+        # Los ids se repiten entre tests: empezar sin usuarios cacheados
+        get_auth_cache().clear()
+        authentication._local.clear()
+        self.user = User.objects.create_user(
+            username="cliente", email="cliente@test.com", password="test12345"
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def user_queries(self, path):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path, {"fields": "header"})
+        return response, [q["sql"] for q in ctx.captured_queries if '"users_user"' in q["sql"]]
+
+    def test_second_request_skips_user_query(self):
+        """Test que la segunda petición no consulta el usuario"""
+        url = reverse("current-user")
+        response, queries = self.user_queries(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+
+        response, queries = self.user_queries(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["email"], "cliente@test.com")
+        self.assertEqual(queries, [])
+
+    def test_shared_cache_used_when_local_is_empty(self):
+        """Test que sin la capa local se usa la caché `users` sin consultas"""
+        get_cached_user(self.user.pk)
+        authentication._local.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cached_user(self.user.pk).pk, self.user.pk)
+
+    def test_deactivation_invalidates(self):
+        """Test que desactivar al usuario invalida la caché"""
+        url = reverse("current-user")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_rejected(self):
+        """Test que un usuario borrado ya no se autentica"""
+        url = reverse("current-user")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.user.delete()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates(self):
+        """Test que cambiar la contraseña invalida la caché"""
+        response = self.client.post(reverse("change-password"), {
+            "old_password": "test12345",
+            "new_password": "Nueva-clave-2026",
+            "new_password2": "Nueva-clave-2026",
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(get_cached_user(self.user.pk).check_password("Nueva-clave-2026"))
+
+    def test_profile_edit_visible_next_request(self):
+        """Test que una edición se ve en la petición siguiente"""
+        url = reverse("current-user")
+        self.client.get(url)
+        self.client.patch(url, {"full_name": "Ana Pérez"})
+        self.assertEqual(self.client.get(url).data["full_name"], "Ana Pérez")
+
+    @override_settings(USERS_AUTH_CACHE_TTL=60, USERS_AUTH_CACHE_LOCAL_TTL=5)
+    def test_local_cache_ttl_capped(self):
+        """Test que con una caché `users` por proceso (locmem) las entradas duran lo que la capa local"""
+        self.assertEqual(authentication.auth_cache_ttl(), 5)
+        with self.settings(CACHES={**settings.CACHES, "users": SHARED_USERS_CACHE}):
+            self.assertEqual(authentication.auth_cache_ttl(), 60)
+
+    def test_local_layer_bounded(self):
+        """Test que la capa local no guarda más de LOCAL_MAX_ENTRIES usuarios ni entradas caducadas"""
+        with unittest.mock.patch.object(authentication, "LOCAL_MAX_ENTRIES", 3):
+            for user_id in range(1, 6):
+                authentication._local_set(user_id, self.user)
+        self.assertEqual(list(authentication._local), [3, 4, 5])
+        with unittest.mock.patch("users.authentication.time.monotonic", return_value=time.monotonic() + 60):
+            authentication._local_set(6, self.user)
+        self.assertEqual(list(authentication._local), [6])
+
+
+@override_settings(CACHES={**settings.CACHES, "users": SHARED_USERS_CACHE})
+class TokenBlacklistTest(APITestCase):
+    """Tests para la lista negra de tokens con filtro de Bloom"""
+
+    def setUp(self):
+        get_auth_cache().clear()
+        blacklist._state.bloom = None
+        self.user = User.objects.create_user(
+            username="cliente", email="cliente@test.com", password="test12345"
+        )
+
+    def refresh(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse("token_refresh"), {"refresh": str(token)})
+
+    def test_bloom_filter(self):
+        """Test que el filtro no da falsos negativos y pocos falsos positivos"""
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"jti-{i}")
+        self.assertTrue(all(f"jti-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"otro-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_rotated_token_rejected(self):
+        """Test que un refresh token rotado se rechaza"""
+        token = RefreshToken.for_user(self.user)
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.refresh(response.data["refresh"]).status_code, status.HTTP_200_OK)
+
+    def test_logout_blacklists(self):
+        """Test que el logout añade el token a la lista negra"""
+        token = RefreshToken.for_user(self.user)
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("logout"), {"refresh": str(token)})
+        self.assertEqual(response.status_code, status.HTTP_205_RESET_CONTENT)
+        self.assertEqual(self.client.post(reverse("logout"), {"refresh": str(token)}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_clean_token_checked_without_queries(self):
+        """Test que un token fuera de la lista negra se comprueba sin consultas"""
+        self.refresh(RefreshToken.for_user(self.user))
+        token = RefreshToken.for_user(self.user)
+        with self.assertNumQueries(0):
+            self.assertFalse(is_blacklisted(token["jti"]))
+
+    def test_other_process_entries_added_from_cache(self):
+        """Test que otro proceso añade los jti nuevos desde la caché"""
+        token = RefreshToken.for_user(self.user)
+        is_blacklisted("x")
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+        # Otro proceso: su filtro sigue vacío y en la versión anterior
+        blacklist._state.bloom = BloomFilter(blacklist.MIN_CAPACITY, 0.001)
+        with self.assertNumQueries(1):
+            self.assertTrue(is_blacklisted(token["jti"]))
+
+    def test_periodic_rebuild(self):
+        """Test que el filtro se reconstruye desde la base de datos pasado el intervalo"""
+        token = RefreshToken.for_user(self.user)
+        is_blacklisted("x")
+        # Blacklist sin anuncio en la caché (p. ej. entrada perdida)
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=token["jti"]))
+        self.assertFalse(is_blacklisted(token["jti"]))
+        blacklist._state.built_at -= settings.USERS_BLACKLIST_REBUILD_INTERVAL
+        self.assertTrue(is_blacklisted(token["jti"]))
+
+    def test_local_cache_checks_database(self):
+        """Test que con una caché `users` por proceso (locmem) se consulta siempre la base de datos"""
+        token = RefreshToken.for_user(self.user)
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=token["jti"]))
+        local = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "users-test"}
+        with self.settings(CACHES={**settings.CACHES, "users": local}):
+            with self.assertNumQueries(1):
+                self.assertTrue(is_blacklisted(token["jti"]))
+            with self.assertNumQueries(1):
+                self.assertFalse(is_blacklisted("otro"))
+        self.assertIsNone(blacklist._state.bloom)
+
+    def test_prune_expired_tokens(self):
+        """Test que prune_expired_tokens borra por bloques los tokens caducados"""
+        past = timezone.now() - timedelta(days=1)
+        expired = OutstandingToken.objects.bulk_create([
+            OutstandingToken(user=self.user, jti=f"viejo-{i}", token="t", expires_at=past)
+            for i in range(5)
+        ])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=t) for t in expired[:3]])
+        live = RefreshToken.for_user(self.user)
+
+        self.assertEqual(prune_expired_tokens(chunk_size=2), 5)
+        self.assertEqual(list(OutstandingToken.objects.values_list("jti", flat=True)), [live["jti"]])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class CurrentUserCacheTest(APITestCase):
+    """Tests para la caché de GET /api/users/me/"""
+
+    def setUp(self):
+        get_auth_cache().clear()
+        self.user = User.objects.create_user(
+            username="cliente", email="cliente@test.com", password="test12345"
+        )
+        self.client.force_authenticate(self.user)
+        self.url = reverse("current-user")
+
+    def add_address(self, **kwargs):
+        return Address.objects.create(
+            user=self.user, label="Casa", full_name="Ana", phone="300", address_line_1="Calle 1",
+            city="Bogotá", state="Cundinamarca", zip_code="110111", **kwargs
+        )
+
+    def test_cached_payload_and_304(self):
+        """Test que con la caché caliente el 200 y el 304 no tocan la base de datos"""
+        self.add_address()
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data["addresses"]), 1)
+        self.assertEqual(response.data["profile"]["bio"], None)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).data, response.data)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_header_mode_skips_addresses(self):
+        """Test que ?fields=header no trae perfil ni direcciones"""
+        self.add_address()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {"fields": "header"})
+        self.assertEqual(response.data["username"], "cliente")
+        self.assertNotIn("addresses", response.data)
+        self.assertNotIn("profile", response.data)
+
+    def test_writes_invalidate(self):
+        """Test que las escrituras de usuario, perfil y direcciones invalidan la caché"""
+        etag = self.client.get(self.url)["ETag"]
+        address = self.add_address()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["addresses"]), 1)
+
+        address.delete()
+        self.assertEqual(self.client.get(self.url).data["addresses"], [])
+
+        self.user.profile.bio = "Joyas"
+        self.user.profile.save()
+        self.assertEqual(self.client.get(self.url).data["profile"]["bio"], "Joyas")
+
+        self.client.patch(self.url, {"full_name": "Ana Pérez"})
+        self.assertEqual(self.client.get(self.url, {"fields": "header"}).data["full_name"], "Ana Pérez")
+
+    def test_local_cache_ttl(self):
+        """Test que con una caché `users` por proceso (locmem) /me/ se cachea solo USERS_AUTH_CACHE_LOCAL_TTL"""
+        with unittest.mock.patch.object(get_me_cache(), "set", wraps=get_me_cache().set) as cache_set:
+            self.client.get(self.url)
+        cache_set.assert_called_once_with(me_key(self.user.pk, "full"), unittest.mock.ANY, settings.USERS_AUTH_CACHE_LOCAL_TTL)
+
+
+class ProfileWritesTest(APITestCase):
+    """Tests para las escrituras del perfil y de last_login"""
+
+    def setUp(self):
+        get_auth_cache().clear()
+        self.user = User.objects.create_user(
+            username="cliente", email="cliente@test.com", password="test12345"
+        )
+
+    def profile_updates(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        return [q["sql"] for q in ctx.captured_queries if '"users_profile"' in q["sql"]]
+
+    def test_user_save_skips_clean_or_unloaded_profile(self):
+        """Test que guardar el usuario no guarda un perfil sin cargar o sin cambios"""
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(self.profile_updates(user.save), [])
+        user.profile  # cargado y sin cambios
+        self.assertEqual(self.profile_updates(user.save), [])
+
+    def test_dirty_profile_saved_with_user(self):
+        """Test que un perfil modificado se guarda con el usuario"""
+        user = User.objects.get(pk=self.user.pk)
+        user.profile.bio = "Joyas"
+        self.assertEqual(user.profile.get_dirty_fields(), ["bio"])
+        self.assertEqual(len(self.profile_updates(user.save)), 1)
+        self.assertEqual(Profile.objects.get(user=user).bio, "Joyas")
+        self.assertEqual(user.profile.get_dirty_fields(), [])
+
+    def login(self):
+        return self.client.post(reverse("token_obtain_pair"), {"email": "cliente@test.com", "password": "test12345"})
+
+    def test_login_does_not_touch_profile(self):
+        """Test que el login actualiza last_login sin tocar el perfil"""
+        self.assertEqual(self.profile_updates(self.login), [])
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    @override_settings(USERS_LAST_LOGIN_WRITE_BEHIND=True, CACHES={**settings.CACHES, "users": SHARED_USERS_CACHE})
+    def test_last_login_write_behind(self):
+        """Test que con el buffer last_login se vuelca con flush_last_logins"""
+        get_auth_cache().clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")])
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+
+        self.assertEqual(flush_last_logins(), 1)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+        self.assertEqual(flush_last_logins(), 0)
+
+        # Un login nuevo vuelve a registrar al usuario
+        first = self.user.last_login
+        self.login()
+        self.assertEqual(flush_last_logins(), 1)
+        self.user.refresh_from_db()
+        self.assertGreater(self.user.last_login, first)
+
+    @override_settings(USERS_LAST_LOGIN_WRITE_BEHIND=True)
+    def test_last_login_write_behind_needs_shared_cache(self):
+        """Test que con una caché `users` por proceso (locmem) el login escribe last_login directamente"""
+        self.login()
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+        self.assertEqual(flush_last_logins(), 0)
+
+
+ADDRESS = {
+    "label": "Casa", "full_name": "Ana", "phone": "300", "address_line_1": "Calle 1",
+    "city": "Bogotá", "state": "Cundinamarca", "zip_code": "110111",
+}
+
+
+class DefaultAddressTest(APITestCase):
+    """Tests para la dirección por defecto de cada tipo"""
+
+    def setUp(self):
+        get_auth_cache().clear()
+        self.user = User.objects.create_user(
+            username="cliente", email="cliente@test.com", password="test12345"
+        )
+        self.client.force_authenticate(self.user)
+
+    def defaults(self):
+        return list(Address.objects.filter(user=self.user, is_default=True).values_list("label", flat=True))
+
+    def writes(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        return [q["sql"].split()[0] for q in ctx.captured_queries if q["sql"].split()[0] in ("INSERT", "UPDATE")]
+
+    def test_new_default_swaps(self):
+        """Test que una nueva dirección por defecto desmarca la anterior"""
+        Address.objects.create(user=self.user, is_default=True, **ADDRESS)
+        new = Address(user=self.user, is_default=True, **{**ADDRESS, "label": "Oficina"})
+        self.assertEqual(self.writes(new.save), ["UPDATE", "INSERT"])
+        self.assertEqual(self.defaults(), ["Oficina"])
+
+    def test_resave_default_is_single_update(self):
+        """Test que volver a guardar la dirección por defecto es un solo UPDATE"""
+        Address.objects.create(user=self.user, is_default=True, **ADDRESS)
+        address = Address.objects.get(user=self.user)
+        address.city = "Medellín"
+        self.assertEqual(self.writes(address.save), ["UPDATE"])
+
+    def test_constraint(self):
+        """Test que la restricción única impide dos direcciones por defecto"""
+        Address.objects.create(user=self.user, is_default=True, **ADDRESS)
+        with self.assertRaises(IntegrityError):
+            Address.objects.bulk_create([Address(user=self.user, is_default=True, **ADDRESS)])
+
+    def test_api_second_default_replaces_first(self):
+        """Test que por la API la segunda dirección por defecto reemplaza a la primera"""
+        url = reverse("address-list")
+        self.client.post(url, {**ADDRESS, "is_default": True})
+        response = self.client.post(url, {**ADDRESS, "label": "Oficina", "is_default": True})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.defaults(), ["Oficina"])
+
+    def test_bulk_import(self):
+        """Test que la importación inserta en bloque y respeta la última por defecto"""
+        Address.objects.create(user=self.user, is_default=True, **ADDRESS)
+        Address.objects.create(user=self.user, is_default=True, address_type="billing", **{**ADDRESS, "label": "Factura"})
+        rows = [
+            {**ADDRESS, "label": "A", "is_default": True},
+            {**ADDRESS, "label": "B", "is_default": True},
+            {**ADDRESS, "label": "C"},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse("address-import"), {"addresses": rows}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(sum(q["sql"].startswith("INSERT") for q in ctx.captured_queries), 1)
+        self.assertEqual(sorted(self.defaults()), ["B", "Factura"])
+
+
+class ConcurrentDefaultAddressTest(TransactionTestCase):
+    """Direcciones marcadas por defecto a la vez desde varios hilos"""
+
+    def test_single_default(self):
+        """Test que con N hilos queda una sola dirección por defecto"""
+        user = User.objects.create_user(username="cliente", email="cliente@test.com", password="x")
+        addresses = [Address.objects.create(user=user, **{**ADDRESS, "label": f"D{i}"}) for i in range(8)]
+        barrier = threading.Barrier(len(addresses))
+
+        def make_default(address):
+            barrier.wait()
+            try:
+                # SQLite tiene un único escritor: reintentar si la tabla está bloqueada
+                for _ in range(50):
+                    try:
+                        address.is_default = True
+                        address.save()
+                        break
+                    except OperationalError:
+                        time.sleep(0.01)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=make_default, args=(address,)) for address in addresses]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Address.objects.filter(user=user, is_default=True).count(), 1)
+
+
+class UserListTest(APITestCase):
+    """Tests para el listado y la exportación de usuarios"""
+
+    def setUp(self):
+        get_auth_cache().clear()
+        self.admin = User.objects.create_user(
+            username="admin", email="admin@test.com", password="x", is_staff=True
+        )
+        for i in range(9):
+            user = User.objects.create_user(username=f"u{i}", email=f"u{i}@test.com", password="x")
+            Address.objects.create(user=user, **ADDRESS)
+        self.client.force_authenticate(self.admin)
+        self.url = reverse("user-list")
+
+    def test_pages_with_constant_queries(self):
+        """Test que cada página hace las mismas consultas"""
+        emails = []
+        url = self.url + "?page_size=4"
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            emails += [row["email"] for row in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(len(emails), 10)
+        self.assertEqual(emails[0], "admin@test.com")
+
+    def test_ndjson_export_streams_in_chunks(self):
+        """Test que ?format=ndjson exporta en streaming por bloques"""
+        UserViewSet.export_chunk_size = 4
+        try:
+            # Una consulta de usuarios (cursor) y una de direcciones por bloque
+            with self.assertNumQueries(4):
+                response = self.client.get(self.url, {"format": "ndjson"})
+                lines = b"".join(response.streaming_content).decode().splitlines()
+        finally:
+            UserViewSet.export_chunk_size = 2000
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(len(rows[1]["addresses"]), 1)
+
+    def test_admin_only(self):
+        """Test que solo los administradores ven el listado"""
+        self.client.force_authenticate(User.objects.get(email="u0@test.com"))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,42 @@
+"""
+Tokens JWT con la comprobación de lista negra de users.blacklist y el
+buffer de last_login de users.last_login
+"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer as BaseTokenObtainPairSerializer,
+    TokenObtainSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+
+from .blacklist import is_blacklisted
+from .last_login import record_login
+
+
+class RefreshToken(BaseRefreshToken):
+    """RefreshToken que consulta el filtro en memoria antes que BlacklistedToken"""
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    """POST /api/auth/token/refresh/ con RefreshToken (SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER'])"""
+    token_class = RefreshToken
+
+
+class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
+    """Login JWT que actualiza last_login con record_login (SIMPLE_JWT['TOKEN_OBTAIN_SERIALIZER'])"""
+
+    def validate(self, attrs):
+        data = TokenObtainSerializer.validate(self, attrs)
+        refresh = self.get_token(self.user)
+        data["refresh"] = str(refresh)
+        data["access"] = str(refresh.access_token)
+        if api_settings.UPDATE_LAST_LOGIN:
+            record_login(self.user)
+        return data
@@ -1,16 +1,24 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from .tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from .addresses import import_addresses
+from .me import get_me_payload
 from .models import Profile, Address
+from .pagination import UserCursorPagination
+from .renderers import NDJSONRenderer, ndjson_line
 from .serializers import (
     UserSerializer,
     UserDetailSerializer,
     UserRegistrationSerializer,
     ProfileSerializer,
     AddressSerializer,
+    AddressImportSerializer,
     ChangePasswordSerializer,
 )
 
@@ -53,10 +61,21 @@ class LogoutAPIView(APIView):
 
 
 class CurrentUserAPIView(APIView):
+    """
+    GET /api/users/me/ desde la caché de users.me, con ETag (304 si no cambió).
+    ?fields=header devuelve solo los datos del usuario, sin perfil ni direcciones.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        return Response(UserDetailSerializer(request.user).data)
+        variant = 'header' if request.query_params.get("fields") == "header" else 'full'
+        data, etag = get_me_payload(request.user, variant)
+        response = get_conditional_response(request, etag=etag) or Response(data)
+        response["ETag"] = etag
+        # El navegador lo guarda pero revalida siempre (If-None-Match)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ["Authorization"])
+        return response
 
     def patch(self, request):
         serializer = UserSerializer(request.user, data=request.data, partial=True)
@@ -97,6 +116,14 @@ class AddressViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=["post"], url_path="import", url_name="import")
+    def bulk_import(self, request):
+        """POST /api/users/me/addresses/import/: crea varias direcciones con un solo INSERT"""
+        serializer = AddressImportSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+        created = import_addresses(request.user, serializer.validated_data["addresses"])
+        return Response(AddressSerializer(created, many=True).data, status=status.HTTP_201_CREATED)
+
 
 class ChangePasswordAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -109,6 +136,29 @@ class ChangePasswordAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = User.objects.all().order_by('id')
+    """
+    Listado de usuarios para administradores, paginado por cursor y con perfil
+    y direcciones cargados en bloque (2 consultas por página: usuarios con su
+    perfil por JOIN y direcciones).
+    ?format=ndjson exporta todos los usuarios en streaming, un JSON por línea,
+    recorriendo la tabla por bloques de `export_chunk_size` (memoria constante).
+    """
+    queryset = User.objects.select_related('profile').prefetch_related('addresses').order_by('id')
     serializer_class = UserDetailSerializer
-    permission_classes = [permissions.IsAdminUser]
\ No newline at end of file
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = UserCursorPagination
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+    export_chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != NDJSONRenderer.format:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        context = self.get_serializer_context()
+        rows = (
+            ndjson_line(self.get_serializer_class()(user, context=context).data)
+            for user in queryset.iterator(chunk_size=self.export_chunk_size)
+        )
+        response = StreamingHttpResponse(rows, content_type=NDJSONRenderer.media_type)
+        response["Content-Disposition"] = 'attachment; filename="usuarios.ndjson"'
+        return response
\ No newline at end of file